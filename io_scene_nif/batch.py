@@ -0,0 +1,424 @@
+"""This script imports and exports a manifest of nif, kf and egm jobs across a pool of background Blender processes.
+
+Run it as::
+
+    blender -b --python io_scene_nif/batch.py -- manifest.json --workers 4 --report report.json
+
+The manifest is a json file::
+
+    {"properties": {"export_nif": {"game": "SKYRIM"}},
+     "jobs": [{"type": "import_nif", "filepath": "meshes/chair.nif", "egm": "meshes/head.egm", "output": "chair.blend"},
+              {"type": "import_kf", "filepath": "idle.kf", "blend": "skeleton.blend", "output": "idle.blend"},
+              {"type": "export_nif", "filepath": "out/chair.nif", "blend": "chair.blend"}]}
+
+Relative paths are relative to the manifest. The report holds the status, timing, warnings and errors of each job.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import types
+from collections import deque
+
+import bpy
+
+# when run as a script, the addon need not be installed
+ADDON_PARENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ADDON_PARENT_DIR not in sys.path:
+    sys.path.append(ADDON_PARENT_DIR)
+
+import io_scene_nif
+from io_scene_nif.kf_import import KfImport
+from io_scene_nif.nif_export import NifExport
+from io_scene_nif.nif_import import NifImport
+from io_scene_nif.operators.kf_import_op import KfImportOperator
+from io_scene_nif.operators.nif_export_op import NifExportOperator
+from io_scene_nif.operators.nif_import_op import NifImportOperator
+from io_scene_nif.utils.util_math import NifError
+
+# job type -> operator whose properties the job takes, and the class that runs it
+JOB_TYPES = {
+    "import_nif": (NifImportOperator, NifImport),
+    "export_nif": (NifExportOperator, NifExport),
+    "import_kf": (KfImportOperator, KfImport),
+}
+
+# properties that differ from the user interface defaults, as nobody looks at the result interactively
+BATCH_PROPERTIES = {
+    "import_nif": {"arrange_nodes": False},
+}
+
+# job keys that hold paths, relative to the manifest
+PATH_KEYS = ("filepath", "blend", "output", "egm")
+
+# levels of the reported messages that go into the results, the others are only printed
+RESULT_LEVELS = ('WARNING', 'ERROR')
+
+# workers mark the lines that hold results, to tell them apart from whatever else Blender prints
+RESULT_PREFIX = "NIFTOOLS_BATCH_RESULT "
+
+# property type -> default value, for properties that do not set one
+PROPERTY_DEFAULTS = {
+    "BoolProperty": False,
+    "IntProperty": 0,
+    "FloatProperty": 0.0,
+    "StringProperty": "",
+}
+
+
+def get_deferred_property(annotation):
+    """Get the function and keywords of a property annotation, or None if it is not a property."""
+    # newer versions of Blender wrap deferred properties, older ones use a tuple
+    if hasattr(annotation, "function") and hasattr(annotation, "keywords"):
+        return annotation.function, annotation.keywords
+    if isinstance(annotation, tuple) and len(annotation) == 2 and callable(annotation[0]) and isinstance(annotation[1], dict):
+        return annotation
+    return None
+
+
+def get_default_properties(operator_class):
+    """Get the default values of all properties of an operator class, including those of its helper classes."""
+    properties = {}
+    for cls in reversed(operator_class.__mro__):
+        for name, annotation in cls.__dict__.get("__annotations__", {}).items():
+            deferred = get_deferred_property(annotation)
+            if not deferred:
+                continue
+            function, keywords = deferred
+            function_name = function.__name__
+            if "default" in keywords:
+                properties[name] = keywords["default"]
+            elif function_name == "EnumProperty":
+                items = keywords.get("items")
+                properties[name] = items[0][0] if items and not callable(items) else ""
+            elif function_name == "CollectionProperty":
+                properties[name] = []
+            elif function_name.endswith("VectorProperty"):
+                properties[name] = (0,) * keywords.get("size", 3)
+            else:
+                properties[name] = PROPERTY_DEFAULTS.get(function_name)
+    return properties
+
+
+class BatchOperator:
+    """Stands in for an import or export operator outside the user interface: holds the properties of a job, prints
+    the messages that are reported while running it up to its log level, and collects the warnings and errors."""
+
+    def __init__(self, operator_class, properties):
+        self.operator_class = operator_class
+        defaults = get_default_properties(operator_class)
+        unknown = sorted(set(properties) - set(defaults))
+        if unknown:
+            raise NifError("Unknown properties for {0}: {1}".format(operator_class.__name__, ", ".join(unknown)))
+        defaults.update(properties)
+        self.properties = types.SimpleNamespace(**defaults)
+        # (level, message) tuples
+        self.reports = []
+
+    def __getattr__(self, name):
+        # class attributes of the operator, such as the versions of each game
+        return getattr(self.operator_class, name)
+
+    def report(self, level, message):
+        min_level_num = getattr(logging, self.properties.plugin_log_level)
+        for level_name in level:
+            if level_name in RESULT_LEVELS:
+                self.reports.append((level_name, message))
+            if getattr(logging, level_name, logging.INFO) >= min_level_num:
+                print("{0}: {1}".format(level_name, message))
+
+    def get_messages(self, level_name):
+        return [message for report_level, message in self.reports if report_level == level_name]
+
+
+def resolve_job(job, index, base_dir, manifest_properties):
+    """Fill in the index and properties of a manifest job, with its paths made absolute."""
+    job = dict(job)
+    job_type = job.get("type")
+    if job_type not in JOB_TYPES:
+        raise NifError("Job {0} has unknown type {1}, expected one of {2}".format(index, job_type, ", ".join(sorted(JOB_TYPES))))
+    if not job.get("filepath"):
+        raise NifError("Job {0} has no filepath".format(index))
+    job["index"] = index
+    job.setdefault("id", str(index))
+    for key in PATH_KEYS:
+        if job.get(key):
+            job[key] = os.path.normpath(os.path.join(base_dir, job[key]))
+
+    properties = dict(BATCH_PROPERTIES.get(job_type, {}))
+    properties.update(manifest_properties.get(job_type, {}))
+    properties.update(job.get("properties", {}))
+    properties["filepath"] = job["filepath"]
+    if job.get("egm"):
+        properties["egm_file"] = job["egm"]
+    job["properties"] = properties
+    return job
+
+
+def load_manifest(filepath):
+    """Read the jobs of a manifest, a json file with a list of jobs, or an object with jobs and properties per job type."""
+    with open(filepath, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    base_dir = os.path.dirname(os.path.abspath(filepath))
+    return [resolve_job(job, index, base_dir, manifest.get("properties", {})) for index, job in enumerate(manifest.get("jobs", []))]
+
+
+def get_job_size(job):
+    """Estimate the work of a job from the size of its input file."""
+    for path in (job.get("blend"), job["filepath"]):
+        if path and os.path.isfile(path):
+            return os.path.getsize(path)
+    return 0
+
+
+def register_addon():
+    """Register the addon in this Blender process, unless it already is."""
+    if not hasattr(bpy.types.Scene, "niftools_scene"):
+        io_scene_nif.register()
+
+
+def reset_scene(blend_filepath=None):
+    """Start each job on an empty scene, or on the blend file that it names."""
+    if blend_filepath:
+        bpy.ops.wm.open_mainfile(filepath=blend_filepath)
+    else:
+        bpy.ops.wm.read_homefile(use_empty=True)
+
+
+def get_failed_result(job, seconds, message):
+    return {"index": job["index"], "id": job["id"], "type": job["type"], "filepath": job["filepath"],
+            "status": "failed", "warnings": [], "errors": [message], "seconds": seconds}
+
+
+def run_job(job):
+    """Run a single job in this Blender process.
+
+    :return: The result, to report as json.
+    """
+    result = {"index": job["index"], "id": job["id"], "type": job["type"], "filepath": job["filepath"],
+              "status": "ok", "warnings": [], "errors": []}
+    start = time.time()
+    operator = None
+    try:
+        operator_class, runner_class = JOB_TYPES[job["type"]]
+        properties = dict(job["properties"])
+        if job["type"] == "import_kf":
+            # the kf import operator takes the files selected in its directory
+            properties["files"] = [types.SimpleNamespace(name=os.path.basename(job["filepath"]))]
+        reset_scene(job.get("blend"))
+        operator = BatchOperator(operator_class, properties)
+        status = runner_class(operator, bpy.context).execute()
+        if 'CANCELLED' in status:
+            result["errors"].append("The job was cancelled")
+        elif job.get("output"):
+            bpy.ops.wm.save_as_mainfile(filepath=job["output"])
+    except Exception as e:
+        result["errors"].append(str(e))
+        result["traceback"] = traceback.format_exc()
+    if operator:
+        result["warnings"] = operator.get_messages('WARNING')
+        result["errors"] = operator.get_messages('ERROR') + result["errors"]
+    if result["errors"]:
+        result["status"] = "failed"
+    result["seconds"] = time.time() - start
+    return result
+
+
+def run_worker():
+    """Run the jobs that arrive as json lines on stdin, answering each with a result line on stdout."""
+    register_addon()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        result = run_job(json.loads(line))
+        sys.stdout.write(RESULT_PREFIX + json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+class WorkerPool:
+    """Background Blender processes that take jobs from a shared queue as soon as they are idle, so a few long jobs do
+    not hold up the others. Jobs are queued largest first, for the same reason.
+
+    A job that runs longer than the timeout fails, and its worker is killed and replaced."""
+
+    def __init__(self, num_workers, blender_path, verbose=False, timeout=None):
+        self.num_workers = num_workers
+        self.blender_path = blender_path
+        self.verbose = verbose
+        self.timeout = timeout
+        self.queue = deque()
+        self.results = []
+        self.lock = threading.Lock()
+
+    def start_worker(self):
+        args = [self.blender_path, "-b", "--factory-startup", "--python", os.path.abspath(__file__), "--", "--worker"]
+        return subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, universal_newlines=True, bufsize=1)
+
+    def read_result(self, process, worker_index):
+        """Read the output of a worker until the result of its job, or None if the worker exited."""
+        for line in process.stdout:
+            if line.startswith(RESULT_PREFIX):
+                return json.loads(line[len(RESULT_PREFIX):])
+            if self.verbose:
+                sys.stdout.write("[{0}] {1}".format(worker_index, line))
+        return None
+
+    @staticmethod
+    def kill_worker(process, timed_out):
+        # flag the timeout first, so the reader knows why the output of the worker ends
+        timed_out.set()
+        process.kill()
+
+    def take_job(self):
+        with self.lock:
+            return self.queue.popleft() if self.queue else None
+
+    def run_worker_thread(self, worker_index):
+        process = None
+        job = self.take_job()
+        while job:
+            start = time.time()
+            timed_out = threading.Event()
+            timer = None
+            try:
+                if not process:
+                    process = self.start_worker()
+                if self.timeout:
+                    timer = threading.Timer(self.timeout, self.kill_worker, args=(process, timed_out))
+                    timer.start()
+                process.stdin.write(json.dumps(job) + "\n")
+                process.stdin.flush()
+                result = self.read_result(process, worker_index)
+            except OSError as e:
+                result = get_failed_result(job, time.time() - start, "Could not run worker: {0}".format(e))
+                if process:
+                    process.kill()
+                    process = None
+            finally:
+                if timer:
+                    timer.cancel()
+            if result is None:
+                # the worker crashed or was killed on this job, so fail it and start a fresh worker for the next one
+                exit_code = process.wait()
+                if timed_out.is_set():
+                    message = "Job timed out after {0} s".format(self.timeout)
+                else:
+                    message = "Worker exited with code {0}".format(exit_code)
+                result = get_failed_result(job, time.time() - start, message)
+                process = None
+            elif timed_out.is_set() and process:
+                # the worker was killed just after it finished the job
+                process.wait()
+                process = None
+            result["worker"] = worker_index
+            print("[{0}] {1} {2} in {3:.2f} s".format(worker_index, result["status"], job["filepath"], result["seconds"]))
+            with self.lock:
+                self.results.append(result)
+            job = self.take_job()
+        if process:
+            process.stdin.close()
+            process.wait()
+
+    def run(self, jobs):
+        """Run all jobs.
+
+        :return: Their results, in the order of the jobs.
+        """
+        self.queue.extend(sorted(jobs, key=get_job_size, reverse=True))
+        self.results = []
+        threads = [threading.Thread(target=self.run_worker_thread, args=(i,)) for i in range(min(self.num_workers, len(jobs)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(self.results, key=lambda result: result["index"])
+
+
+def get_arguments(argv):
+    parser = argparse.ArgumentParser(prog="blender -b --python batch.py --", description=__doc__.splitlines()[0])
+    parser.add_argument("manifest", nargs="?", help="json file with the jobs to run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of background Blender processes, 0 runs the jobs in this process")
+    parser.add_argument("--report", help="json file to write the results to")
+    parser.add_argument("--blender", default=bpy.app.binary_path, help="Blender executable for the workers")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the workers")
+    parser.add_argument("--timeout", type=float, help="seconds after which a job fails and its worker is restarted")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    # Blender passes the arguments after -- on to the script
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    args = get_arguments(argv)
+    if args.worker:
+        run_worker()
+        return 0
+    if not args.manifest:
+        print("No manifest given")
+        return 2
+
+    start = time.time()
+    jobs = load_manifest(args.manifest)
+    if args.workers > 0:
+        results = WorkerPool(args.workers, args.blender, args.verbose, args.timeout).run(jobs)
+    else:
+        register_addon()
+        results = [run_job(job) for job in jobs]
+    seconds = time.time() - start
+
+    num_failed = sum(result["status"] != "ok" for result in results)
+    print("{0} of {1} jobs succeeded in {2:.2f} s".format(len(results) - num_failed, len(results), seconds))
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump({"seconds": seconds, "failed": num_failed, "jobs": results}, report_file, indent=2)
+    return 1 if num_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
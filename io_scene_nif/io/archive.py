@@ -0,0 +1,495 @@
+"""This module reads files from Bethesda BSA and BA2 archives, without extracting them to disk."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import io
+import os
+import posixpath
+import re
+import struct
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+try:
+    import lz4.block
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+from io_scene_nif.utils.util_logging import NifLog
+from io_scene_nif.utils.util_math import NifError
+
+ARCHIVE_EXTENSIONS = ('.bsa', '.ba2')
+
+# decompressed files are kept in memory up to this many bytes in total
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# bsa archive flags
+BSA_DIRECTORY_NAMES = 0x1
+BSA_FILE_NAMES = 0x2
+BSA_COMPRESSED = 0x4
+BSA_EMBEDDED_NAMES = 0x100
+
+# bsa file sizes carry a flag that inverts the compression default of the archive
+BSA_SIZE_COMPRESSED = 0x40000000
+BSA_SIZE_MASK = 0x3FFFFFFF
+
+# ba2 compression methods, from version 3 on
+BA2_LZ4 = 3
+
+# dds header flags
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PITCH = 0x8
+DDSD_PIXELFORMAT = 0x1000
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDPF_ALPHAPIXELS = 0x1
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+DDSCAPS_COMPLEX = 0x8
+DDSCAPS_TEXTURE = 0x1000
+DDSCAPS_MIPMAP = 0x400000
+DDSCAPS2_CUBEMAP_ALL_FACES = 0xFE00
+
+# dxgi format -> four character code and bytes per 4x4 block, of block compressed formats
+# formats without a legacy four character code need the dx10 header extension
+DXGI_BLOCK_FORMATS = {
+    71: (b'DXT1', 8), 72: (b'DXT1', 8),
+    74: (b'DXT3', 16), 75: (b'DXT3', 16),
+    77: (b'DXT5', 16), 78: (b'DXT5', 16),
+    80: (b'ATI1', 8), 83: (b'ATI2', 16),
+    95: (b'DX10', 16), 96: (b'DX10', 16),
+    98: (b'DX10', 16), 99: (b'DX10', 16),
+}
+
+# dxgi format -> bits per pixel, pixel format flags and red, green, blue and alpha masks, of uncompressed formats
+DXGI_PIXEL_FORMATS = {
+    28: (32, DDPF_RGB | DDPF_ALPHAPIXELS, 0xFF, 0xFF00, 0xFF0000, 0xFF000000),
+    29: (32, DDPF_RGB | DDPF_ALPHAPIXELS, 0xFF, 0xFF00, 0xFF0000, 0xFF000000),
+    61: (8, DDPF_LUMINANCE, 0xFF, 0, 0, 0),
+    87: (32, DDPF_RGB | DDPF_ALPHAPIXELS, 0xFF0000, 0xFF00, 0xFF, 0xFF000000),
+    88: (32, DDPF_RGB, 0xFF0000, 0xFF00, 0xFF, 0),
+    91: (32, DDPF_RGB | DDPF_ALPHAPIXELS, 0xFF0000, 0xFF00, 0xFF, 0xFF000000),
+}
+
+
+def get_key(path):
+    """Get the lowercased, / separated form of a path, under which archives index their files."""
+    return posixpath.normpath(path.replace('\\', '/').lower()).lstrip('/')
+
+
+def read_struct(stream, fmt):
+    """Read and unpack a struct from a stream, raising a NifError if the stream ends early."""
+    size = struct.calcsize(fmt)
+    data = stream.read(size)
+    if len(data) != size:
+        raise NifError("Unexpected end of archive")
+    return struct.unpack(fmt, data)
+
+
+def decode_name(name):
+    return name.decode("cp1252", errors="replace")
+
+
+def decompress(data, size, use_lz4=False, lz4_frame=False):
+    """Decompress zlib or lz4 compressed data, and check that it has the expected size."""
+    if use_lz4 or lz4_frame:
+        if not lz4:
+            raise NifError("The lz4 module is required to read lz4 compressed archives")
+        if lz4_frame:
+            blob = lz4.frame.decompress(data)
+        else:
+            blob = lz4.block.decompress(data, uncompressed_size=size)
+    else:
+        blob = zlib.decompress(data)
+    if len(blob) != size:
+        raise NifError("Corrupt file in archive, expected {0} bytes but got {1}".format(size, len(blob)))
+    return blob
+
+
+def get_dds_header(width, height, num_mips, dxgi_format, is_cubemap=False):
+    """Build the header of a dds file, as ba2 texture archives strip it from the stored textures."""
+    flags = DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT | DDSD_MIPMAPCOUNT
+    caps = DDSCAPS_TEXTURE
+    if num_mips > 1:
+        caps |= DDSCAPS_COMPLEX | DDSCAPS_MIPMAP
+    caps_2 = 0
+    if is_cubemap:
+        caps |= DDSCAPS_COMPLEX
+        caps_2 = DDSCAPS2_CUBEMAP_ALL_FACES
+
+    extension = b''
+    if dxgi_format in DXGI_PIXEL_FORMATS:
+        bits, pixel_flags, r_mask, g_mask, b_mask, a_mask = DXGI_PIXEL_FORMATS[dxgi_format]
+        flags |= DDSD_PITCH
+        pitch = (width * bits + 7) // 8
+        pixel_format = struct.pack('<II4sIIIII', 32, pixel_flags, b'', bits, r_mask, g_mask, b_mask, a_mask)
+    else:
+        fourcc, block_size = DXGI_BLOCK_FORMATS.get(dxgi_format, (b'DX10', 0))
+        flags |= DDSD_LINEARSIZE
+        pitch = max(1, (width + 3) // 4) * max(1, (height + 3) // 4) * block_size
+        pixel_format = struct.pack('<II4s20x', 32, DDPF_FOURCC, fourcc)
+        if fourcc == b'DX10':
+            # texture 2d resource, flagged as cube if needed, no array
+            extension = struct.pack('<IIIII', dxgi_format, 3, 0x4 if is_cubemap else 0, 1, 0)
+
+    header = struct.pack('<4sIIIIIII44x', b'DDS ', 124, flags, height, width, pitch, 0, num_mips)
+    return header + pixel_format + struct.pack('<IIII4x', caps, caps_2, 0, 0) + extension
+
+
+class Archive(ABC):
+    """A read-only archive, with its file entries indexed by their lowercased, / separated path."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.mtime = os.stat(filepath).st_mtime
+        # key -> where and how the file is stored, depending on the archive format
+        self.entries = {}
+
+    def __contains__(self, path):
+        return get_key(path) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def read(self, path):
+        """Read and decompress a file from the archive, raising a KeyError if the archive does not hold it."""
+        entry = self.entries[get_key(path)]
+        with open(self.filepath, "rb") as stream:
+            return self.read_entry(stream, entry)
+
+    @abstractmethod
+    def read_entry(self, stream, entry):
+        """Read and decompress the file of an entry from the open archive."""
+        pass
+
+
+class Tes3Archive(Archive):
+    """A Morrowind bsa archive, which stores its files uncompressed."""
+
+    def __init__(self, filepath, stream):
+        Archive.__init__(self, filepath)
+        version, hash_offset, num_files = read_struct(stream, '<III')
+        records = read_struct(stream, '<{0}I'.format(2 * num_files))
+        name_offsets = read_struct(stream, '<{0}I'.format(num_files))
+        names = stream.read(hash_offset - 12 * num_files)
+        # data follows the name hashes
+        data_offset = 12 + hash_offset + 8 * num_files
+        for size, offset, name_offset in zip(records[::2], records[1::2], name_offsets):
+            name = names[name_offset:names.index(b'\x00', name_offset)]
+            self.entries[get_key(decode_name(name))] = (data_offset + offset, size)
+
+    def read_entry(self, stream, entry):
+        offset, size = entry
+        stream.seek(offset)
+        return stream.read(size)
+
+
+class BsaArchive(Archive):
+    """An Oblivion, Fallout 3, Fallout New Vegas or Skyrim bsa archive."""
+
+    def __init__(self, filepath, stream):
+        Archive.__init__(self, filepath)
+        (magic, self.version, offset, flags, num_folders, num_files,
+         len_folder_names, len_file_names, file_flags, _) = read_struct(stream, '<4sIIIIIIIHH')
+        if self.version not in (103, 104, 105):
+            raise NifError("Unsupported bsa version {0}".format(self.version))
+        if not (flags & BSA_DIRECTORY_NAMES and flags & BSA_FILE_NAMES):
+            raise NifError("Bsa archive without file names")
+        # oblivion uses this flag for something else
+        self.embedded_names = bool(flags & BSA_EMBEDDED_NAMES) and self.version != 103
+        compressed = bool(flags & BSA_COMPRESSED)
+
+        stream.seek(offset)
+        if self.version == 105:
+            folder_counts = [count for hash_value, count, _, folder_offset in
+                             (read_struct(stream, '<QIIQ') for _ in range(num_folders))]
+        else:
+            folder_counts = [count for hash_value, count, folder_offset in
+                             (read_struct(stream, '<QII') for _ in range(num_folders))]
+
+        # the file records of each folder follow its name, in the same order as the names of the files
+        records = []
+        for count in folder_counts:
+            folder_name = decode_name(stream.read(read_struct(stream, '<B')[0])[:-1])
+            for _ in range(count):
+                hash_value, size, file_offset = read_struct(stream, '<QII')
+                records.append((folder_name, size, file_offset))
+        file_names = stream.read(len_file_names).split(b'\x00')
+        for (folder_name, size, file_offset), file_name in zip(records, file_names):
+            key = get_key(posixpath.join(folder_name.replace('\\', '/'), decode_name(file_name)))
+            self.entries[key] = (file_offset, size & BSA_SIZE_MASK, compressed != bool(size & BSA_SIZE_COMPRESSED))
+
+    def read_entry(self, stream, entry):
+        offset, size, compressed = entry
+        stream.seek(offset)
+        if self.embedded_names:
+            name_length = read_struct(stream, '<B')[0]
+            stream.seek(name_length, os.SEEK_CUR)
+            size -= name_length + 1
+        if not compressed:
+            return stream.read(size)
+        original_size = read_struct(stream, '<I')[0]
+        return decompress(stream.read(size - 4), original_size, lz4_frame=self.version == 105)
+
+
+class Ba2Archive(Archive):
+    """A Fallout 4, Fallout 76 or Starfield ba2 archive, holding either general files or textures."""
+
+    def __init__(self, filepath, stream):
+        Archive.__init__(self, filepath)
+        magic, self.version, archive_type, num_files, name_table_offset = read_struct(stream, '<4sI4sIQ')
+        self.use_lz4 = False
+        if self.version in (2, 3):
+            stream.seek(8, os.SEEK_CUR)
+            if self.version == 3:
+                self.use_lz4 = read_struct(stream, '<I')[0] == BA2_LZ4
+        elif self.version not in (1, 7, 8):
+            raise NifError("Unsupported ba2 version {0}".format(self.version))
+
+        entries = []
+        if archive_type == b'GNRL':
+            for _ in range(num_files):
+                name_hash, ext, dir_hash, flags, offset, packed_size, size, align = read_struct(stream, '<I4sIIQIII')
+                entries.append([(offset, packed_size, size)])
+        elif archive_type == b'DX10':
+            for _ in range(num_files):
+                (name_hash, ext, dir_hash, unknown, num_chunks, chunk_header_size,
+                 height, width, num_mips, dxgi_format, is_cubemap, tile_mode) = read_struct(stream, '<I4sIBBHHHBBBB')
+                header = get_dds_header(width, height, num_mips, dxgi_format, bool(is_cubemap))
+                chunks = []
+                for _ in range(num_chunks):
+                    offset, packed_size, size, start_mip, end_mip, align = read_struct(stream, '<QIIHHI')
+                    chunks.append((offset, packed_size, size))
+                entries.append([header] + chunks)
+        else:
+            raise NifError("Unsupported ba2 archive type {0}".format(archive_type))
+
+        stream.seek(name_table_offset)
+        for entry in entries:
+            name = stream.read(read_struct(stream, '<H')[0])
+            self.entries[get_key(decode_name(name))] = entry
+
+    def read_chunk(self, stream, chunk):
+        offset, packed_size, size = chunk
+        stream.seek(offset)
+        if not packed_size:
+            return stream.read(size)
+        return decompress(stream.read(packed_size), size, use_lz4=self.use_lz4)
+
+    def read_entry(self, stream, entry):
+        # textures start with the dds header that was stripped from them
+        if isinstance(entry[0], bytes):
+            return entry[0] + b''.join(self.read_chunk(stream, chunk) for chunk in entry[1:])
+        return self.read_chunk(stream, entry[0])
+
+
+def open_archive(filepath):
+    """Read the directory of a bsa or ba2 archive."""
+    with open(filepath, "rb") as stream:
+        magic = stream.read(4)
+        stream.seek(0)
+        if magic == b'BSA\x00':
+            return BsaArchive(filepath, stream)
+        elif magic == b'BTDX':
+            return Ba2Archive(filepath, stream)
+        elif magic == b'\x00\x01\x00\x00':
+            return Tes3Archive(filepath, stream)
+    raise NifError("{0} is not a bsa or ba2 archive".format(filepath))
+
+
+class BlobCache:
+    """A least recently used cache of decompressed files, bounded by their total size."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.blobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.blobs.clear()
+            self.num_bytes = 0
+
+    def get(self, key):
+        """Get a cached blob and mark it as most recently used; None if it is not cached."""
+        with self.lock:
+            blob = self.blobs.get(key)
+            if blob is not None:
+                self.blobs.move_to_end(key)
+            return blob
+
+    def put(self, key, blob):
+        """Cache a blob, evicting the least recently used blobs until the cache fits its size again."""
+        with self.lock:
+            if key in self.blobs:
+                self.num_bytes -= len(self.blobs.pop(key))
+            if len(blob) > self.max_bytes:
+                return
+            self.blobs[key] = blob
+            self.num_bytes += len(blob)
+            while self.num_bytes > self.max_bytes:
+                old_key, old_blob = self.blobs.popitem(last=False)
+                self.num_bytes -= len(old_blob)
+
+
+class Archives:
+    """The directories of all archives read so far, and a cache of the files decompressed from them.
+
+    A directory is read again when the modification time of its archive changes.
+    The archives in each data directory are listed once per import."""
+
+    def __init__(self, max_cache_bytes=MAX_CACHE_BYTES):
+        # absolute path -> archive, or None if it could not be read
+        self.archives = {}
+        # absolute data directory -> its archives, listed during this import
+        self.data_dirs = {}
+        self.blobs = BlobCache(max_cache_bytes)
+        self.lock = threading.Lock()
+
+    def get(self, filepath):
+        """Get the archive at a path; None if it cannot be read."""
+        filepath = os.path.abspath(filepath)
+        try:
+            mtime = os.stat(filepath).st_mtime
+        except OSError:
+            return None
+        with self.lock:
+            if filepath in self.archives:
+                archive = self.archives[filepath]
+                if archive is None or archive.mtime == mtime:
+                    return archive
+            try:
+                archive = open_archive(filepath)
+            except (OSError, NifError) as e:
+                NifLog.warn("Could not read archive {0}: {1}".format(filepath, e))
+                archive = None
+            else:
+                NifLog.debug("Read directory of {0} files in {1}".format(len(archive), filepath))
+            self.archives[filepath] = archive
+            return archive
+
+    def invalidate(self):
+        """List the archives of each data directory again on their next use, as archives may have changed."""
+        with self.lock:
+            self.data_dirs = {}
+
+    def get_archives(self, data_dir):
+        """Get the archives in a data directory, in alphabetical order."""
+        data_dir = os.path.abspath(data_dir)
+        with self.lock:
+            archives = self.data_dirs.get(data_dir)
+        if archives is not None:
+            return archives
+        try:
+            file_names = sorted(os.listdir(data_dir), key=str.lower)
+        except OSError:
+            file_names = []
+        archives = (self.get(os.path.join(data_dir, file_name)) for file_name in file_names
+                    if os.path.splitext(file_name)[1].lower() in ARCHIVE_EXTENSIONS)
+        archives = [archive for archive in archives if archive]
+        with self.lock:
+            self.data_dirs[data_dir] = archives
+        return archives
+
+    def find(self, data_dir, paths):
+        """Get the files in the archives of a data directory, in the order of the given candidate paths,
+        as (archive, path) tuples; each path is taken from the first archive that holds it."""
+        archives = self.get_archives(data_dir)
+        found = []
+        for path in paths:
+            key = get_key(path)
+            for archive in archives:
+                if key in archive.entries:
+                    found.append((archive, path))
+                    break
+        return found
+
+    def read(self, archive, path):
+        """Read a file from an archive, through the cache of decompressed files."""
+        blob_key = (archive.filepath, archive.mtime, get_key(path))
+        blob = self.blobs.get(blob_key)
+        if blob is None:
+            blob = archive.read(path)
+            self.blobs.put(blob_key, blob)
+        return blob
+
+    @staticmethod
+    def split_path(filepath):
+        """Split a path that runs through an archive, such as Data/Meshes.bsa/meshes/chair.nif,
+        into the path of the archive and the path of the file in the archive; (None, None) if there is no archive."""
+        parts = re.split(r'[\\/]', filepath)
+        for i in range(1, len(parts)):
+            archive_path = os.sep.join(parts[:i])
+            if os.path.splitext(archive_path)[1].lower() in ARCHIVE_EXTENSIONS and os.path.isfile(archive_path):
+                return archive_path, '/'.join(parts[i:])
+        return None, None
+
+    def open(self, filepath):
+        """Open a file on disk, or a file in an archive, for binary reading."""
+        if not os.path.isfile(filepath):
+            archive_path, path = self.split_path(filepath)
+            archive = self.get(archive_path) if archive_path else None
+            if archive and path in archive:
+                return io.BytesIO(self.read(archive, path))
+        return open(filepath, "rb")
+
+    @staticmethod
+    def get_data_dir(filepath):
+        """Guess the data directory of a game from the path of a file in it: the directory of the archive that holds
+        the file, or the parent of its meshes or textures folder; None if there is no such folder."""
+        archive_path, path = Archives.split_path(filepath)
+        if archive_path:
+            return os.path.dirname(os.path.abspath(archive_path))
+        head = os.path.dirname(os.path.abspath(filepath))
+        while True:
+            parent, tail = os.path.split(head)
+            if tail.lower() in ('meshes', 'textures'):
+                return parent
+            if parent == head:
+                return None
+            head = parent
+
+
+archives = Archives()
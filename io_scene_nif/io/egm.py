@@ -37,6 +37,7 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import numpy as np
 
 from pyffi.formats.egm import EgmFormat
 from io_scene_nif.utils.util_logging import NifLog
@@ -68,3 +69,29 @@ class EGMFile:
                 raise NifError("Not a EGM file.")
 
         return egm_file
+
+    @staticmethod
+    def get_relative_vertices(morph):
+        """Decode the relative vertices of an egm morph as an (n, 3) float32 array."""
+        packed = np.array([(vert.x, vert.y, vert.z) for vert in morph.vertices], dtype=np.float32).reshape(-1, 3)
+        return packed * np.float32(morph.scale)
+
+    @staticmethod
+    def set_relative_vertices(morph, relative_vertices):
+        """Encode an (n, 3) array of relative vertices into an egm morph, same packing as pyffi."""
+        relative_vertices = np.asarray(relative_vertices, dtype=np.float32).reshape(-1, 3)
+        if len(relative_vertices) != len(morph.vertices):
+            raise NifError("Expected {0} egm morph vertices, but got {1}.".format(len(morph.vertices), len(relative_vertices)))
+
+        max_value = float(np.abs(relative_vertices).max()) if len(relative_vertices) else 0.0
+        morph.scale = max_value / 32767.0
+        if max_value > 0.0:
+            # truncate towards zero, as pyffi does
+            packed = (relative_vertices / np.float32(morph.scale)).astype(np.int16)
+        else:
+            packed = np.zeros(relative_vertices.shape, dtype=np.int16)
+
+        for vert, (x, y, z) in zip(morph.vertices, packed.tolist()):
+            vert.x = x
+            vert.y = y
+            vert.z = z
@@ -0,0 +1,145 @@
+"""This module reads the size, format, mipmap count and alpha of image files from their headers, without decoding them."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import struct
+
+from io_scene_nif.io.archive import DDPF_ALPHAPIXELS, DDPF_FOURCC, DDPF_LUMINANCE, DDSD_MIPMAPCOUNT
+
+# the image formats whose headers are read
+HEADER_EXTENSIONS = ('.dds', '.tga', '.png')
+
+# enough for the dds header and its dx10 extension
+HEADER_SIZE = 148
+
+# dxgi formats with an alpha channel
+DXGI_ALPHA_FORMATS = {2, 10, 11, 28, 29, 74, 75, 77, 78, 87, 91}
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# png color types with an alpha channel
+PNG_ALPHA_COLOR_TYPES = (4, 6)
+
+
+class ImageInfo:
+    """What an image header tells about the image."""
+
+    def __init__(self, width, height, image_format, num_mipmaps=1, has_alpha=False):
+        self.width = width
+        self.height = height
+        self.image_format = image_format
+        self.num_mipmaps = num_mipmaps
+        self.has_alpha = has_alpha
+
+    def __eq__(self, other):
+        return isinstance(other, ImageInfo) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return "ImageInfo({width}x{height} {image_format}, {num_mipmaps} mipmaps, alpha {has_alpha})".format(**vars(self))
+
+    def is_power_of_two(self):
+        return all(size > 0 and not size & (size - 1) for size in (self.width, self.height))
+
+    def get_full_mipmap_count(self):
+        """Get the number of mipmaps of a full chain, down to 1 x 1."""
+        return max(self.width, self.height, 1).bit_length()
+
+
+def read_dds_info(header):
+    magic, size, flags, height, width, pitch, depth, num_mipmaps = struct.unpack_from('<4sIIIIIII', header)
+    if magic != b'DDS ' or size != 124:
+        return None
+    pixel_flags, fourcc, bits, r_mask, g_mask, b_mask, a_mask = struct.unpack_from('<I4sIIIII', header, 80)
+    if not flags & DDSD_MIPMAPCOUNT:
+        num_mipmaps = 1
+    if pixel_flags & DDPF_FOURCC:
+        if fourcc == b'DX10':
+            dxgi_format, = struct.unpack_from('<I', header, 128)
+            return ImageInfo(width, height, "DXGI {0}".format(dxgi_format), max(1, num_mipmaps), dxgi_format in DXGI_ALPHA_FORMATS)
+        image_format = fourcc.decode('ascii', 'replace')
+        has_alpha = image_format in ('DXT2', 'DXT3', 'DXT4', 'DXT5')
+    else:
+        has_alpha = bool(pixel_flags & DDPF_ALPHAPIXELS and a_mask)
+        if pixel_flags & DDPF_LUMINANCE:
+            image_format = "L{0}".format(bits)
+        else:
+            image_format = "{0}{1}".format("RGBA" if has_alpha else "RGB", bits)
+    return ImageInfo(width, height, image_format, max(1, num_mipmaps), has_alpha)
+
+
+def read_tga_info(header):
+    if len(header) < 18:
+        return None
+    image_type = header[2]
+    width, height, depth, descriptor = struct.unpack_from('<HHBB', header, 12)
+    # color mapped, true color and grayscale, each possibly run length encoded
+    if image_type not in (1, 2, 3, 9, 10, 11):
+        return None
+    return ImageInfo(width, height, "TGA{0}".format(depth), 1, bool(descriptor & 0xF) or depth == 32)
+
+
+def read_png_info(header):
+    if not header.startswith(PNG_SIGNATURE) or header[12:16] != b'IHDR':
+        return None
+    width, height, bit_depth, color_type = struct.unpack_from('>IIBB', header, 16)
+    return ImageInfo(width, height, "PNG{0}".format(bit_depth), 1, color_type in PNG_ALPHA_COLOR_TYPES)
+
+
+HEADER_READERS = {'.dds': read_dds_info, '.tga': read_tga_info, '.png': read_png_info}
+
+
+def read_image_info(header, ext):
+    """Get the info of an image from the start of its file.
+    :return The info, or None if the format is not supported or the header is broken.
+    """
+    reader = HEADER_READERS.get(ext.lower())
+    if not reader:
+        return None
+    try:
+        return reader(header)
+    except struct.error:
+        return None
+
+
+def read_image_file_info(filepath, ext):
+    """Read the info of an image file from its header only."""
+    try:
+        with open(filepath, "rb") as stream:
+            return read_image_info(stream.read(HEADER_SIZE), ext)
+    except OSError:
+        return None
@@ -40,6 +40,7 @@
 
 from pyffi.formats.nif import NifFormat
 
+from io_scene_nif.io.archive import archives
 from io_scene_nif.utils.util_logging import NifLog
 from io_scene_nif.utils.util_math import NifError
 
@@ -49,13 +50,13 @@ class NifFile:
 
     @staticmethod
     def load_nif(file_path):
-        """Loads a nif from the given file path"""
+        """Loads a nif from the given file path, which may run through a bsa or ba2 archive"""
         NifLog.info("Importing {0}".format(file_path))
 
         data = NifFormat.Data()
 
-        # open file for binary reading
-        with open(file_path, "rb") as nif_stream:
+        # open file for binary reading, from disk or from an archive
+        with archives.open(file_path) as nif_stream:
             # check if nif file is valid
             data.inspect_version_only(nif_stream)
             if data.version >= 0:
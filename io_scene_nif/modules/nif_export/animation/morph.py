@@ -40,7 +40,9 @@
 from pyffi.formats.nif import NifFormat
 from pyffi.formats.egm import EgmFormat
 
+from io_scene_nif.io.egm import EGMFile
 from io_scene_nif.modules.nif_export.animation import Animation
+from io_scene_nif.utils import util_math
 from io_scene_nif.utils.util_global import EGMData
 
 from io_scene_nif.modules.nif_export.block_registry import block_store
@@ -75,6 +77,7 @@ class MorphAnimation(Animation):
 
     def export_egm(self, key_blocks):
         EGMData.data = EgmFormat.Data(num_vertices=len(key_blocks[0].data))
+        base_verts = util_math.get_b_coords(key_blocks[0].data)
         for key_block in key_blocks:
             if key_block.name.startswith("EGM SYM"):
                 morph = EGMData.data.add_sym_morph()
@@ -83,12 +86,8 @@ class MorphAnimation(Animation):
             else:
                 continue
             NifLog.info("Exporting morph {0} to egm".format(key_block.name))
-            relative_vertices = []
-
             # note: key_blocks[0] is base b_key
-            for vert, key_vert in zip(key_blocks[0].data, key_block.data):
-                relative_vertices.append(key_vert - vert)
-            morph.set_relative_vertices(relative_vertices)
+            EGMFile.set_relative_vertices(morph, util_math.get_b_coords(key_block.data) - base_verts)
 
     def export_morph_animation(self, b_mesh, b_key, n_trishape, vertmap):
         
@@ -37,6 +37,8 @@
 #
 # ***** END LICENSE BLOCK *****
 
+from io_scene_nif.modules.nif_export.collision.bounds import bounds_cache
+
 # dictionary mapping bhkRigidBody objects to objects imported in Blender;
 # we use this dictionary to set the physics constraints (ragdoll etc)
 DICT_HAVOK_OBJECTS = {}
@@ -52,12 +54,5 @@ class Collision:
 
     @staticmethod
     def calculate_box_extents(b_obj):
-        # calculate bounding box extents
-        b_vertlist = [vert.co for vert in b_obj.data.vertices]
-        minx = min([b_vert[0] for b_vert in b_vertlist])
-        maxx = max([b_vert[0] for b_vert in b_vertlist])
-        maxy = max([b_vert[1] for b_vert in b_vertlist])
-        miny = min([b_vert[1] for b_vert in b_vertlist])
-        minz = min([b_vert[2] for b_vert in b_vertlist])
-        maxz = max([b_vert[2] for b_vert in b_vertlist])
-        return [[minx, maxx], [miny, maxy], [minz, maxz]]
\ No newline at end of file
+        """Get the [[minx, maxx], [miny, maxy], [minz, maxz]] bounding box of a mesh's vertices, cached per export."""
+        return bounds_cache.get(b_obj).extents
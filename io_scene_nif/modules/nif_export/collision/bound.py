@@ -38,10 +38,13 @@
 # ***** END LICENSE BLOCK *****
 
 import mathutils
+import numpy as np
 
 from io_scene_nif.modules.nif_export.block_registry import block_store
 from io_scene_nif.modules.nif_export.collision import Collision
+from io_scene_nif.modules.nif_export.collision.bounds import bounds_cache
 from io_scene_nif.utils import util_math
+from io_scene_nif.utils.util_global import NifOp
 
 
 class BSBound(Collision):
@@ -125,12 +128,13 @@ class NiCollision(Collision):
 
         n_bv.collision_type = 0
         matrix = util_math.get_object_bind(b_obj)
-        center = matrix.translation
-        n_bv.sphere.radius = b_obj.dimensions.x / 2
+
+        # the bounding sphere of the vertices, with the object's transform applied
+        center, radius = bounds_cache.get(b_obj).sphere
+        transform = np.array(matrix)
+        n_bv.sphere.radius = float(radius * np.linalg.norm(transform[:3, :3], ord=2))
         sphere_center = n_bv.sphere.center
-        sphere_center.x = center.x
-        sphere_center.y = center.y
-        sphere_center.z = center.z
+        sphere_center.x, sphere_center.y, sphere_center.z = (transform[:3, :3] @ center + transform[:3, 3]).tolist()
 
     def export_boxbv(self, b_obj, n_bv):
         """ Export b_obj as a NiCollisionData's bounding_volume box """
@@ -158,6 +162,18 @@ class NiCollision(Collision):
         box_extent[1] = extent.y
         box_extent[2] = extent.z
 
+        if NifOp.props.use_minimal_obb:
+            # rotate the box to fit the vertices tightly, with the object's transform applied
+            obb_center, obb_axes, obb_half_extents = bounds_cache.get(b_obj).get_obb()
+            transform = np.array(matrix)
+            box_center.x, box_center.y, box_center.z = (transform[:3, :3] @ obb_center + transform[:3, 3]).tolist()
+            obb_axes = obb_axes @ transform[:3, :3].T
+            scales = np.linalg.norm(obb_axes, axis=1)
+            for n_axis, (x, y, z) in zip(axis, (obb_axes / scales[:, np.newaxis]).tolist()):
+                n_axis.x, n_axis.y, n_axis.z = x, y, z
+            for i, extent in enumerate((obb_half_extents * scales).tolist()):
+                box_extent[i] = extent
+
     def export_capsulebv(self, b_obj, n_bv):
         """ Export b_obj as a NiCollisionData's bounding_volume capsule """
 
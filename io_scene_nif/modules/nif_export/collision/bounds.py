@@ -0,0 +1,192 @@
+"""This script computes and caches the bounds of mesh objects, for all collision and bounds exporters."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy as np
+
+from io_scene_nif.utils import util_hull, util_math
+
+
+def get_2d_hull(points):
+    """Get the (k, 2) convex hull of (n, 2) points, counter clockwise, by Andrew's monotone chain."""
+    points = np.unique(np.asarray(points, dtype=np.float64).reshape(-1, 2), axis=0)
+    if len(points) < 3:
+        return points
+
+    def half_hull(sorted_points):
+        hull = []
+        for point in sorted_points.tolist():
+            while len(hull) >= 2 and ((hull[-1][0] - hull[-2][0]) * (point[1] - hull[-2][1])
+                                      - (hull[-1][1] - hull[-2][1]) * (point[0] - hull[-2][0])) <= 0:
+                hull.pop()
+            hull.append(point)
+        return hull[:-1]
+
+    return np.array(half_hull(points) + half_hull(points[::-1]))
+
+
+def get_min_area_rectangle(points):
+    """Find the rectangle of least area around (n, 2) points, which has a side along an edge of their hull.
+
+    :return: The area, and the (2, 2) unit axes of the rectangle as rows.
+    """
+    hull = get_2d_hull(points)
+    if len(hull) < 3:
+        return 0.0, np.identity(2)
+    edges = np.roll(hull, -1, axis=0) - hull
+    edges /= np.linalg.norm(edges, axis=1)[:, np.newaxis]
+    # coordinates of each hull point along each edge and its perpendicular
+    along = hull @ edges.T
+    across = hull @ np.column_stack((-edges[:, 1], edges[:, 0])).T
+    areas = np.ptp(along, axis=0) * np.ptp(across, axis=0)
+    best = areas.argmin()
+    edge = edges[best]
+    return areas[best], np.array((edge, (-edge[1], edge[0])))
+
+
+def get_perpendicular_axes(normal):
+    """Get two unit vectors that are perpendicular to a unit normal and to each other."""
+    helper = (1.0, 0.0, 0.0) if abs(normal[0]) < 0.9 else (0.0, 1.0, 0.0)
+    u_axis = np.cross(normal, helper)
+    u_axis /= np.linalg.norm(u_axis)
+    return u_axis, np.cross(normal, u_axis)
+
+
+class Bounds:
+    """The axis aligned box, sphere and oriented box around the vertices of a mesh, in its local space."""
+
+    def __init__(self, coords):
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 3)
+        if len(self.coords):
+            self.minimum = self.coords.min(axis=0)
+            self.maximum = self.coords.max(axis=0)
+        else:
+            self.minimum = self.maximum = np.zeros(3)
+        self._sphere = None
+        self._obb = None
+
+    @property
+    def extents(self):
+        """The [[minx, maxx], [miny, maxy], [minz, maxz]] of the axis aligned bounding box."""
+        return np.column_stack((self.minimum, self.maximum)).tolist()
+
+    @property
+    def center(self):
+        return (self.minimum + self.maximum) * 0.5
+
+    @property
+    def half_extents(self):
+        return (self.maximum - self.minimum) * 0.5
+
+    @property
+    def sphere(self):
+        """The center and radius of a sphere around the box center, that holds all vertices."""
+        if self._sphere is None:
+            center = self.center
+            radius = np.linalg.norm(self.coords - center, axis=1).max() if len(self.coords) else 0.0
+            self._sphere = center, float(radius)
+        return self._sphere
+
+    def get_obb(self):
+        """Get the smallest oriented bounding box that has a face on a face of the convex hull, which is tight for the
+        boxes, crates and rocks used as colliders. Flat meshes have no hull, so their box is along their principal axes.
+
+        :return: The center, the (3, 3) unit axes as rows of a proper rotation, and the half extents along them.
+        """
+        if self._obb is None:
+            axes = self.get_minimal_axes()
+            if axes is None:
+                axes = self.get_principal_axes()
+            if len(self.coords):
+                projected = self.coords @ axes.T
+                minimum, maximum = projected.min(axis=0), projected.max(axis=0)
+            else:
+                minimum = maximum = np.zeros(3)
+            self._obb = (((minimum + maximum) * 0.5) @ axes, axes, (maximum - minimum) * 0.5)
+        return self._obb
+
+    def get_principal_axes(self):
+        if len(self.coords) < 2:
+            return np.identity(3)
+        eigenvalues, eigenvectors = np.linalg.eigh(np.cov(self.coords, rowvar=False))
+        # largest axis first, right handed
+        axes = eigenvectors[:, ::-1].T
+        if np.linalg.det(axes) < 0:
+            axes[2] = -axes[2]
+        return axes
+
+    def get_minimal_axes(self):
+        """Find the axes of the smallest box that has a face on a face of the convex hull, None for flat meshes."""
+        vertices, triangles = util_hull.get_hull(self.coords)
+        if not len(triangles):
+            return None
+        normals, distances = util_hull.get_planes(vertices, triangles)
+        best_volume, best_axes = np.inf, None
+        for normal in normals:
+            u_axis, v_axis = get_perpendicular_axes(normal)
+            height = np.ptp(vertices @ normal)
+            area, rectangle_axes = get_min_area_rectangle(vertices @ np.column_stack((u_axis, v_axis)))
+            if area * height < best_volume:
+                best_volume = area * height
+                in_plane = rectangle_axes @ np.array((u_axis, v_axis))
+                best_axes = np.array((in_plane[0], in_plane[1], np.cross(in_plane[0], in_plane[1])))
+        return best_axes
+
+
+class BoundsCache:
+    """Bounds of mesh objects, computed once per export from a single foreach_get of their coordinates.
+
+    Entries are keyed by object and mesh data, and the cache is cleared at the start of every export, as the mesh
+    data may have changed since."""
+
+    def __init__(self):
+        self.bounds = {}
+
+    def clear(self):
+        self.bounds = {}
+
+    def get(self, b_obj):
+        b_mesh = b_obj.data
+        key = (b_obj.as_pointer(), b_mesh.as_pointer(), len(b_mesh.vertices))
+        bounds = self.bounds.get(key)
+        if bounds is None:
+            bounds = self.bounds[key] = Bounds(util_math.get_b_coords(b_mesh.vertices))
+        return bounds
+
+
+bounds_cache = BoundsCache()
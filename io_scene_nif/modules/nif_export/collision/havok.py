@@ -38,12 +38,14 @@
 # ***** END LICENSE BLOCK *****
 import bpy
 import mathutils
+import numpy as np
 
 from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.modules.nif_export.block_registry import block_store
 from io_scene_nif.modules.nif_export.collision import Collision
-from io_scene_nif.utils import util_math, util_consts
+from io_scene_nif.modules.nif_export.collision.bounds import bounds_cache
+from io_scene_nif.utils import util_math, util_consts, util_hull
 from io_scene_nif.utils.util_global import NifOp
 from io_scene_nif.utils.util_logging import NifLog
 
@@ -311,6 +313,17 @@ class BhkCollision(Collision):
 
         return colhull
 
+    def set_obb_transform(self, b_obj, n_coltf, center, axes):
+        """Set the transform of a bhkConvexTransformShape to an oriented box in the space of b_obj."""
+        # pyffi matrices act on row vectors, from box space to object space and then to parent space
+        transform = np.array(util_math.get_object_matrix(b_obj).as_list())
+        rotation = axes @ transform[:3, :3]
+        translation = (center @ transform[:3, :3] + transform[3, :3]) / self.HAVOK_SCALE
+        rows = np.identity(4)
+        rows[:3, :3] = rotation
+        rows[3, :3] = translation
+        n_coltf.transform.set_rows(*rows.tolist())
+
     def export_collision_object(self, b_obj, layer, n_havok_mat):
         """Export object obj as box, sphere, capsule, or convex hull.
         Note: polyheder is handled by export_collision_packed."""
@@ -393,6 +406,11 @@ class BhkCollision(Collision):
                 dims.x = (box_extends[0][1] - box_extends[0][0]) / (2.0 * self.HAVOK_SCALE)
                 dims.y = (box_extends[1][1] - box_extends[1][0]) / (2.0 * self.HAVOK_SCALE)
                 dims.z = (box_extends[2][1] - box_extends[2][0]) / (2.0 * self.HAVOK_SCALE)
+                if NifOp.props.use_minimal_obb:
+                    # rotate the box to fit the vertices tightly, rather than aligning it with the object
+                    center, axes, half_extents = bounds_cache.get(b_obj).get_obb()
+                    self.set_obb_transform(b_obj, n_coltf, center, axes)
+                    dims.x, dims.y, dims.z = (half_extents / self.HAVOK_SCALE).tolist()
                 n_colbox.minimum_size = min(dims.x, dims.y, dims.z)
 
             elif b_obj.game.collision_bounds_type == 'SPHERE':
@@ -400,8 +418,8 @@ class BhkCollision(Collision):
                 n_coltf.shape = n_colsphere
                 # n_colsphere.material = n_havok_mat[0]
                 # TODO [object][collision] find out what this is: fix for havok coordinate system (6 * 7 = 42)
-                # take average radius
-                n_colsphere.radius = radius
+                # the transform points to the center of the box, which is also the center of the bounding sphere
+                n_colsphere.radius = bounds_cache.get(b_obj).sphere[1] / self.HAVOK_SCALE
 
             return n_coltf
 
@@ -444,45 +462,16 @@ class BhkCollision(Collision):
             return n_col_caps
 
         elif b_obj.game.collision_bounds_type == 'CONVEX_HULL':
-            b_mesh = b_obj.data
-            b_transform_mat = mathutils.Matrix(util_math.get_object_matrix(b_obj).as_list())
-
-            b_rot_quat = b_transform_mat.decompose()[1]
-            b_scale_vec = b_transform_mat.decompose()[0]
-            '''
-            scale = math.avg(b_scale_vec.to_tuple())
-            if scale < 0:
-                scale = - (-scale) ** (1.0 / 3)
-            else:
-                scale = scale ** (1.0 / 3)
-            rotation /= scale
-            '''
-
-            # calculate vertices, normals, and distances
-            vertlist = [b_transform_mat * vert.co for vert in b_mesh.vertices]
-            fnormlist = [b_rot_quat * b_face.normal for b_face in b_mesh.polygons]
-            fdistlist = [(b_transform_mat * (-1 * b_mesh.vertices[b_mesh.polygons[b_face.index].vertices[0]].co)).dot(b_rot_quat.to_matrix() * b_face.normal) for b_face in b_mesh.polygons]
-
-            # remove duplicates through dictionary
-            vertdict = {}
-            for i, vert in enumerate(vertlist):
-                vertdict[(int(vert[0] * util_consts.VERTEX_RESOLUTION),
-                          int(vert[1] * util_consts.VERTEX_RESOLUTION),
-                          int(vert[2] * util_consts.VERTEX_RESOLUTION))] = i
-
-            fdict = {}
-            for i, (norm, dist) in enumerate(zip(fnormlist, fdistlist)):
-                fdict[(int(norm[0] * util_consts.NORMAL_RESOLUTION),
-                       int(norm[1] * util_consts.NORMAL_RESOLUTION),
-                       int(norm[2] * util_consts.NORMAL_RESOLUTION),
-                       int(dist * util_consts.VERTEX_RESOLUTION))] = i
-
-            # sort vertices and normals
-            vertkeys = sorted(vertdict.keys())
-            fkeys = sorted(fdict.keys())
-            vertlist = [vertlist[vertdict[hsh]] for hsh in vertkeys]
-            fnormlist = [fnormlist[fdict[hsh]] for hsh in fkeys]
-            fdistlist = [fdistlist[fdict[hsh]] for hsh in fkeys]
+            # pyffi matrices act on row vectors
+            transform = np.array(util_math.get_object_matrix(b_obj).as_list())
+            vertices = util_math.get_b_coords(b_obj.data.vertices).astype(np.float64) @ transform[:3, :3] + transform[3, :3]
+
+            # the hull of the vertices, with its coplanar triangles merged into planes
+            vertices, triangles = util_hull.get_hull(vertices, util_hull.MAX_VERTICES)
+            normals, distances = util_hull.get_planes(vertices, triangles)
+            vertlist = vertices.tolist()
+            fnormlist = normals.tolist()
+            fdistlist = distances.tolist()
 
             if len(fnormlist) > 65535 or len(vertlist) > 65535:
                 raise util_math.NifError("Mesh has too many polygons/vertices. Simply/split your mesh and try again.")
@@ -515,26 +504,73 @@ class BhkCollision(Collision):
             # if not isinstance(n_col_shape, NifFormat.bhkPackedNiTriStripsShape):
             #     raise ValueError('Not a packed list of collisions')
 
-        b_mesh = b_obj.data
-        transform = mathutils.Matrix(util_math.get_object_matrix(b_obj).as_list())
-        rotation = transform.decompose()[1]
-
-        vertices = [vert.co * transform for vert in b_mesh.vertices]
-        triangles = []
-        normals = []
-        for face in b_mesh.polygons:
-            if len(face.vertices) < 3:
-                continue  # ignore degenerate polygons
-            triangles.append([face.vertices[i] for i in (0, 1, 2)])
-            normals.append(rotation * face.normal)
-            if len(face.vertices) == 4:
-                triangles.append([face.vertices[i] for i in (0, 2, 3)])
-                normals.append(rotation * face.normal)
+        vertices, triangles, normals = self.get_packed_geometry(b_obj)
 
         # TODO [collision][havok] Redo this as a material lookup
         havok_mat = NifFormat.HavokMaterial()
         havok_mat.material = n_havok_mat
-        n_col_shape.add_shape(triangles, normals, vertices, layer, havok_mat.material)
+        self.add_packed_shape(b_obj, n_col_shape, vertices, triangles, normals, layer, havok_mat.material)
+
+    def get_packed_geometry(self, b_obj):
+        """Get the welded vertices in havok space, the triangles and their normals of a mesh, as numpy arrays.
+
+        Polygons of any size are split along the mesh's loop triangles."""
+        b_mesh = b_obj.data
+        b_mesh.calc_loop_triangles()
+        num_triangles = len(b_mesh.loop_triangles)
+        triangles = np.empty(num_triangles * 3, dtype=np.int64)
+        b_mesh.loop_triangles.foreach_get("vertices", triangles)
+        polygon_indices = np.empty(num_triangles, dtype=np.int64)
+        b_mesh.loop_triangles.foreach_get("polygon_index", polygon_indices)
+        polygon_normals = np.empty(len(b_mesh.polygons) * 3, dtype=np.float32)
+        b_mesh.polygons.foreach_get("normal", polygon_normals)
+
+        # pyffi matrices act on row vectors, normals transform by the inverse transpose
+        transform = np.array(util_math.get_object_matrix(b_obj).as_list())
+        vertices = util_math.get_b_coords(b_mesh.vertices).astype(np.float64) @ transform[:3, :3] + transform[3, :3]
+        normals = polygon_normals.reshape(-1, 3)[polygon_indices] @ np.linalg.inv(transform[:3, :3]).T
+        lengths = np.linalg.norm(normals, axis=1)
+        normals[lengths > 0] /= lengths[lengths > 0, np.newaxis]
+
+        # weld vertices that share a position, and drop the triangles that collapse
+        keys = np.rint(vertices * util_consts.VERTEX_RESOLUTION).astype(np.int64)
+        unique_keys, first_indices, vertex_map = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        triangles = vertex_map.ravel()[triangles].reshape(-1, 3)
+        valid = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 2] != triangles[:, 0])
+        if not valid.all():
+            NifLog.info("Dropped {0} degenerate collision triangles of {1}".format(np.count_nonzero(~valid), b_obj.name))
+        return vertices[first_indices] / self.HAVOK_SCALE, triangles[valid], normals[valid]
+
+    @staticmethod
+    def add_packed_shape(b_obj, n_col_shape, vertices, triangles, normals, layer, material):
+        """Append a sub shape to a bhkPackedNiTriStripsShape, as its add_shape does, from vertices already in havok space."""
+        if not n_col_shape.data:
+            n_col_shape.data = block_store.create_block("hkPackedNiTriStripsData", b_obj)
+        n_data = n_col_shape.data
+        num_shapes = n_col_shape.num_sub_shapes
+        n_col_shape.num_sub_shapes = num_shapes + 1
+        n_col_shape.sub_shapes.update_size()
+        n_data.num_sub_shapes = num_shapes + 1
+        n_data.sub_shapes.update_size()
+        for n_sub_shape in (n_col_shape.sub_shapes[num_shapes], n_data.sub_shapes[num_shapes]):
+            n_sub_shape.layer = layer
+            n_sub_shape.num_vertices = len(vertices)
+            n_sub_shape.material.material = material
+
+        first_triangle = n_data.num_triangles
+        first_vertex = n_data.num_vertices
+        n_data.num_triangles += len(triangles)
+        n_data.triangles.update_size()
+        for n_tri, (v_1, v_2, v_3), (x, y, z) in zip(n_data.triangles[first_triangle:], (triangles + first_vertex).tolist(), normals.tolist()):
+            n_tri.triangle.v_1 = v_1
+            n_tri.triangle.v_2 = v_2
+            n_tri.triangle.v_3 = v_3
+            n_tri.normal.x = x
+            n_tri.normal.y = y
+            n_tri.normal.z = z
+        n_data.num_vertices += len(vertices)
+        n_data.vertices.update_size()
+        util_math.array_to_nif_vectors(vertices, n_data.vertices[first_vertex:])
 
     def export_collision_single(self, b_obj, n_col_body, layer, n_havok_mat):
         """Add collision object to n_col_body.
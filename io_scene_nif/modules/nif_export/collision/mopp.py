@@ -0,0 +1,150 @@
+"""This script contains a persistent cache of generated mopp data, to skip the mopp generator for unchanged collision."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import hashlib
+import json
+
+import numpy as np
+import pyffi.utils.mopp
+
+from io_scene_nif.utils.util_global import get_config_path
+from io_scene_nif.utils.util_logging import NifLog
+
+# bump when the layout of the cache entries changes, so old caches are discarded
+CACHE_VERSION = 1
+
+
+class MoppCache:
+    """Mopp data, origin, scale and welding info of bhkMoppBvTreeShapes, keyed by a hash of their packed geometry.
+
+    The cache is kept in memory only if there is no file to store it in."""
+
+    # oldest entries are dropped beyond this number
+    MAX_ENTRIES = 512
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath or get_config_path("mopp_cache.json")
+        if not self.filepath:
+            NifLog.warn("Could not find the Blender config directory, mopps are not cached between exports")
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.changed = False
+        self.load()
+
+    @staticmethod
+    def has_mopper():
+        """Whether the havok mopper is available, as it produces other mopps than pyffi's simple fallback."""
+        try:
+            pyffi.utils.mopp.getMopperPath()
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def get_key(n_mopp, havok_scale, has_mopper):
+        """Hash the scaled packed vertices, triangles and materials of a mopp's shape, with the havok scale."""
+        n_shape = n_mopp.shape
+        vertices = np.array([vert.as_tuple() for vert in n_shape.data.vertices], dtype='<f4')
+        triangles = np.array([(hktri.triangle.v_1, hktri.triangle.v_2, hktri.triangle.v_3)
+                              for hktri in n_shape.data.triangles], dtype='<u4')
+        materials = np.array([(sub_shape.material.material, sub_shape.num_vertices) for sub_shape in n_shape.get_sub_shapes()], dtype='<u4')
+        key = hashlib.sha1()
+        key.update(repr((CACHE_VERSION, float(havok_scale), has_mopper, vertices.shape, triangles.shape, materials.shape)).encode())
+        for array in (vertices, triangles, materials):
+            key.update(array.tobytes())
+        return key.hexdigest()
+
+    def load(self):
+        if not self.filepath:
+            return
+        try:
+            with open(self.filepath, "r") as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if cache.get("version") == CACHE_VERSION:
+            self.entries = cache.get("entries", {})
+
+    def save(self):
+        """Write the cache to disk, if any mopp was added to it."""
+        if not self.changed or not self.filepath:
+            return
+        while len(self.entries) > self.MAX_ENTRIES:
+            del self.entries[next(iter(self.entries))]
+        try:
+            with open(self.filepath, "w") as cache_file:
+                json.dump({"version": CACHE_VERSION, "entries": self.entries}, cache_file)
+        except OSError as e:
+            NifLog.warn("Could not write mopp cache {0}: {1}".format(self.filepath, e))
+        self.changed = False
+
+    def update_mopp(self, n_mopp, havok_scale):
+        """Update the mopp data of a bhkMoppBvTreeShape, from the cache if its geometry is known.
+
+        :return: Whether the mopp was taken from the cache.
+        """
+        key = self.get_key(n_mopp, havok_scale, self.has_mopper())
+        entry = self.entries.pop(key, None)
+        hit = entry is not None
+        if not hit:
+            self.misses += 1
+            n_mopp.update_mopp()
+            entry = {"origin": n_mopp.origin.as_tuple(),
+                     "scale": n_mopp.scale,
+                     "mopp": bytes(n_mopp.mopp_data).hex(),
+                     "welding": [hktri.welding_info for hktri in n_mopp.shape.data.triangles]}
+            self.changed = True
+        else:
+            self.hits += 1
+            n_mopp.origin.x, n_mopp.origin.y, n_mopp.origin.z = entry["origin"]
+            n_mopp.scale = entry["scale"]
+            mopp = bytes.fromhex(entry["mopp"])
+            n_mopp.mopp_data_size = len(mopp)
+            n_mopp.mopp_data.update_size()
+            for i, b in enumerate(mopp):
+                n_mopp.mopp_data[i] = b
+            for hktri, welding_info in zip(n_mopp.shape.data.triangles, entry["welding"]):
+                hktri.welding_info = welding_info
+        # most recently used last
+        self.entries[key] = entry
+        return hit
+
+    def log_stats(self):
+        NifLog.info("Mopp cache: {0} hits, {1} misses".format(self.hits, self.misses))
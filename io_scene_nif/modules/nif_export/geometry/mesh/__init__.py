@@ -38,11 +38,14 @@
 
 import bpy
 import mathutils
+import numpy as np
 
 from pyffi.formats.nif import NifFormat
 
 
 from io_scene_nif.modules.nif_export.geometry import mesh
+from io_scene_nif.modules.nif_export import types
+from io_scene_nif.modules.nif_export.geometry.mesh import simplify, skin_partition, tangent_space, tri_strips, vertex_cache
 from io_scene_nif.modules.nif_export.animation.material import MaterialAnimation
 from io_scene_nif.modules.nif_export.animation.morph import MorphAnimation
 from io_scene_nif.modules.nif_export.block_registry import block_store
@@ -501,202 +504,319 @@ class Mesh:
             if len(vertlist) == 0:
                 continue  # m_4444x: skip 'empty' material indices
 
-            # add NiTriShape's data
-            # NIF flips the texture V-coordinate (OpenGL standard)
-            if isinstance(trishape, NifFormat.NiTriShape):
-                tridata = block_store.create_block("NiTriShapeData", b_obj)
-            else:
-                tridata = block_store.create_block("NiTriStripsData", b_obj)
-            trishape.data = tridata
+            # generate the reduced levels of detail from the welded lists
+            lod_lists = []
+            if NifOp.props.lod_levels and n_parent and not isinstance(n_parent, NifFormat.RootCollisionNode):
+                lod_lists = self.get_lod_lists(b_obj, vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap)
 
-            # flags
-            if b_obj.niftools.consistency_flags in NifFormat.ConsistencyType._enumkeys:
-                cf_index = NifFormat.ConsistencyType._enumkeys.index(b_obj.niftools.consistency_flags)
-                tridata.consistency_flags = NifFormat.ConsistencyType._enumvalues[cf_index]
-            else:
-                tridata.consistency_flags = NifFormat.ConsistencyType.CT_STATIC
-                NifLog.warn("{0} has no consistency type set using default CT_STATIC.".format(b_obj))
-
-            # data
-            tridata.num_vertices = len(vertlist)
-            tridata.has_vertices = True
-            tridata.vertices.update_size()
-            for i, v in enumerate(tridata.vertices):
-                v.x = vertlist[i][0]
-                v.y = vertlist[i][1]
-                v.z = vertlist[i][2]
-            tridata.update_center_radius()
-
-            if mesh_hasnormals:
-                tridata.has_normals = True
-                tridata.normals.update_size()
-                for i, v in enumerate(tridata.normals):
-                    v.x = normlist[i][0]
-                    v.y = normlist[i][1]
-                    v.z = normlist[i][2]
-
-            if mesh_hasvcol:
-                tridata.has_vertex_colors = True
-                tridata.vertex_colors.update_size()
-                for i, v in enumerate(tridata.vertex_colors):
-                    v.r = vcollist[i][0]
-                    v.g = vcollist[i][1]
-                    v.b = vcollist[i][2]
-                    v.a = vcollist[i][3]
-
-            if mesh_uv_layers:
-                tridata.num_uv_sets = len(mesh_uv_layers)
-                tridata.bs_num_uv_sets = len(mesh_uv_layers)
-                if NifOp.props.game == 'FALLOUT_3':
-                    if len(mesh_uv_layers) > 1:
-                        raise util_math.NifError("Fallout 3 does not support multiple UV layers")
-                tridata.has_uv = True
-                tridata.uv_sets.update_size()
-                for j, uv_layer in enumerate(mesh_uv_layers):
-                    for i, uv in enumerate(tridata.uv_sets[j]):
-                        if len(uvlist[i]) == 0:
-                            continue  # skip non-uv textures
-                        uv.u = uvlist[i][j][0]
-                        uv.v = 1.0 - uvlist[i][j][1]  # opengl standard
-
-            # set triangles stitch strips for civ4
-            tridata.set_triangles(trilist, stitchstrips=NifOp.props.stitch_strips)
+            # reorder triangles for the vertex cache and vertices for fetch locality, keeping vertmap in sync
+            if NifOp.props.optimize_vertex_cache:
+                vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap = self.optimize_vertex_cache(
+                    vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap)
+                lod_lists = [self.optimize_vertex_cache(*lists) for lists in lod_lists]
 
-            # update tangent space (as binary extra data only for Oblivion)
-            # for extra shader texture games, only export it if those textures are actually exported
-            # (civ4 seems to be consistent with not using tangent space on non shadered nifs)
-            if mesh_uv_layers and mesh_hasnormals:
-                if NifOp.props.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM') or (NifOp.props.game in self.texture_helper.USED_EXTRA_SHADER_TEXTURES):
-                    trishape.update_tangent_space(as_extra=(NifOp.props.game == 'OBLIVION'))
-
-            # todo [mesh/object] use more sophisticated armature finding, also taking armature modifier into account
-            # now export the vertex weights, if there are any
-            if b_obj.parent and b_obj.parent.type == 'ARMATURE':
-                b_obj_armature = b_obj.parent
-                vertgroups = {vertex_group.name for vertex_group in b_obj.vertex_groups}
-                bone_names = set(b_obj_armature.data.bones.keys())
-                # the vertgroups that correspond to bone_names are bones that influence the mesh
-                boneinfluences = vertgroups & bone_names
-                if boneinfluences:  # yes we have skinning!
-                    # create new skinning instance block and link it
-                    n_root_name = block_store.get_full_name(b_obj_armature)
-                    skininst, skindata = self.create_skin_inst_data(b_obj, n_root_name)
-                    trishape.skin_instance = skininst
-
-                    # Vertex weights,  find weights and normalization factors
-                    vert_list = {}
-                    vert_norm = {}
-                    unassigned_verts = []
-
-                    for bone_group in boneinfluences:
-                        b_list_weight = []
-                        b_vert_group = b_obj.vertex_groups[bone_group]
-
-                        for b_vert in b_obj.data.vertices:
-                            if len(b_vert.groups) == 0:  # check vert has weight_groups
-                                unassigned_verts.append(b_vert)
-                                continue
-
-                            for g in b_vert.groups:
-                                if b_vert_group.name in boneinfluences:
-                                    if g.group == b_vert_group.index:
-                                        b_list_weight.append((b_vert.index, g.weight))
-                                        break
-
-                        vert_list[bone_group] = b_list_weight
-
-                        # create normalisation groupings
-                        for v in vert_list[bone_group]:
-                            if v[0] in vert_norm:
-                                vert_norm[v[0]] += v[1]
-                            else:
-                                vert_norm[v[0]] = v[1]
-
-                    self.select_unassigned_vertices(unassigned_verts)
-
-                    # for each bone, first we get the bone block then we get the vertex weights and then we add it to the NiSkinData
-                    # note: allocate memory for faster performance
-                    vert_added = [False for _ in range(len(vertlist))]
-                    for b_bone_name in boneinfluences:
-                        # find bone in exported blocks
-                        full_bone_name = block_store.get_full_name(b_obj_armature.data.bones[b_bone_name])
-                        bone_block = self.get_bone_block(full_bone_name)
-
-                        # find vertex weights
-                        vert_weights = {}
-                        for v in vert_list[b_bone_name]:
-                            # v[0] is the original vertex index
-                            # v[1] is the weight
-
-                            # vertmap[v[0]] is the set of vertices (indices) to which v[0] was mapped
-                            # so we simply export the same weight as the original vertex for each new vertex
-
-                            # write the weights
-                            # extra check for multi material meshes
-                            if vertmap[v[0]] and vert_norm[v[0]]:
-                                for vert_index in vertmap[v[0]]:
-                                    vert_weights[vert_index] = v[1] / vert_norm[v[0]]
-                                    vert_added[vert_index] = True
-                        # add bone as influence, but only if there were actually any vertices influenced by the bone
-                        if vert_weights:
-                            trishape.add_bone(bone_block, vert_weights)
-
-                    # update bind position skinning data
-                    trishape.update_bind_position()
-
-                    # calculate center and radius for each skin bone data block
-                    trishape.update_skin_center_radius()
-
-                    if NifData.data.version >= 0x04020100 and NifOp.props.skin_partition:
-                        NifLog.info("Creating skin partition")
-                        lostweight = trishape.update_skin_partition(
-                            maxbonesperpartition=NifOp.props.max_bones_per_partition,
-                            maxbonespervertex=NifOp.props.max_bones_per_vertex,
-                            stripify=NifOp.props.stripify,
-                            stitchstrips=NifOp.props.stitch_strips,
-                            padbones=NifOp.props.pad_bones,
-                            triangles=trilist,
-                            trianglepartmap=bodypartfacemap,
-                            maximize_bone_sharing=(NifOp.props.game in ('FALLOUT_3', 'SKYRIM')))
-
-                        # warn on bad config settings
-                        if NifOp.props.game == 'OBLIVION':
-                            if NifOp.props.pad_bones:
-                                NifLog.warn("Using padbones on Oblivion export. Disable the pad bones option to get higher quality skin partitions.")
-                        if NifOp.props.game in ('OBLIVION', 'FALLOUT_3'):
-                            if NifOp.props.max_bones_per_partition < 18:
-                                NifLog.warn("Using less than 18 bones per partition on Oblivion/Fallout 3 export."
-                                            "Set it to 18 to get higher quality skin partitions.")
-                        if NifOp.props.game in 'SKYRIM':
-                            if NifOp.props.max_bones_per_partition < 24:
-                                NifLog.warn("Using less than 24 bones per partition on Skyrim export."
-                                            "Set it to 24 to get higher quality skin partitions.")
-                        if lostweight > NifOp.props.epsilon:
-                            NifLog.warn("Lost {0} in vertex weights while creating a skin partition for Blender object '{1}' (nif block '{2}')".format(
-                                str(lostweight), b_obj.name, trishape.name))
-
-                    if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
-                        partitions = skininst.partitions
-                        b_obj_part_flags = b_obj.niftools_part_flags
-                        for s_part in partitions:
-                            s_part_index = NifFormat.BSDismemberBodyPartType._enumvalues.index(s_part.body_part)
-                            s_part_name = NifFormat.BSDismemberBodyPartType._enumkeys[s_part_index]
-                            for b_part in b_obj_part_flags:
-                                if s_part_name == b_part.name:
-                                    s_part.part_flag.pf_start_net_boneset = b_part.pf_startflag
-                                    s_part.part_flag.pf_editor_visible = b_part.pf_editorflag
-
-                    # clean up
-                    del vert_weights
-                    del vert_added
-
-            # fix data consistency type
-            tridata.consistency_flags = b_obj.niftools.consistency_flags
+            self.export_tri_shape_data(b_obj, trishape, vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap,
+                                       mesh_hasnormals, mesh_hasvcol, mesh_uv_layers)
 
             # export EGM or NiGeomMorpherController animation
             self.morph_anim.export_morph(b_mesh, trishape, vertmap)
+
+            if lod_lists:
+                self.export_lod_levels(b_obj, n_parent, trishape, lod_lists, mesh_hasnormals, mesh_hasvcol, mesh_uv_layers)
         return trishape
 
+    @staticmethod
+    def optimize_vertex_cache(vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap):
+        """Reorder triangles for the vertex cache and vertices for fetch locality, keeping vertmap in sync."""
+        triangle_order, vertex_order, trilist = vertex_cache.optimize_vertex_cache(
+            trilist, len(vertlist), NifOp.props.vertex_cache_size)
+        trilist = [tuple(triangle) for triangle in trilist.tolist()]
+        bodypartfacemap = [bodypartfacemap[i] for i in triangle_order]
+        vertlist, normlist, vcollist, uvlist = ([values[i] for i in vertex_order] if values else values
+                                                for values in (vertlist, normlist, vcollist, uvlist))
+        vertex_map = np.argsort(vertex_order)
+        vertmap = [vertex_map[n_v_indices].tolist() if n_v_indices else n_v_indices for n_v_indices in vertmap]
+        return vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap
+
+    def get_lod_lists(self, b_obj, vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap):
+        """Simplify the welded lists of a trishape into the lists of each reduced level of detail.
+
+        Vertices on uv seams, hard edges, mesh borders and body part boundaries are kept in place,
+        and vertices only collapse onto neighbours with similar skin weights."""
+        triangles = np.array(trilist, dtype=np.int64).reshape(-1, 3)
+        num_vertices = len(vertlist)
+        locked = simplify.get_locked_vertices(triangles, num_vertices, bodypartfacemap)
+        simplifier = simplify.Simplifier(vertlist, triangles, locked, self.get_skin_weight_array(b_obj, vertmap, num_vertices))
+
+        lod_lists = []
+        num_triangles = len(trilist)
+        for level in range(1, NifOp.props.lod_levels + 1):
+            lod_triangles, triangle_indices = simplifier.simplify(int(len(trilist) * NifOp.props.lod_reduction ** level))
+            if len(lod_triangles) >= num_triangles:
+                NifLog.warn("Could not reduce {0} any further than {1} triangles, skipped level of detail {2} and beyond.".format(
+                    b_obj.name, num_triangles, level))
+                break
+            num_triangles = len(lod_triangles)
+            NifLog.info("Level of detail {0} of {1} has {2} of {3} triangles.".format(level, b_obj.name, num_triangles, len(trilist)))
+
+            # keep only the vertices that are used, in their original order
+            vertex_order = np.unique(lod_triangles).tolist()
+            vertex_map = np.full(num_vertices, -1, dtype=np.int64)
+            vertex_map[vertex_order] = np.arange(len(vertex_order))
+            lod_vertmap = []
+            for n_v_indices in vertmap:
+                lod_v_indices = [index for index in vertex_map[n_v_indices].tolist() if index >= 0] if n_v_indices else []
+                lod_vertmap.append(lod_v_indices or None)
+            lod_lists.append(tuple([values[i] for i in vertex_order] if values else values
+                                   for values in (vertlist, normlist, vcollist, uvlist)) +
+                             ([tuple(triangle) for triangle in vertex_map[lod_triangles].tolist()],
+                              lod_vertmap,
+                              [bodypartfacemap[i] for i in triangle_indices.tolist()]))
+        return lod_lists
+
+    def get_skin_weight_array(self, b_obj, vertmap, num_vertices):
+        """Get the (num_vertices, num_bones) skin weights of the welded vertices, None if the mesh is not skinned."""
+        if not (b_obj.parent and b_obj.parent.type == 'ARMATURE'):
+            return None
+        boneinfluences = {vertex_group.name for vertex_group in b_obj.vertex_groups} & set(b_obj.parent.data.bones.keys())
+        if not boneinfluences:
+            return None
+        bone_weights, unassigned_verts = self.get_bone_weights(b_obj, boneinfluences, vertmap)
+        weights = np.zeros((num_vertices, len(bone_weights)))
+        for bone_index, vert_weights in enumerate(bone_weights.values()):
+            weights[list(vert_weights.keys()), bone_index] = list(vert_weights.values())
+        return weights
+
+    def export_lod_levels(self, b_obj, n_parent, trishape, lod_lists, mesh_hasnormals, mesh_hasvcol, mesh_uv_layers):
+        """Replace trishape by a NiLODNode, holding trishape as full detail level and a reduced trishape for each of the lod lists."""
+        lod_node = block_store.create_block("NiLODNode", b_obj)
+        lod_node.name = trishape.name.decode() + " LOD"
+        lod_node.flags = 0x000E  # default
+        lod_node.rotation.set_identity()
+        lod_node.scale = 1.0
+        n_parent.remove_child(trishape)
+        n_parent.add_child(lod_node)
+        lod_node.add_child(trishape)
+
+        for level, lod_list in enumerate(lod_lists, start=1):
+            lod_shape = block_store.create_block(trishape.__class__.__name__, b_obj)
+            lod_shape.name = trishape.name.decode() + " LOD{0}".format(level)
+            lod_shape.flags = trishape.flags
+            lod_shape.set_transform(trishape.get_transform())
+            # share the properties of the full detail level
+            for n_property in trishape.get_properties():
+                lod_shape.add_property(n_property)
+            for i, n_property in enumerate(trishape.bs_properties):
+                lod_shape.bs_properties[i] = n_property
+            self.export_tri_shape_data(b_obj, lod_shape, *lod_list, mesh_hasnormals, mesh_hasvcol, mesh_uv_layers)
+            lod_node.add_child(lod_shape)
+
+        # each level takes over where the previous one ends, with distance bands growing by a constant factor
+        distances = [0.0] + [NifOp.props.lod_distance * NifOp.props.lod_distance_factor ** level for level in range(len(lod_lists) + 1)]
+        center = trishape.data.center * trishape.get_transform()
+        types.export_lod_extents(lod_node, list(zip(distances[:-1], distances[1:])), b_obj, (center.x, center.y, center.z))
+
+    def export_tri_shape_data(self, b_obj, trishape, vertlist, normlist, vcollist, uvlist, trilist, vertmap, bodypartfacemap,
+                              mesh_hasnormals, mesh_hasvcol, mesh_uv_layers):
+        """Export the welded vertex and triangle lists of a trishape as its data block, along with its tangent space and skin."""
+        # add NiTriShape's data
+        # NIF flips the texture V-coordinate (OpenGL standard)
+        if isinstance(trishape, NifFormat.NiTriShape):
+            tridata = block_store.create_block("NiTriShapeData", b_obj)
+        else:
+            tridata = block_store.create_block("NiTriStripsData", b_obj)
+        trishape.data = tridata
+
+        # flags
+        if b_obj.niftools.consistency_flags in NifFormat.ConsistencyType._enumkeys:
+            cf_index = NifFormat.ConsistencyType._enumkeys.index(b_obj.niftools.consistency_flags)
+            tridata.consistency_flags = NifFormat.ConsistencyType._enumvalues[cf_index]
+        else:
+            tridata.consistency_flags = NifFormat.ConsistencyType.CT_STATIC
+            NifLog.warn("{0} has no consistency type set using default CT_STATIC.".format(b_obj))
+
+        # data
+        tridata.num_vertices = len(vertlist)
+        tridata.has_vertices = True
+        tridata.vertices.update_size()
+        for i, v in enumerate(tridata.vertices):
+            v.x = vertlist[i][0]
+            v.y = vertlist[i][1]
+            v.z = vertlist[i][2]
+        tridata.update_center_radius()
+
+        if mesh_hasnormals:
+            tridata.has_normals = True
+            tridata.normals.update_size()
+            for i, v in enumerate(tridata.normals):
+                v.x = normlist[i][0]
+                v.y = normlist[i][1]
+                v.z = normlist[i][2]
+
+        if mesh_hasvcol:
+            tridata.has_vertex_colors = True
+            tridata.vertex_colors.update_size()
+            for i, v in enumerate(tridata.vertex_colors):
+                v.r = vcollist[i][0]
+                v.g = vcollist[i][1]
+                v.b = vcollist[i][2]
+                v.a = vcollist[i][3]
+
+        if mesh_uv_layers:
+            tridata.num_uv_sets = len(mesh_uv_layers)
+            tridata.bs_num_uv_sets = len(mesh_uv_layers)
+            if NifOp.props.game == 'FALLOUT_3':
+                if len(mesh_uv_layers) > 1:
+                    raise util_math.NifError("Fallout 3 does not support multiple UV layers")
+            tridata.has_uv = True
+            tridata.uv_sets.update_size()
+            for j, uv_layer in enumerate(mesh_uv_layers):
+                for i, uv in enumerate(tridata.uv_sets[j]):
+                    if len(uvlist[i]) == 0:
+                        continue  # skip non-uv textures
+                    uv.u = uvlist[i][j][0]
+                    uv.v = 1.0 - uvlist[i][j][1]  # opengl standard
+
+        # set triangles stitch strips for civ4
+        if isinstance(tridata, NifFormat.NiTriStripsData) and NifOp.props.stripifier == 'NIFTOOLS':
+            tri_strips.set_triangles(tridata, trilist, stitch=NifOp.props.stitch_strips)
+        else:
+            tridata.set_triangles(trilist, stitchstrips=NifOp.props.stitch_strips)
+
+        # update tangent space (as binary extra data only for Oblivion)
+        # for extra shader texture games, only export it if those textures are actually exported
+        # (civ4 seems to be consistent with not using tangent space on non shadered nifs)
+        if mesh_uv_layers and mesh_hasnormals:
+            if NifOp.props.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM') or (NifOp.props.game in self.texture_helper.USED_EXTRA_SHADER_TEXTURES):
+                uvs = [(uv.u, uv.v) for uv in tridata.uv_sets[0]]
+                tangent_space.update_tangent_space(trishape, vertlist, normlist, uvs, trilist,
+                                                   as_extra=(NifOp.props.game == 'OBLIVION'),
+                                                   mikktspace=NifOp.props.mikktspace_tangents, b_obj=b_obj)
+
+        # todo [mesh/object] use more sophisticated armature finding, also taking armature modifier into account
+        # now export the vertex weights, if there are any
+        if b_obj.parent and b_obj.parent.type == 'ARMATURE':
+            b_obj_armature = b_obj.parent
+            vertgroups = {vertex_group.name for vertex_group in b_obj.vertex_groups}
+            bone_names = set(b_obj_armature.data.bones.keys())
+            # the vertgroups that correspond to bone_names are bones that influence the mesh
+            boneinfluences = vertgroups & bone_names
+            if boneinfluences:  # yes we have skinning!
+                # create new skinning instance block and link it
+                n_root_name = block_store.get_full_name(b_obj_armature)
+                skininst, skindata = self.create_skin_inst_data(b_obj, n_root_name)
+                trishape.skin_instance = skininst
+
+                # Vertex weights, find weights and normalization factors in a single pass
+                bone_weights, unassigned_verts = self.get_bone_weights(b_obj, boneinfluences, vertmap)
+                self.select_unassigned_vertices(unassigned_verts)
+
+                # for each bone, first we get the bone block then we add the vertex weights to the NiSkinData
+                for b_bone_name, vert_weights in bone_weights.items():
+                    # find bone in exported blocks
+                    full_bone_name = block_store.get_full_name(b_obj_armature.data.bones[b_bone_name])
+                    bone_block = self.get_bone_block(full_bone_name)
+                    trishape.add_bone(bone_block, vert_weights)
+
+                # update bind position skinning data
+                trishape.update_bind_position()
+
+                # calculate center and radius for each skin bone data block
+                trishape.update_skin_center_radius()
+
+                if NifData.data.version >= 0x04020100 and NifOp.props.skin_partition:
+                    NifLog.info("Creating skin partition")
+                    lostweight = skin_partition.update_skin_partition(
+                        trishape,
+                        max_bones_per_partition=NifOp.props.max_bones_per_partition,
+                        max_bones_per_vertex=NifOp.props.max_bones_per_vertex,
+                        stripify=NifOp.props.stripify,
+                        stitch_strips=NifOp.props.stitch_strips,
+                        pad_bones=NifOp.props.pad_bones,
+                        triangles=trilist,
+                        triangle_part_map=bodypartfacemap,
+                        maximize_bone_sharing=(NifOp.props.game in ('FALLOUT_3', 'SKYRIM')))
+
+                    # warn on bad config settings
+                    if NifOp.props.game == 'OBLIVION':
+                        if NifOp.props.pad_bones:
+                            NifLog.warn("Using padbones on Oblivion export. Disable the pad bones option to get higher quality skin partitions.")
+                    if NifOp.props.game in ('OBLIVION', 'FALLOUT_3'):
+                        if NifOp.props.max_bones_per_partition < 18:
+                            NifLog.warn("Using less than 18 bones per partition on Oblivion/Fallout 3 export."
+                                        "Set it to 18 to get higher quality skin partitions.")
+                    if NifOp.props.game in 'SKYRIM':
+                        if NifOp.props.max_bones_per_partition < 24:
+                            NifLog.warn("Using less than 24 bones per partition on Skyrim export."
+                                        "Set it to 24 to get higher quality skin partitions.")
+                    if lostweight > NifOp.props.epsilon:
+                        NifLog.warn("Lost {0} in vertex weights while creating a skin partition for Blender object '{1}' (nif block '{2}')".format(
+                            str(lostweight), b_obj.name, trishape.name))
+
+                if isinstance(skininst, NifFormat.BSDismemberSkinInstance):
+                    partitions = skininst.partitions
+                    b_obj_part_flags = b_obj.niftools_part_flags
+                    for s_part in partitions:
+                        s_part_index = NifFormat.BSDismemberBodyPartType._enumvalues.index(s_part.body_part)
+                        s_part_name = NifFormat.BSDismemberBodyPartType._enumkeys[s_part_index]
+                        for b_part in b_obj_part_flags:
+                            if s_part_name == b_part.name:
+                                s_part.part_flag.pf_start_net_boneset = b_part.pf_startflag
+                                s_part.part_flag.pf_editor_visible = b_part.pf_editorflag
+
+        # fix data consistency type
+        tridata.consistency_flags = b_obj.niftools.consistency_flags
+
+    @staticmethod
+    def get_bone_weights(b_obj, boneinfluences, vertmap):
+        """Gather the normalised weights of every influencing bone, mapped to nif vertex indices.
+
+        Each blender vertex's (group, weight) pairs are read once into flat arrays.
+        Returns a dict of bone name -> {nif vertex index: weight}, only for bones that influence
+        at least one exported vertex, and the list of blender vertices without any vertex group."""
+        b_verts = b_obj.data.vertices
+        num_b_verts = len(b_verts)
+        influences = [(b_vert.index, g.group, g.weight) for b_vert in b_verts for g in b_vert.groups]
+        if influences:
+            b_v_indices, group_indices, weights = (np.array(column) for column in zip(*influences))
+        else:
+            b_v_indices, group_indices, weights = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+
+        # vertices must be assigned to at least one vertex group
+        group_counts = np.bincount(b_v_indices, minlength=num_b_verts)
+        unassigned_verts = [b_verts[i] for i in np.flatnonzero(group_counts == 0).tolist()]
+
+        # only keep the groups that correspond to bones, in vertex group order
+        bone_groups = [(b_group.index, b_group.name) for b_group in b_obj.vertex_groups if b_group.name in boneinfluences]
+        is_bone = np.isin(group_indices, [group_index for group_index, name in bone_groups])
+        b_v_indices, group_indices, weights = b_v_indices[is_bone], group_indices[is_bone], weights[is_bone]
+
+        # normalise, skipping vertices whose bone weights sum to zero
+        vert_norm = np.bincount(b_v_indices, weights=weights, minlength=num_b_verts)
+        keep = vert_norm[b_v_indices] != 0
+        b_v_indices, group_indices = b_v_indices[keep], group_indices[keep]
+        weights = weights[keep] / vert_norm[b_v_indices]
+
+        # vertmap[i] is the list of nif vertices to which blender vertex i was mapped, so we simply export
+        # the same weight for each of them; vertices of other materials are not mapped at all
+        map_counts = np.array([len(n_v_indices) if n_v_indices else 0 for n_v_indices in vertmap], dtype=np.int64)
+        map_targets = np.array([n_v_index for n_v_indices in vertmap if n_v_indices for n_v_index in n_v_indices], dtype=np.int64)
+        map_offsets = np.cumsum(map_counts) - map_counts
+
+        repeats = map_counts[b_v_indices]
+        repeat_offsets = np.cumsum(repeats) - repeats
+        n_v_indices = map_targets[np.repeat(map_offsets[b_v_indices] - repeat_offsets, repeats) + np.arange(repeats.sum())]
+        group_indices = np.repeat(group_indices, repeats)
+        weights = np.repeat(weights, repeats)
+
+        bone_weights = {}
+        for group_index, name in bone_groups:
+            is_group = group_indices == group_index
+            # add bone as influence, but only if there were actually any vertices influenced by the bone
+            if is_group.any():
+                bone_weights[name] = dict(zip(n_v_indices[is_group].tolist(), weights[is_group].tolist()))
+        return bone_weights, unassigned_verts
+
     def get_bone_block(self, bone_name):
         """For a bone name, return the corresponding nif node from the blocks that have already been exported"""
         bone_block = None
@@ -0,0 +1,250 @@
+"""This module contains a quadric error mesh simplifier, used to generate levels of detail on export."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import heapq
+
+import numpy as np
+
+# collapses may not turn a triangle further than this, as cosine of the angle, to avoid folding the mesh
+MAX_NORMAL_DEVIATION = 0.5
+
+
+def get_locked_vertices(triangles, num_vertices, triangle_part_map=None):
+    """Find the vertices that must not move: those on open edges and those shared by different parts.
+
+    In the welded nif arrays, uv seams and hard edges duplicate vertices, so these show up as open edges,
+    along with the actual mesh borders.
+
+    :param triangles: The (m, 3) vertex indices of the triangles.
+    :param num_vertices: The number of vertices.
+    :param triangle_part_map: Optional part index of each triangle, such as the body part.
+    :return: A boolean mask of the locked vertices.
+    """
+    starts = triangles.ravel()
+    ends = triangles[:, [1, 2, 0]].ravel()
+    # an edge is open if no triangle holds it in the opposite direction
+    keys = starts * num_vertices + ends
+    reverse_keys = ends * num_vertices + starts
+    is_open = ~np.isin(reverse_keys, keys)
+
+    locked = np.zeros(num_vertices, dtype=bool)
+    locked[starts[is_open]] = True
+    locked[ends[is_open]] = True
+
+    if triangle_part_map is not None:
+        corner_parts = np.repeat(np.asarray(triangle_part_map, dtype=np.int64), 3)
+        lowest = np.full(num_vertices, np.iinfo(np.int64).max)
+        highest = np.full(num_vertices, np.iinfo(np.int64).min)
+        np.minimum.at(lowest, starts, corner_parts)
+        np.maximum.at(highest, starts, corner_parts)
+        locked |= lowest < highest
+    return locked
+
+
+def get_quadrics(vertices, triangles):
+    """Sum the area weighted plane quadrics of the triangles around each vertex, as (n, 4, 4) array."""
+    p_0, p_1, p_2 = (vertices[triangles[:, i]] for i in range(3))
+    normals = np.cross(p_1 - p_0, p_2 - p_0)
+    areas = np.linalg.norm(normals, axis=1)
+    valid = areas > 0
+    normals[valid] /= areas[valid, np.newaxis]
+    planes = np.column_stack((normals, -np.einsum('ij,ij->i', normals, p_0)))
+    triangle_quadrics = 0.5 * areas[:, np.newaxis, np.newaxis] * planes[:, :, np.newaxis] * planes[:, np.newaxis, :]
+
+    quadrics = np.zeros((len(vertices), 4, 4))
+    for i in range(3):
+        np.add.at(quadrics, triangles[:, i], triangle_quadrics)
+    return quadrics
+
+
+def get_quadric_cost(quadric, position):
+    """Evaluate a quadric, stored as its ten upper triangle coefficients, at a position."""
+    a2, ab, ac, ad, b2, bc, bd, c2, cd, d2 = quadric
+    x, y, z = position
+    return (a2 * x * x + b2 * y * y + c2 * z * z + d2
+            + 2.0 * (ab * x * y + ac * x * z + bc * y * z + ad * x + bd * y + cd * z))
+
+
+class Simplifier:
+    """Reduce a triangle mesh by half edge collapses, ordered by quadric error.
+
+    A half edge collapse moves a vertex onto one of its neighbours, so the remaining vertices are a subset of the
+    original ones, and all their attributes (uvs, normals, colors, skin weights, ...) stay valid as they are.
+    """
+
+    def __init__(self, vertices, triangles, locked=None, attributes=None, attribute_tolerance=0.1):
+        """
+        :param vertices: The (n, 3) vertex positions.
+        :param triangles: The (m, 3) vertex indices of the triangles.
+        :param locked: Optional boolean mask of vertices that must not be moved.
+        :param attributes: Optional (n, k) array of vertex attributes, such as skin weights; a vertex is only
+            collapsed onto a neighbour whose attributes differ less than attribute_tolerance.
+        :param attribute_tolerance: The largest allowed attribute difference.
+        """
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        num_vertices = len(vertices)
+        locked = np.zeros(num_vertices, dtype=bool) if locked is None else np.asarray(locked, dtype=bool)
+        if attributes is not None:
+            attributes = np.asarray(attributes, dtype=np.float64).reshape(num_vertices, -1)
+
+        # the collapses are done one by one, which is faster on plain python values than on numpy scalars
+        self.positions = vertices.tolist()
+        self.triangles = triangles.tolist()
+        self.alive = [True] * len(triangles)
+        self.num_alive = len(triangles)
+        quadrics = get_quadrics(vertices, triangles)
+        self.quadrics = quadrics[:, [0, 0, 0, 0, 1, 1, 1, 2, 2, 3], [0, 1, 2, 3, 1, 2, 3, 2, 3, 3]].tolist()
+        self.movable = (~locked).tolist()
+        self.attributes = None if attributes is None else attributes
+        self.attribute_tolerance = attribute_tolerance
+
+        self.vertex_triangles = [set() for _ in range(num_vertices)]
+        for triangle, (a, b, c) in enumerate(self.triangles):
+            self.vertex_triangles[a].add(triangle)
+            self.vertex_triangles[b].add(triangle)
+            self.vertex_triangles[c].add(triangle)
+
+        # every edge is a candidate in both directions
+        edges = np.unique(np.sort(np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]]), axis=1), axis=0)
+        edges = np.concatenate((edges, edges[:, ::-1]))
+        sources, targets = edges[:, 0], edges[:, 1]
+        allowed = ~locked[sources] & (sources != targets)
+        if attributes is not None:
+            allowed &= np.abs(attributes[sources] - attributes[targets]).max(axis=1, initial=0.0) <= attribute_tolerance
+        sources, targets = sources[allowed], targets[allowed]
+        positions = np.column_stack((vertices[targets], np.ones(len(targets))))
+        costs = np.einsum('ij,ijk,ik->i', positions, quadrics[sources] + quadrics[targets], positions)
+        self.heap = list(zip(costs.tolist(), sources.tolist(), targets.tolist()))
+        heapq.heapify(self.heap)
+
+    def can_collapse(self, source, target):
+        """Check whether a vertex may move onto another, regardless of the mesh around them."""
+        if not self.movable[source]:
+            return False
+        if self.attributes is not None:
+            difference = np.abs(self.attributes[source] - self.attributes[target])
+            return difference.max(initial=0.0) <= self.attribute_tolerance
+        return True
+
+    def get_cost(self, source, target):
+        """The quadric error of moving the source vertex onto the target vertex."""
+        return (get_quadric_cost(self.quadrics[source], self.positions[target])
+                + get_quadric_cost(self.quadrics[target], self.positions[target]))
+
+    def get_neighbours(self, vertex):
+        return {other for triangle in self.vertex_triangles[vertex] for other in self.triangles[triangle]} - {vertex}
+
+    def flips(self, source, target):
+        """Check whether moving source onto target flips or degenerates a triangle that remains."""
+        positions = self.positions
+        for triangle in self.vertex_triangles[source]:
+            corners = self.triangles[triangle]
+            if target in corners:
+                continue
+            p_0, p_1, p_2 = (positions[corner] for corner in corners)
+            old_normal = _cross(p_0, p_1, p_2)
+            moved = [positions[target] if corner == source else positions[corner] for corner in corners]
+            new_normal = _cross(*moved)
+            dot = sum(old * new for old, new in zip(old_normal, new_normal))
+            old_length = sum(old * old for old in old_normal) ** 0.5
+            new_length = sum(new * new for new in new_normal) ** 0.5
+            if dot <= MAX_NORMAL_DEVIATION * old_length * new_length or new_length <= 1e-6 * old_length:
+                return True
+        return False
+
+    def collapse(self, source, target):
+        """Move source onto target, if that keeps the mesh valid. Return whether the collapse was done."""
+        shared = [triangle for triangle in self.vertex_triangles[source] if target in self.triangles[triangle]]
+        if not shared:
+            # the edge no longer exists
+            return False
+        # more common neighbours than shared triangles would make the mesh non manifold
+        if len(self.get_neighbours(source) & self.get_neighbours(target)) > len(shared):
+            return False
+        if self.flips(source, target):
+            return False
+
+        for triangle in shared:
+            self.alive[triangle] = False
+            self.num_alive -= 1
+            for vertex in self.triangles[triangle]:
+                self.vertex_triangles[vertex].discard(triangle)
+        for triangle in self.vertex_triangles[source]:
+            corners = self.triangles[triangle]
+            corners[corners.index(source)] = target
+            self.vertex_triangles[target].add(triangle)
+        self.vertex_triangles[source] = set()
+        self.quadrics[target] = [a + b for a, b in zip(self.quadrics[target], self.quadrics[source])]
+
+        # collapses around the target now have a different cost
+        for neighbour in self.get_neighbours(target):
+            for edge_source, edge_target in ((neighbour, target), (target, neighbour)):
+                if self.can_collapse(edge_source, edge_target):
+                    heapq.heappush(self.heap, (self.get_cost(edge_source, edge_target), edge_source, edge_target))
+        return True
+
+    def simplify(self, target_count, max_error=np.inf):
+        """Collapse edges, cheapest first, until at most target_count triangles are left or the error gets too large.
+
+        :return: The (k, 3) remaining triangles, and the original index of each of them.
+        """
+        while self.num_alive > target_count and self.heap:
+            cost, source, target = heapq.heappop(self.heap)
+            if not self.vertex_triangles[source] or not self.vertex_triangles[target]:
+                continue
+            # the cost may have changed since this collapse was queued, if so requeue it
+            current_cost = self.get_cost(source, target)
+            if current_cost > cost + 1e-12 * (1.0 + abs(cost)):
+                heapq.heappush(self.heap, (current_cost, source, target))
+                continue
+            if current_cost > max_error:
+                break
+            self.collapse(source, target)
+
+        triangle_indices = np.flatnonzero(self.alive)
+        triangles = np.array([self.triangles[i] for i in triangle_indices.tolist()], dtype=np.int64).reshape(-1, 3)
+        return triangles, triangle_indices
+
+
+def _cross(p_0, p_1, p_2):
+    """Normal of the triangle p_0, p_1, p_2, scaled by twice its area."""
+    u_x, u_y, u_z = p_1[0] - p_0[0], p_1[1] - p_0[1], p_1[2] - p_0[2]
+    v_x, v_y, v_z = p_2[0] - p_0[0], p_2[1] - p_0[1], p_2[2] - p_0[2]
+    return u_y * v_z - u_z * v_y, u_z * v_x - u_x * v_z, u_x * v_y - u_y * v_x
@@ -0,0 +1,459 @@
+"""This module contains a skin partition builder, used instead of pyffi's update_skin_partition on export."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import heapq
+
+import numpy as np
+import pyffi.utils.vertex_cache
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.utils.util_logging import NifLog
+from io_scene_nif.utils.util_math import NifError
+
+
+def get_weight_arrays(n_geom):
+    """Get the skin data vertex weights as dense (num_vertices, max_influences) bone and weight arrays.
+
+    Zero weights are skipped, weights of a bone listed twice for a vertex are summed and unused slots have bone -1."""
+    skin_data = n_geom.skin_instance.data
+    num_vertices = n_geom.data.num_vertices
+    num_bones = max(len(skin_data.bone_list), 1)
+    triples = [(skin_weight.index, bone_index, skin_weight.weight)
+               for bone_index, bone_data in enumerate(skin_data.bone_list)
+               for skin_weight in bone_data.vertex_weights if skin_weight.weight != 0]
+    if not triples:
+        return np.full((num_vertices, 1), -1, dtype=np.int64), np.zeros((num_vertices, 1))
+
+    vert_indices, bone_indices, weights = (np.array(column) for column in zip(*triples))
+    keys, inverse = np.unique(vert_indices * num_bones + bone_indices, return_inverse=True)
+    weights = np.bincount(inverse, weights=weights)
+    vert_indices, bone_indices = keys // num_bones, keys % num_bones
+
+    # keys are sorted by vertex, so each influence's slot is its rank within its vertex
+    counts = np.bincount(vert_indices, minlength=num_vertices)
+    slots = np.arange(len(keys)) - (np.cumsum(counts) - counts)[vert_indices]
+    bones = np.full((num_vertices, max(counts.max(), 1)), -1, dtype=np.int64)
+    vert_weights = np.zeros(bones.shape)
+    bones[vert_indices, slots] = bone_indices
+    vert_weights[vert_indices, slots] = weights
+    return bones, vert_weights
+
+
+def sort_weights(bones, weights):
+    """Sort the influences of every vertex by decreasing weight, ties by increasing bone, unused slots last."""
+    order = np.lexsort((np.where(bones < 0, np.iinfo(np.int64).max, bones), -weights), axis=1)
+    return np.take_along_axis(bones, order, axis=1), np.take_along_axis(weights, order, axis=1)
+
+
+def truncate_weights(bones, weights, max_bones_per_vertex):
+    """Keep the heaviest max_bones_per_vertex influences of each vertex and renormalise the truncated vertices.
+
+    Returns the truncated arrays and the largest weight that was dropped."""
+    bones, weights = sort_weights(bones, weights)
+    if bones.shape[1] <= max_bones_per_vertex:
+        return bones, weights, 0.0
+
+    dropped = weights[:, max_bones_per_vertex:]
+    lost_weight = float(dropped.max())
+    truncated = (bones[:, max_bones_per_vertex:] >= 0).any(axis=1)
+    bones = bones[:, :max_bones_per_vertex].copy()
+    weights = weights[:, :max_bones_per_vertex].copy()
+    weights[truncated] /= weights[truncated].sum(axis=1, keepdims=True)
+    return bones, weights, lost_weight
+
+
+def count_triangle_bones(triangles, bones):
+    """Count the distinct bones influencing each triangle."""
+    tri_bones = np.sort(bones[triangles].reshape(len(triangles), -1), axis=1)
+    is_new = np.ones(tri_bones.shape, dtype=bool)
+    is_new[:, 1:] = tri_bones[:, 1:] != tri_bones[:, :-1]
+    return np.count_nonzero(is_new & (tri_bones >= 0), axis=1)
+
+
+def limit_triangle_bones(triangles, bones, weights, max_bones_per_partition):
+    """Remove the least influential bones from triangles that have more than max_bones_per_partition bones.
+
+    Works in place on bones and weights, with the same greedy rule as pyffi, and returns the largest weight that was removed."""
+    lost_weight = 0.0
+    # removing a bone never adds bones to other triangles, so only the triangles that are over the limit now need visiting
+    for tri in triangles[count_triangle_bones(triangles, bones) > max_bones_per_partition].tolist():
+        while True:
+            tri_weights = {}
+            # bones with weight 1 cannot be removed
+            nono = set()
+            for vert in tri:
+                used = bones[vert] >= 0
+                if np.count_nonzero(used) == 1:
+                    nono.add(int(bones[vert][used][0]))
+                for bone, weight in zip(bones[vert][used].tolist(), weights[vert][used].tolist()):
+                    tri_weights[bone] = tri_weights.get(bone, 0.0) + weight
+            if len(tri_weights) <= max_bones_per_partition:
+                break
+
+            candidates = [(weight, bone) for bone, weight in tri_weights.items() if bone not in nono]
+            if not candidates:
+                raise NifError("Cannot remove any more bones in this skin, increase the maximum number of bones per partition and try again.")
+            weight, min_bone = min(candidates)
+
+            # remove min_bone from all vertices of this triangle
+            for vert in set(tri):
+                slot = np.flatnonzero(bones[vert] == min_bone)
+                if not len(slot):
+                    continue
+                lost_weight = max(lost_weight, float(weights[vert, slot[0]]))
+                bones[vert, slot[0]] = -1
+                weights[vert, slot[0]] = 0.0
+                total = weights[vert].sum()
+                if total > 0:
+                    weights[vert] /= total
+    return lost_weight
+
+
+def _bit_count(mask):
+    return bin(mask).count("1")
+
+
+def _mask_to_bones(mask):
+    return [bone for bone in range(mask.bit_length()) if mask >> bone & 1]
+
+
+class _Partition:
+    """Bone set (as an integer bit mask), body part index and triangle indices of a skin partition under construction."""
+
+    def __init__(self, mask, part_index, tri_indices):
+        self.mask = mask
+        self.part_index = part_index
+        self.tri_indices = [tri_indices]
+        self.version = 0
+
+    @property
+    def num_bones(self):
+        return _bit_count(self.mask)
+
+    def absorb(self, other):
+        self.mask |= other.mask
+        self.tri_indices.extend(other.tri_indices)
+        self.version += 1
+
+
+def build_partitions(triangles, bones, triangle_part_map, max_bones_per_partition):
+    """Split the triangles into partitions of at most max_bones_per_partition bones.
+
+    Triangles with the same sorted bone set signature and body part start out in one group. The groups are packed,
+    largest first, into the partition they add the fewest bones to, and the partitions are then merged cheapest
+    first from a priority queue for as long as the bone limit allows.
+    Returns a list of (sorted bone list, body part index, sorted triangle indices)."""
+    num_triangles = len(triangles)
+    if not num_triangles:
+        return []
+
+    # signature: sorted distinct bones of the triangle, padded with -1, prefixed by the body part index
+    tri_bones = np.sort(bones[triangles].reshape(num_triangles, -1), axis=1)
+    is_dup = np.zeros(tri_bones.shape, dtype=bool)
+    is_dup[:, 1:] = tri_bones[:, 1:] == tri_bones[:, :-1]
+    tri_bones[is_dup] = -1
+    tri_bones = np.sort(tri_bones, axis=1)
+    signatures = np.column_stack((triangle_part_map, tri_bones))
+    unique_signatures, group_of_tri = np.unique(signatures, axis=0, return_inverse=True)
+    group_of_tri = group_of_tri.ravel()
+    tri_order = np.argsort(group_of_tri, kind="stable")
+    group_bounds = np.flatnonzero(np.diff(group_of_tri[tri_order])) + 1
+
+    groups = []
+    for signature, tri_indices in zip(unique_signatures.tolist(), np.split(tri_order, group_bounds)):
+        mask = 0
+        for bone in signature[1:]:
+            if bone >= 0:
+                mask |= 1 << bone
+        groups.append(_Partition(mask, signature[0], tri_indices))
+
+    # first fit decreasing, into the partition that gains the fewest bones
+    partitions = []
+    groups.sort(key=lambda group: (-group.num_bones, -len(group.tri_indices[0])))
+    for group in groups:
+        best = None
+        best_key = None
+        for partition in partitions:
+            if partition.part_index != group.part_index:
+                continue
+            num_union = _bit_count(partition.mask | group.mask)
+            if num_union > max_bones_per_partition:
+                continue
+            key = (num_union - partition.num_bones, -num_union)
+            if best_key is None or key < best_key:
+                best, best_key = partition, key
+        if best is None:
+            partitions.append(group)
+        else:
+            best.absorb(group)
+
+    # merge partitions, cheapest union first
+    heap = []
+
+    def push_pairs(index):
+        part_a = partitions[index]
+        for other, part_b in enumerate(partitions):
+            if other == index or part_b is None or part_b.part_index != part_a.part_index:
+                continue
+            num_union = _bit_count(part_a.mask | part_b.mask)
+            if num_union <= max_bones_per_partition:
+                cost = num_union - max(part_a.num_bones, part_b.num_bones)
+                heapq.heappush(heap, (cost, min(index, other), max(index, other), part_a.version, part_b.version)
+                               if index < other else
+                               (cost, other, index, part_b.version, part_a.version))
+
+    for index in range(len(partitions)):
+        push_pairs(index)
+    while heap:
+        cost, index_a, index_b, version_a, version_b = heapq.heappop(heap)
+        part_a, part_b = partitions[index_a], partitions[index_b]
+        if part_a is None or part_b is None or part_a.version != version_a or part_b.version != version_b:
+            continue
+        part_a.absorb(part_b)
+        partitions[index_b] = None
+        push_pairs(index_a)
+
+    result = []
+    for partition in partitions:
+        if partition is None:
+            continue
+        tri_indices = np.sort(np.concatenate(partition.tri_indices))
+        result.append((_mask_to_bones(partition.mask), partition.part_index, tri_indices))
+    # keep partitions in the order of their first triangle
+    result.sort(key=lambda part: part[2][0])
+    return result
+
+
+def share_bones(parts, max_bones_per_partition):
+    """Reorder partitions so that consecutive partitions share one bone set where the bone limit allows, as pyffi does."""
+    parts = [[set(bones), part_index, tri_indices] for bones, part_index, tri_indices in parts]
+    new_parts = []
+    while parts:
+        shared_parts = [parts.pop()]
+        shared_bones = shared_parts[0][0]
+        remaining = []
+        for other in parts:
+            if len(shared_bones | other[0]) <= max_bones_per_partition:
+                shared_bones |= other[0]
+                shared_parts.append(other)
+                for shared_part in shared_parts:
+                    shared_part[0] = shared_bones
+            else:
+                remaining.append(other)
+        parts = remaining
+        new_parts.extend(shared_parts)
+    return [(sorted(bones), part_index, tri_indices) for bones, part_index, tri_indices in new_parts]
+
+
+def get_local_indices(indices):
+    """Return the distinct values of indices in order of first appearance, and indices remapped into that list."""
+    flat = np.asarray(indices).ravel()
+    unique, first, inverse = np.unique(flat, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty(len(unique), dtype=np.int64)
+    rank[order] = np.arange(len(unique))
+    return unique[order], rank[inverse.ravel()]
+
+
+def get_partition_block(skin_inst):
+    """Return the skin partition block of a skin instance, creating and linking it if needed."""
+    skin_data = skin_inst.data
+    if skin_data.skin_partition:
+        skin_partition = skin_data.skin_partition
+        skin_inst.skin_partition = skin_partition
+    elif skin_inst.skin_partition:
+        skin_partition = skin_inst.skin_partition
+        skin_data.skin_partition = skin_partition
+    else:
+        skin_partition = NifFormat.NiSkinPartition()
+        skin_data.skin_partition = skin_partition
+        skin_inst.skin_partition = skin_partition
+    return skin_partition
+
+
+def write_partition(n_part, triangles, bones, weights, part_bones, num_bones, num_weights_per_vertex, stripify, stitch_strips, pad_bones):
+    """Fill a skin partition block from the triangles (global vertex indices) and the vertex weights of one partition."""
+    strips = None
+    if stripify:
+        strips = pyffi.utils.vertex_cache.stable_stripify(triangles.tolist(), stitchstrips=stitch_strips)
+        # for optimal performance, vertices must be sorted by strip
+        vertex_map, local = get_local_indices(np.concatenate([np.asarray(strip, dtype=np.int64) for strip in strips]))
+    else:
+        # for optimal performance, vertices must be sorted by triangle
+        vertex_map, local = get_local_indices(triangles)
+
+    n_part.num_vertices = len(vertex_map)
+    n_part.num_bones = num_bones
+    n_part.num_weights_per_vertex = num_weights_per_vertex
+    n_part.bones.update_size()
+    for i, bone in enumerate(part_bones + [0] * (num_bones - len(part_bones))):
+        # dummy bone slots refer to first bone
+        n_part.bones[i] = bone
+
+    n_part.has_vertex_map = True
+    n_part.vertex_map.update_size()
+    for i, vert in enumerate(vertex_map.tolist()):
+        n_part.vertex_map[i] = vert
+
+    # vertex weights and partition local bone indices, padded up to num_weights_per_vertex
+    part_vert_bones = np.full((len(vertex_map), num_weights_per_vertex), -1, dtype=np.int64)
+    part_vert_weights = np.zeros(part_vert_bones.shape)
+    width = min(bones.shape[1], num_weights_per_vertex)
+    part_vert_bones[:, :width] = bones[vertex_map, :width]
+    part_vert_weights[:, :width] = weights[vertex_map, :width]
+    # sort by weight (for fallout 3, largest weight first)
+    part_vert_bones, part_vert_weights = sort_weights(part_vert_bones, part_vert_weights)
+    used = part_vert_bones >= 0
+    bone_indices = np.zeros(part_vert_bones.shape, dtype=np.int64)
+    bone_indices[used] = np.searchsorted(np.array(part_bones, dtype=np.int64), part_vert_bones[used])
+    if pad_bones:
+        # unused slots take the unused bone indices, so bone indices are unique per vertex, then sort by bone index (for ffvt3r)
+        for row, row_used in zip(bone_indices, used):
+            free = sorted(set(range(num_bones)) - set(row[row_used].tolist()))
+            row[~row_used] = free[:np.count_nonzero(~row_used)]
+        order = np.argsort(bone_indices, axis=1, kind="stable")
+        bone_indices = np.take_along_axis(bone_indices, order, axis=1)
+        part_vert_weights = np.take_along_axis(part_vert_weights, order, axis=1)
+
+    n_part.has_vertex_weights = True
+    n_part.vertex_weights.update_size()
+    for n_vert_weights, vert_weights in zip(n_part.vertex_weights, part_vert_weights.tolist()):
+        for j, weight in enumerate(vert_weights):
+            n_vert_weights[j] = weight
+
+    n_part.has_faces = True
+    if strips is not None:
+        n_part.num_triangles = sum(len(strip) - 2 for strip in strips)
+        n_part.num_strips = len(strips)
+        n_part.strip_lengths.update_size()
+        for i, strip in enumerate(strips):
+            n_part.strip_lengths[i] = len(strip)
+        n_part.strips.update_size()
+        start = 0
+        for n_strip, strip in zip(n_part.strips, strips):
+            for j, vert in enumerate(local[start:start + len(strip)].tolist()):
+                n_strip[j] = vert
+            start += len(strip)
+    else:
+        n_part.num_triangles = len(triangles)
+        n_part.num_strips = 0
+        # clear strip lengths and strips arrays
+        n_part.strip_lengths.update_size()
+        n_part.strips.update_size()
+        n_part.triangles.update_size()
+        for n_tri, (v_1, v_2, v_3) in zip(n_part.triangles, local.reshape(-1, 3).tolist()):
+            n_tri.v_1 = v_1
+            n_tri.v_2 = v_2
+            n_tri.v_3 = v_3
+
+    n_part.has_bone_indices = True
+    n_part.bone_indices.update_size()
+    for n_vert_bones, vert_bones in zip(n_part.bone_indices, bone_indices.tolist()):
+        for j, bone_index in enumerate(vert_bones):
+            n_vert_bones[j] = bone_index
+
+
+def update_skin_partition(n_geom, max_bones_per_partition=4, max_bones_per_vertex=4, stripify=False, stitch_strips=False,
+                          pad_bones=False, triangles=None, triangle_part_map=None, maximize_bone_sharing=False):
+    """Recalculate the skin partition of a skinned geometry, taking the same options as pyffi's update_skin_partition.
+
+    :param n_geom: The skinned NiTriBasedGeom.
+    :param max_bones_per_partition: Maximum number of bones in each partition.
+    :param max_bones_per_vertex: Maximum number of bones per vertex, also the number of weights stored per vertex.
+    :param stripify: If true, stripify the partitions, otherwise use triangles.
+    :param stitch_strips: If stripify is true, set this to true to stitch the strips.
+    :param pad_bones: Store exactly max_bones_per_partition bones in every partition, with unique and sorted bone indices
+        per vertex; requires max_bones_per_vertex to be equal to max_bones_per_partition (for Freedom Force vs. the 3rd Reich).
+    :param triangles: The triangles to partition, defaults to the triangles of the geometry data.
+    :param triangle_part_map: Partition index of each triangle, triangles with different indices never share a partition.
+        For a BSDismemberSkinInstance these are the body part types.
+    :param maximize_bone_sharing: Maximize bone sharing between partitions (for Fallout 3 and Skyrim).
+    :return: The largest vertex weight that was lost.
+    """
+    skin_inst = n_geom.skin_instance
+    if not skin_inst:
+        # no skin, nothing to do
+        return 0.0
+    if pad_bones and max_bones_per_partition != max_bones_per_vertex:
+        raise NifError("When padding bones the maximum number of bones per partition must be equal to the maximum number of bones per vertex.")
+
+    if triangles is None:
+        triangles = n_geom.data.get_triangles()
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+    if triangle_part_map is None:
+        triangle_part_map = np.zeros(len(triangles), dtype=np.int64)
+    else:
+        triangle_part_map = np.array(triangle_part_map, dtype=np.int64)
+
+    bones, weights = get_weight_arrays(n_geom)
+    num_unweighted = np.count_nonzero(bones[:, 0] < 0)
+    if num_unweighted:
+        NifLog.warn("Bad NiSkinData: {0} vertices have no weights.".format(num_unweighted))
+
+    # reduce bone influences to meet the maximum number of bones per vertex and per triangle
+    bones, weights, lost_weight = truncate_weights(bones, weights, max_bones_per_vertex)
+    lost_weight = max(lost_weight, limit_triangle_bones(triangles, bones, weights, max_bones_per_partition))
+
+    parts = build_partitions(triangles, bones, triangle_part_map, max_bones_per_partition)
+    NifLog.info("Skin has {0} partitions.".format(len(parts)))
+    if maximize_bone_sharing:
+        parts = share_bones(parts, max_bones_per_partition)
+
+    skin_partition = get_partition_block(skin_inst)
+    skin_partition.num_skin_partition_blocks = len(parts)
+    skin_partition.skin_partition_blocks.update_size()
+
+    # for Fallout 3, set dismember partition indices
+    if isinstance(skin_inst, NifFormat.BSDismemberSkinInstance):
+        skin_inst.num_partitions = len(parts)
+        skin_inst.partitions.update_size()
+        last_bones = None
+        for body_part, (part_bones, part_index, tri_indices) in zip(skin_inst.partitions, parts):
+            body_part.body_part = part_index
+            # start new bone set, if bones are not shared
+            body_part.part_flag.pf_start_net_boneset = int(last_bones != part_bones)
+            # caps are invisible
+            body_part.part_flag.pf_editor_visible = int(part_index < 100 or part_index >= 1000)
+            last_bones = part_bones
+
+    for n_part, (part_bones, part_index, tri_indices) in zip(skin_partition.skin_partition_blocks, parts):
+        num_bones = max_bones_per_partition if pad_bones else len(part_bones)
+        write_partition(n_part, triangles[tri_indices], bones, weights, part_bones, num_bones,
+                        max_bones_per_vertex, stripify, stitch_strips, pad_bones)
+
+    return lost_weight
@@ -0,0 +1,244 @@
+"""This module contains a tangent space generator, used instead of pyffi's update_tangent_space on export."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy as np
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.modules.nif_export.block_registry import block_store
+from io_scene_nif.utils import util_math
+
+TANGENT_SPACE_NAME = b'Tangent space (binormal & tangent vectors)'
+
+# vectors that are shorter than this cannot be normalized
+EPSILON = 1e-12
+
+
+def normalize(vectors):
+    """Normalize an (n, 3) array in place, return a mask of the vectors that could be normalized."""
+    lengths = np.linalg.norm(vectors, axis=1)
+    valid = np.isfinite(lengths) & (lengths > EPSILON)
+    vectors[valid] /= lengths[valid, np.newaxis]
+    return valid
+
+
+def project(vectors, normals):
+    """Remove the component along the (unit) normals from each vector."""
+    return vectors - normals * np.einsum('ij,ij->i', normals, vectors)[:, np.newaxis]
+
+
+def sum_groups(groups, vectors, num_groups):
+    """Sum an (n, 3) array of vectors per group, return a (num_groups, 3) array."""
+    sums = np.zeros((num_groups, 3))
+    for i in range(3):
+        sums[:, i] = np.bincount(groups, weights=vectors[:, i], minlength=num_groups)
+    return sums
+
+
+def get_vertex_groups(vertices, normals, vertex_precision=3, normal_precision=3):
+    """Group the vertices that share position and normal, to avoid issues along uv seams due to vertex duplication.
+
+    Vertices are hashed as in pyffi's get_vertex_hash_generator, ignoring uvs and vertex colors.
+
+    :return: The group index of each vertex, and the number of groups.
+    """
+    keys = np.hstack((vertices * 10 ** vertex_precision, normals * 10 ** normal_precision))
+    keys = np.rint(np.nan_to_num(keys)).astype(np.int64)
+    unique_keys, groups = np.unique(keys, axis=0, return_inverse=True)
+    return groups.ravel(), len(unique_keys)
+
+
+def get_triangle_directions(vertices, uvs, triangles):
+    """Get the normalized directions of increasing u and of increasing v of each triangle.
+
+    :return: The u directions, the v directions, and a mask of the triangles for which both directions exist.
+    """
+    v_1, v_2, v_3 = (vertices[triangles[:, i]] for i in range(3))
+    w_1, w_2, w_3 = (uvs[triangles[:, i]] for i in range(3))
+    v_2v_1 = v_2 - v_1
+    v_3v_1 = v_3 - v_1
+    w_2w_1 = w_2 - w_1
+    w_3w_1 = w_3 - w_1
+
+    # only the sign of the triangle surface in texture space matters, as both directions get normalized
+    r = w_2w_1[:, 0] * w_3w_1[:, 1] - w_3w_1[:, 0] * w_2w_1[:, 1]
+    r_sign = np.where(r >= 0, 1.0, -1.0)[:, np.newaxis]
+
+    u_dirs = (w_3w_1[:, 1, np.newaxis] * v_2v_1 - w_2w_1[:, 1, np.newaxis] * v_3v_1) * r_sign
+    v_dirs = (w_2w_1[:, 0, np.newaxis] * v_3v_1 - w_3w_1[:, 0, np.newaxis] * v_2v_1) * r_sign
+    valid = normalize(u_dirs)
+    valid &= normalize(v_dirs)
+    return u_dirs, v_dirs, valid
+
+
+def get_corner_angles(vertices, triangles):
+    """Get the (num_triangles, 3) angle of each triangle at each of its corners."""
+    corners = vertices[triangles]
+    angles = np.empty(triangles.shape)
+    for i in range(3):
+        edge_1 = corners[:, (i + 1) % 3] - corners[:, i]
+        edge_2 = corners[:, (i + 2) % 3] - corners[:, i]
+        normalize(edge_1)
+        normalize(edge_2)
+        angles[:, i] = np.arccos(np.clip(np.einsum('ij,ij->i', edge_1, edge_2), -1.0, 1.0))
+    return angles
+
+
+def orthonormalize(normals, tangents, bitangents):
+    """Turn normals, bitangents and tangents into orthonormal bases via Gram-Schmidt, in place.
+
+    Vertices without usable texture space data get an arbitrary base around their normal."""
+    # this happens if the normal has NaN values or is zero, just pick something in that case
+    normals[~normalize(normals)] = (0.0, 1.0, 0.0)
+
+    bitangents[:] = project(bitangents, normals)
+    valid = normalize(bitangents)
+    tangents[:] = project(project(tangents, normals), bitangents)
+    valid &= normalize(tangents)
+
+    # insufficient data to set tangent space for these vertices, in that case pick a space
+    if not valid.all():
+        invalid_normals = normals[~valid]
+        fallback = np.cross((1.0, 0.0, 0.0), invalid_normals)
+        parallel = ~normalize(fallback)
+        fallback[parallel] = np.cross((0.0, 1.0, 0.0), invalid_normals[parallel])
+        normalize(fallback)
+        bitangents[~valid] = fallback
+        tangents[~valid] = np.cross(invalid_normals, fallback)
+
+
+def calculate_tangent_space(vertices, normals, uvs, triangles, mikktspace=False):
+    """Calculate the tangent space of a mesh, from the welded arrays that are exported.
+
+    Nif naming is followed: the tangent is the direction of increasing v, the bitangent the direction of increasing u.
+
+    By default the result matches pyffi's update_tangent_space: the normalized directions of all triangles around
+    vertices that share position and normal are summed, and orthonormalized against the normal.
+    In mikktspace mode, vertices on uv seams are not merged, triangle directions are projected on the plane of the
+    vertex normal and weighted by the angle of the triangle corner, and the tangent is derived from normal, bitangent
+    and handedness, as MikkTSpace does.
+
+    :param vertices: The (n, 3) vertex positions.
+    :param normals: The (n, 3) vertex normals.
+    :param uvs: The (n, 2) texture coordinates of the first uv set, with v flipped as stored in the nif.
+    :param triangles: The (m, 3) vertex indices of the triangles.
+    :param mikktspace: Whether to calculate a MikkTSpace compatible tangent space.
+    :return: The (n, 3) tangents and (n, 3) bitangents.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    normals = np.array(normals, dtype=np.float64).reshape(-1, 3)
+    uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+
+    if mikktspace:
+        groups, num_groups = np.arange(len(vertices)), len(vertices)
+    else:
+        groups, num_groups = get_vertex_groups(vertices, normals)
+
+    # skip degenerate triangles
+    tri_groups = groups[triangles]
+    valid = (tri_groups[:, 0] != tri_groups[:, 1]) & (tri_groups[:, 1] != tri_groups[:, 2]) & (tri_groups[:, 2] != tri_groups[:, 0])
+    u_dirs, v_dirs, valid_dirs = get_triangle_directions(vertices, uvs, triangles)
+    valid &= valid_dirs
+
+    # the contribution of each triangle to each of its corners
+    corner_groups = tri_groups[valid].ravel()
+    corner_u_dirs = np.repeat(u_dirs[valid], 3, axis=0)
+    corner_v_dirs = np.repeat(v_dirs[valid], 3, axis=0)
+    if mikktspace:
+        corner_normals = normals[triangles[valid].ravel()]
+        normalize(corner_normals)
+        corner_u_dirs = project(corner_u_dirs, corner_normals)
+        corner_v_dirs = project(corner_v_dirs, corner_normals)
+        normalize(corner_u_dirs)
+        normalize(corner_v_dirs)
+        angles = get_corner_angles(vertices, triangles[valid]).reshape(-1, 1)
+        corner_u_dirs *= angles
+        corner_v_dirs *= angles
+
+    bitangents = sum_groups(corner_groups, corner_u_dirs, num_groups)[groups]
+    tangents = sum_groups(corner_groups, corner_v_dirs, num_groups)[groups]
+
+    if mikktspace:
+        handedness = np.where(np.einsum('ij,ij->i', np.cross(normals, bitangents), tangents) < 0, -1.0, 1.0)
+        orthonormalize(normals, tangents, bitangents)
+        tangents = np.cross(normals, bitangents) * handedness[:, np.newaxis]
+    else:
+        orthonormalize(normals, tangents, bitangents)
+    return tangents, bitangents
+
+
+def get_tangent_space_extra(n_geom):
+    """Find the binary extra data block that holds the tangent space of a geometry, if any."""
+    for extra in n_geom.get_extra_datas():
+        if isinstance(extra, NifFormat.NiBinaryExtraData) and extra.name == TANGENT_SPACE_NAME:
+            return extra
+    return None
+
+
+def update_tangent_space(n_geom, vertices, normals, uvs, triangles, as_extra=False, mikktspace=False, b_obj=None):
+    """Recalculate the tangent space data of a geometry, stored in the same layout as pyffi's update_tangent_space.
+
+    :param n_geom: The NiTriBasedGeom, whose data must already hold the vertices.
+    :param vertices: The (n, 3) vertex positions.
+    :param normals: The (n, 3) vertex normals.
+    :param uvs: The (n, 2) texture coordinates of the first uv set, with v flipped as stored in the nif.
+    :param triangles: The (m, 3) vertex indices of the triangles.
+    :param as_extra: Whether to store the tangent space as binary extra data (as in Oblivion)
+        or in the geometry data (as in Fallout 3 and Skyrim).
+    :param mikktspace: Whether to calculate a MikkTSpace compatible tangent space.
+    :param b_obj: The Blender object to register a newly created extra data block with.
+    """
+    tangents, bitangents = calculate_tangent_space(vertices, normals, uvs, triangles, mikktspace)
+    if as_extra:
+        # if tangent space extra data already exists, use it
+        extra = get_tangent_space_extra(n_geom)
+        if not extra:
+            # otherwise, create a new block and link it
+            extra = block_store.create_block("NiBinaryExtraData", b_obj)
+            extra.name = TANGENT_SPACE_NAME
+            n_geom.add_extra_data(extra)
+        # all tangents followed by all bitangents, as little endian floats
+        extra.binary_data = np.concatenate((tangents, bitangents)).astype('<f4').tobytes()
+    else:
+        # set tangent space flag
+        n_geom.data.extra_vectors_flags = 16
+        n_geom.data.tangents.update_size()
+        n_geom.data.bitangents.update_size()
+        util_math.array_to_nif_vectors(tangents, n_geom.data.tangents)
+        util_math.array_to_nif_vectors(bitangents, n_geom.data.bitangents)
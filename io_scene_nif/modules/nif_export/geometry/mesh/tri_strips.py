@@ -0,0 +1,209 @@
+"""This module contains a triangle stripifier, used instead of pyffi's stripify on export."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import numpy as np
+
+from io_scene_nif.utils.util_logging import NifLog
+
+# strip lengths and indices are stored as unsigned shorts
+MAX_STRIP_LENGTH = 65535
+
+
+def get_neighbours(triangles):
+    """Find the neighbour of each triangle across each of its edges, edge i running from corner i to corner i + 1.
+
+    Only neighbours with consistent winding are found, for non manifold edges the first candidate is used.
+
+    :param triangles: The (m, 3) vertex indices of the triangles.
+    :return: The (m, 3) neighbouring triangles, -1 for none, and the (m, 3) local edge index in those neighbours.
+    """
+    starts = triangles.ravel()
+    ends = triangles[:, [1, 2, 0]].ravel()
+    num_vertices = int(triangles.max()) + 1 if len(triangles) else 0
+    keys = starts * num_vertices + ends
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    # the neighbour across an edge holds the same edge in the opposite direction
+    reverse_keys = ends * num_vertices + starts
+    positions = np.minimum(np.searchsorted(sorted_keys, reverse_keys), len(keys) - 1)
+    found = sorted_keys[positions] == reverse_keys
+    neighbour_edges = np.where(found, order[positions], -1)
+    neighbours = np.where(found, neighbour_edges // 3, -1)
+    return neighbours.reshape(-1, 3), (neighbour_edges % 3).reshape(-1, 3)
+
+
+def grow_strip(start, edge, triangles, neighbours, neighbour_edges, used):
+    """Grow a strip from a start triangle, the first two strip vertices being those of the given edge.
+
+    :return: The strip vertices and triangles.
+    """
+    triangle = triangles[start]
+    strip = [triangle[edge], triangle[(edge + 1) % 3], triangle[(edge + 2) % 3]]
+    strip_triangles = [start]
+    claimed = {start}
+    current = start
+    odd = False
+    while True:
+        # the next triangle shares the last two strip vertices, which are on a different edge for odd triangles
+        exit_edge = (edge + 2) % 3 if odd else (edge + 1) % 3
+        neighbour = neighbours[current][exit_edge]
+        if neighbour < 0 or used[neighbour] or neighbour in claimed:
+            return strip, strip_triangles
+        edge = neighbour_edges[current][exit_edge]
+        current = neighbour
+        odd = not odd
+        strip.append(triangles[current][(edge + 2) % 3])
+        strip_triangles.append(current)
+        claimed.add(current)
+
+
+def build_strips(triangles):
+    """Greedily cover the triangles with strips.
+
+    Start triangles are picked by increasing number of neighbours, so strips start on the mesh boundary,
+    and each strip is grown in the direction that covers the most triangles.
+
+    :param triangles: The (m, 3) vertex indices of the triangles, without degenerate triangles.
+    :return: The list of strips.
+    """
+    neighbours, neighbour_edges = get_neighbours(triangles)
+    start_order = np.argsort(np.count_nonzero(neighbours >= 0, axis=1), kind='stable').tolist()
+    triangles = triangles.tolist()
+    neighbours = neighbours.tolist()
+    neighbour_edges = neighbour_edges.tolist()
+
+    used = [False] * len(triangles)
+    strips = []
+    for start in start_order:
+        if used[start]:
+            continue
+        strip, strip_triangles = max((grow_strip(start, edge, triangles, neighbours, neighbour_edges, used)
+                                      for edge in range(3)), key=lambda result: len(result[1]))
+        for triangle in strip_triangles:
+            used[triangle] = True
+        strips.append(strip)
+    return strips
+
+
+def stitch_strips(strips):
+    """Join strips into a single strip, with degenerate triangles in between.
+
+    The stitch repeats the last vertex of a strip, once more when needed to keep the winding of the next strip,
+    followed by the first vertex of the next strip.
+    """
+    lengths = np.array([len(strip) for strip in strips], dtype=np.int64)
+    # the stitched strip so far has the parity of the length of the last strip
+    stitch_lengths = np.zeros(len(strips), dtype=np.int64)
+    stitch_lengths[1:] = 2 + lengths[:-1] % 2
+    starts = np.cumsum(stitch_lengths + lengths) - lengths
+
+    result = np.empty(starts[-1] + lengths[-1], dtype=np.int64)
+    flat = np.concatenate([np.asarray(strip, dtype=np.int64) for strip in strips])
+    strip_offsets = np.cumsum(lengths) - lengths
+    result[np.repeat(starts - strip_offsets, lengths) + np.arange(len(flat))] = flat
+
+    # fill the stitches
+    firsts = flat[strip_offsets[1:]]
+    lasts = flat[strip_offsets[1:] - 1]
+    result[starts[1:] - 1] = firsts
+    repeats = stitch_lengths[1:] - 1
+    repeat_starts = np.repeat(starts[1:] - stitch_lengths[1:], repeats)
+    repeat_offsets = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    result[repeat_starts + repeat_offsets] = np.repeat(lasts, repeats)
+    return result.tolist()
+
+
+def stitch_strip_groups(strips):
+    """Stitch consecutive strips into as few strips as the maximum strip length allows."""
+    groups = []
+    group = []
+    group_length = 0
+    for strip in strips:
+        # a stitch takes at most three extra vertices
+        if group and group_length + 3 + len(strip) > MAX_STRIP_LENGTH:
+            groups.append(group)
+            group = []
+            group_length = 0
+        group_length += len(strip) + (3 if group else 0)
+        group.append(strip)
+    if group:
+        groups.append(group)
+    return [stitch_strips(group) for group in groups]
+
+
+def stripify(triangles, stitch=False):
+    """Convert triangles into strips.
+
+    :param triangles: The triangles, as a sequence of vertex index triples.
+    :param stitch: Whether to stitch the strips together.
+    :return: The list of strips.
+    """
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    # degenerate triangles are never rendered, and would confuse the neighbour search
+    triangles = triangles[(triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) &
+                          (triangles[:, 2] != triangles[:, 0])]
+    if not len(triangles):
+        return []
+    strips = build_strips(triangles)
+    if stitch:
+        strips = stitch_strip_groups(strips)
+    return strips
+
+
+def set_strips(n_data, strips):
+    """Fill NiTriStripsData with strips, as pyffi's set_strips does."""
+    n_data.num_strips = len(strips)
+    n_data.strip_lengths.update_size()
+    for i, strip in enumerate(strips):
+        n_data.strip_lengths[i] = len(strip)
+    n_data.num_triangles = sum(len(strip) - 2 for strip in strips)
+    n_data.has_points = (len(strips) > 0)
+    n_data.points.update_size()
+    for n_points, strip in zip(n_data.points, strips):
+        for j, index in enumerate(strip):
+            n_points[j] = index
+
+
+def set_triangles(n_data, triangles, stitch=False):
+    """Stripify triangles into NiTriStripsData, replaces pyffi's NiTriStripsData.set_triangles."""
+    strips = stripify(triangles, stitch)
+    set_strips(n_data, strips)
+    NifLog.info("Stripified {0} triangles into {1} strips of {2} indices.".format(
+        len(triangles), len(strips), sum(len(strip) for strip in strips)))
@@ -0,0 +1,172 @@
+"""This module contains a vertex cache optimizer, reordering triangles and vertices for faster rendering."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+from collections import deque
+
+import numpy as np
+
+from io_scene_nif.utils.util_logging import NifLog
+
+# scoring constants of Tom Forsyth's linear-speed vertex cache optimisation
+CACHE_DECAY_POWER = 1.5
+LAST_TRI_SCORE = 0.75
+VALENCE_BOOST_SCALE = 2.0
+VALENCE_BOOST_POWER = 0.5
+
+
+def get_acmr(triangles, cache_size=32):
+    """Get the average cache miss ratio, the number of vertex cache misses per triangle, for a FIFO cache."""
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    if not len(triangles):
+        return 0.0
+    cache = deque()
+    in_cache = set()
+    misses = 0
+    for vertex in triangles.ravel().tolist():
+        if vertex not in in_cache:
+            misses += 1
+            cache.append(vertex)
+            in_cache.add(vertex)
+            if len(cache) > cache_size:
+                in_cache.discard(cache.popleft())
+    return misses / len(triangles)
+
+
+def get_vertex_triangles(triangles, num_vertices):
+    """Get, for each vertex, the list of triangles that use it."""
+    flat = triangles.ravel()
+    order = np.argsort(flat, kind='stable') // 3
+    counts = np.bincount(flat, minlength=num_vertices)
+    return [part.tolist() for part in np.split(order, np.cumsum(counts)[:-1])]
+
+
+def get_cache_optimized_triangle_order(triangles, num_vertices, cache_size=32):
+    """Reorder triangles for vertex cache locality, following Tom Forsyth's linear-speed vertex cache optimisation.
+
+    :param triangles: The (m, 3) vertex indices of the triangles.
+    :param num_vertices: The number of vertices.
+    :param cache_size: The size of the simulated LRU vertex cache.
+    :return: The list of triangle indices, in optimized order.
+    """
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    num_triangles = len(triangles)
+    if not num_triangles:
+        return []
+    vertex_triangles = get_vertex_triangles(triangles, num_vertices)
+    max_valence = max(len(vertex_tris) for vertex_tris in vertex_triangles)
+
+    # the three vertices of the last triangle get a fixed score, so the next triangle does not simply reuse the same edge
+    cache_scores = [LAST_TRI_SCORE] * min(3, cache_size) + [
+        (1.0 - (pos - 3) / (cache_size - 3)) ** CACHE_DECAY_POWER for pos in range(3, cache_size)]
+    # bonus for vertices with few remaining triangles, to get rid of lone vertices quickly
+    valence_scores = [0.0] + [VALENCE_BOOST_SCALE * valence ** -VALENCE_BOOST_POWER for valence in range(1, max_valence + 1)]
+
+    vertex_scores = [valence_scores[len(vertex_tris)] for vertex_tris in vertex_triangles]
+    triangle_list = triangles.tolist()
+    triangle_scores = [vertex_scores[a] + vertex_scores[b] + vertex_scores[c] for a, b, c in triangle_list]
+    # when no triangle touches the cache, continue with the best scoring triangle that is left
+    fallback_order = np.argsort(-np.array(triangle_scores), kind='stable').tolist()
+    fallback_index = 0
+
+    added = [False] * num_triangles
+    order = []
+    cache = []
+    best = fallback_order[0]
+    while True:
+        added[best] = True
+        order.append(best)
+        if len(order) == num_triangles:
+            return order
+
+        # the vertices of the added triangle move to the front of the cache
+        triangle_vertices = list(dict.fromkeys(triangle_list[best]))
+        for vertex in triangle_list[best]:
+            vertex_triangles[vertex].remove(best)
+        new_cache = triangle_vertices + [vertex for vertex in cache if vertex not in triangle_vertices]
+        cache = new_cache[:cache_size]
+        for vertex in new_cache[cache_size:]:
+            vertex_scores[vertex] = valence_scores[len(vertex_triangles[vertex])]
+        for pos, vertex in enumerate(cache):
+            vertex_scores[vertex] = cache_scores[pos] + valence_scores[len(vertex_triangles[vertex])]
+
+        # rescore the triangles that use cached vertices, and pick the best one
+        best = -1
+        best_score = -1.0
+        for vertex in cache:
+            for triangle in vertex_triangles[vertex]:
+                a, b, c = triangle_list[triangle]
+                score = vertex_scores[a] + vertex_scores[b] + vertex_scores[c]
+                triangle_scores[triangle] = score
+                if score > best_score:
+                    best = triangle
+                    best_score = score
+        if best < 0:
+            while added[fallback_order[fallback_index]]:
+                fallback_index += 1
+            best = fallback_order[fallback_index]
+
+
+def get_fetch_optimized_vertex_order(triangles, num_vertices):
+    """Order vertices by their first use in the triangles, unused vertices go last.
+
+    :return: The old index of each new vertex.
+    """
+    flat = np.asarray(triangles, dtype=np.int64).ravel()
+    used, first_use = np.unique(flat, return_index=True)
+    unused = np.setdiff1d(np.arange(num_vertices), used)
+    return np.concatenate((used[np.argsort(first_use)], unused)).tolist()
+
+
+def optimize_vertex_cache(triangles, num_vertices, cache_size=32):
+    """Reorder triangles for vertex cache locality, and then vertices for fetch locality.
+
+    :param triangles: The (m, 3) vertex indices of the triangles.
+    :param num_vertices: The number of vertices.
+    :param cache_size: The size of the simulated vertex cache.
+    :return: The old index of each new triangle, the old index of each new vertex, and the remapped triangles.
+    """
+    triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+    triangle_order = get_cache_optimized_triangle_order(triangles, num_vertices, cache_size)
+    vertex_order = get_fetch_optimized_vertex_order(triangles[triangle_order], num_vertices)
+    vertex_map = np.empty(num_vertices, dtype=np.int64)
+    vertex_map[vertex_order] = np.arange(num_vertices)
+    new_triangles = vertex_map[triangles[triangle_order]]
+    NifLog.info("Optimized vertex cache, ACMR went from {0:.3f} to {1:.3f}".format(
+        get_acmr(triangles, cache_size), get_acmr(new_triangles, cache_size)))
+    return triangle_order, vertex_order, new_triangles
@@ -0,0 +1,208 @@
+"""This script keeps an index of the image headers under the texture roots, to rewrite and validate texture paths on export."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import os
+
+from io_scene_nif.io.image import read_image_file_info
+from io_scene_nif.utils.util_logging import NifLog
+
+TEXTURES_FOLDER = "textures"
+
+
+def split_texture_path(filepath):
+    """Split a texture path at its textures folder, into the data folder and the path relative to it.
+    :return The data folder and the relative path, or None and the path if it is not in a textures folder.
+    """
+    parts = filepath.replace('\\', '/').split('/')
+    for i, part in enumerate(parts):
+        if part.lower() == TEXTURES_FOLDER:
+            return '/'.join(parts[:i]), '/'.join(parts[i:])
+    return None, filepath
+
+
+def get_texture_root(filepath):
+    """Get the folder whose images are indexed together with a texture: its textures folder, or else its own folder."""
+    data_dir, rel_path = split_texture_path(filepath)
+    if data_dir is None:
+        return os.path.dirname(os.path.abspath(filepath))
+    # keep the case of the textures folder, for case sensitive file systems
+    return os.path.abspath(os.path.join(data_dir, rel_path.split('/')[0]))
+
+
+class TextureEntry:
+    """An image file under a texture root, with its header info as of its modification time and size."""
+
+    def __init__(self, mtime, size, info):
+        self.mtime = mtime
+        self.size = size
+        self.info = info
+
+
+class TextureDirectory:
+    """The subdirectories and image files of a directory under a texture root, as of its modification time."""
+
+    def __init__(self, mtime, subdirs, entries):
+        self.mtime = mtime
+        self.subdirs = subdirs
+        # case insensitive path relative to the root -> entry
+        self.entries = entries
+
+
+class TextureMetadataIndex:
+    """The image files under each texture root, and their header info, scanned once per export.
+
+    A directory is only listed again when its modification time changed since an earlier export, as it does when files
+    are added, removed or replaced in it. Headers are only read again for files whose modification time or size
+    changed."""
+
+    def __init__(self):
+        # root -> case insensitive relative path -> entry
+        self.roots = {}
+        # root -> relative directory -> directory
+        self.directories = {}
+        self.scanned = set()
+        self.validated = set()
+
+    def invalidate(self):
+        """Scan the roots again before their next use, as files may have changed."""
+        self.scanned = set()
+        self.validated = set()
+
+    @staticmethod
+    def get_key(path):
+        return os.path.normpath(path).replace(os.sep, '/').lower()
+
+    def list_directory(self, root, rel_dir, mtime, old_directory):
+        """List a directory under a texture root, reading the headers of its new and changed images.
+        :return The directory, and the number of headers that were read.
+        """
+        old_entries = old_directory.entries if old_directory else {}
+        subdirs = []
+        entries = {}
+        num_read = 0
+        try:
+            dir_entries = list(os.scandir(os.path.join(root, rel_dir)))
+        except OSError:
+            dir_entries = []
+        for dir_entry in dir_entries:
+            try:
+                if dir_entry.is_dir():
+                    subdirs.append(dir_entry.name)
+                    continue
+                stat = dir_entry.stat()
+            except OSError:
+                continue
+            key = self.get_key(os.path.join(rel_dir, dir_entry.name))
+            entry = old_entries.get(key)
+            if not entry or entry.mtime != stat.st_mtime or entry.size != stat.st_size:
+                entry = TextureEntry(stat.st_mtime, stat.st_size, read_image_file_info(dir_entry.path, os.path.splitext(dir_entry.name)[1]))
+                num_read += 1
+            entries[key] = entry
+        return TextureDirectory(mtime, subdirs, entries), num_read
+
+    def scan(self, root):
+        """Walk a texture root, listing only the directories that changed since the last scan."""
+        old_directories = self.directories.get(root, {})
+        directories = {}
+        num_listed = num_read = 0
+        # only textures folders are walked down, other folders could be anywhere
+        is_textures_folder = os.path.basename(root).lower() == TEXTURES_FOLDER
+        pending = [os.curdir]
+        while pending:
+            rel_dir = pending.pop()
+            try:
+                mtime = os.stat(os.path.join(root, rel_dir)).st_mtime
+            except OSError:
+                continue
+            directory = old_directories.get(rel_dir)
+            if not directory or directory.mtime != mtime:
+                directory, num_dir_read = self.list_directory(root, rel_dir, mtime, directory)
+                num_listed += 1
+                num_read += num_dir_read
+            directories[rel_dir] = directory
+            if is_textures_folder:
+                pending.extend(os.path.normpath(os.path.join(rel_dir, subdir)) for subdir in directory.subdirs)
+        self.directories[root] = directories
+        self.roots[root] = {key: entry for directory in directories.values() for key, entry in directory.entries.items()}
+        NifLog.debug("Indexed {0} files under {1}, listed {2} of {3} directories and read {4} headers".format(
+            len(self.roots[root]), root, num_listed, len(directories), num_read))
+        self.scanned.add(root)
+
+    def get_entry(self, filepath):
+        root = get_texture_root(filepath)
+        if root not in self.scanned:
+            self.scan(root)
+        return self.roots[root].get(self.get_key(os.path.relpath(os.path.abspath(filepath), root)))
+
+    def exists(self, filepath):
+        """Check whether a texture file exists, ignoring case."""
+        return self.get_entry(filepath) is not None
+
+    def get_info(self, filepath):
+        """Get the header info of a texture file, or None if it does not exist or its format is not supported."""
+        entry = self.get_entry(filepath)
+        return entry.info if entry else None
+
+    def validate(self, filepath):
+        """Warn about a texture that is missing, or that may not display well in game, once per export.
+        :return Whether no issues were found.
+        """
+        key = self.get_key(os.path.abspath(filepath))
+        if key in self.validated:
+            return True
+        self.validated.add(key)
+
+        entry = self.get_entry(filepath)
+        if not entry:
+            NifLog.warn("Texture {0} does not exist".format(filepath))
+            return False
+        info = entry.info
+        if not info:
+            return True
+        is_valid = True
+        if not info.is_power_of_two():
+            NifLog.warn("Texture {0} is {1} x {2}, which is not a power of two".format(filepath, info.width, info.height))
+            is_valid = False
+        if filepath.lower().endswith('.dds') and info.num_mipmaps < info.get_full_mipmap_count():
+            NifLog.warn("Texture {0} has {1} of {2} mipmaps".format(filepath, info.num_mipmaps, info.get_full_mipmap_count()))
+            is_valid = False
+        return is_valid
+
+
+texture_metadata = TextureMetadataIndex()
@@ -43,6 +43,7 @@ import bpy
 from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.modules.nif_export.block_registry import block_store
+from io_scene_nif.modules.nif_export.property.texture.metadata import split_texture_path, texture_metadata
 from io_scene_nif.utils import util_math
 from io_scene_nif.utils.util_global import NifOp
 from io_scene_nif.utils.util_logging import NifLog
@@ -130,8 +131,10 @@ class TextureWriter:
 
             # try and find a DDS alternative, force it if required
             ddsfilename = "%s%s" % (filename[:-4], '.dds')
-            if os.path.exists(ddsfilename) or NifOp.props.force_dds:
+            if texture_metadata.exists(bpy.path.abspath(ddsfilename)) or NifOp.props.force_dds:
                 filename = ddsfilename
+            # warn about textures that would only show up as broken in game
+            texture_metadata.validate(bpy.path.abspath(filename))
 
             # sanitize file path
             if NifOp.props.game not in ('MORROWIND', 'OBLIVION', 'FALLOUT_3', 'SKYRIM'):
@@ -140,10 +143,9 @@ class TextureWriter:
 
             else:
                 # strip the data files prefix from the n_texture's file name
-                filename = filename.lower()
-                idx = filename.find("textures")
-                if idx >= 0:
-                    filename = filename[idx:]
+                data_dir, rel_path = split_texture_path(filename)
+                if data_dir is not None:
+                    filename = rel_path.lower()
                 else:
                     NifLog.warn("{0} does not reside in a 'Textures' folder; texture path will be stripped and textures may not display in-game".format(filename))
                     filename = os.path.basename(filename)
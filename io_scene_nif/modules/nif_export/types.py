@@ -83,21 +83,29 @@ def export_range_lod_data(n_node, b_obj):
     """Export range lod data for for the children of b_obj, as a
     NiRangeLODData block on n_node.
     """
+    extents = [(b_child["near_extent"], b_child["far_extent"]) for b_child in b_obj.children]
+    export_lod_extents(n_node, extents, b_obj)
+
+
+def export_lod_extents(n_node, extents, b_obj=None, center=None):
+    """Export the (near, far) extents of each level of detail, as a
+    NiRangeLODData block on n_node.
+    """
     # create range lod data object
     n_range_data = block_store.create_block("NiRangeLODData", b_obj)
     n_node.lod_level_data = n_range_data
 
-    # get the children
-    b_children = b_obj.children
-
     # set the data
-    n_node.num_lod_levels = len(b_children)
-    n_range_data.num_lod_levels = len(b_children)
+    if center is not None:
+        for n_center in (n_node.lod_center, n_range_data.lod_center):
+            n_center.x, n_center.y, n_center.z = center
+    n_node.num_lod_levels = len(extents)
+    n_range_data.num_lod_levels = len(extents)
     n_node.lod_levels.update_size()
     n_range_data.lod_levels.update_size()
-    for b_child, n_lod_level, n_rd_lod_level in zip(b_children, n_node.lod_levels, n_range_data.lod_levels):
-        n_lod_level.near_extent = b_child["near_extent"]
-        n_lod_level.far_extent = b_child["far_extent"]
+    for (near_extent, far_extent), n_lod_level, n_rd_lod_level in zip(extents, n_node.lod_levels, n_range_data.lod_levels):
+        n_lod_level.near_extent = near_extent
+        n_lod_level.far_extent = far_extent
         n_rd_lod_level.near_extent = n_lod_level.near_extent
         n_rd_lod_level.far_extent = n_lod_level.far_extent
 
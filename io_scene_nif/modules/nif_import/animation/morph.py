@@ -40,6 +40,7 @@
 import bpy
 from pyffi.formats.nif import NifFormat
 
+from io_scene_nif.io.egm import EGMFile
 from io_scene_nif.modules.nif_import import animation
 from io_scene_nif.modules.nif_import.animation import Animation
 from io_scene_nif.utils import util_math
@@ -59,7 +60,6 @@ class MorphAnimation(Animation):
         n_morphCtrl = util_math.find_controller(n_node, NifFormat.NiGeomMorpherController)
         if n_morphCtrl:
             NifLog.debug("NiGeomMorpherController processed")
-            b_mesh = b_obj.data
             morphData = n_morphCtrl.data
             if morphData.num_morphs:
                 # get name for base key
@@ -71,7 +71,7 @@ class MorphAnimation(Animation):
                 sk_basis = b_obj.shape_key_add(name=keyname)
 
                 # get base vectors and import all morphs
-                baseverts = morphData.morphs[0].vectors
+                base_verts = util_math.nif_vectors_to_array(morphData.morphs[0].vectors)
 
                 shape_action = self.create_action(b_obj.data.shape_keys, b_obj.name + "-Morphs")
                 
@@ -82,9 +82,8 @@ class MorphAnimation(Animation):
                         keyname = 'Key %i' % idxMorph
                     NifLog.info("Inserting key '{0}'".format(keyname))
                     # get vectors
-                    morph_verts = morphData.morphs[idxMorph].vectors
-                    self.morph_mesh(b_mesh, baseverts, morph_verts)
-                    shape_key = b_obj.shape_key_add(name=keyname, from_mix=False)
+                    morph_verts = util_math.nif_vectors_to_array(morphData.morphs[idxMorph].vectors)
+                    shape_key = self.add_morph_key(b_obj, keyname, base_verts, morph_verts)
 
                     # first find the keys
                     # older versions store keys in the morphData
@@ -112,37 +111,25 @@ class MorphAnimation(Animation):
         """Import all EGM morphs as shape keys for blender object."""
         # TODO [morph][egm] if there is an egm, the assumption is that there is only one mesh in the nif
         b_mesh = b_obj.data
-        sym_morphs = [list(morph.get_relative_vertices()) for morph in EGMData.data.sym_morphs]
-        asym_morphs = [list(morph.get_relative_vertices()) for morph in EGMData.data.asym_morphs]
+        base_verts = util_math.nif_vectors_to_array(n_verts)
 
         # insert base key at frame 1, using absolute keys
         sk_basis = b_obj.shape_key_add(name="Basis")
         b_mesh.shape_keys.use_relative = False
 
-        morphs = ([(morph, "EGM SYM %i" % i) for i, morph in enumerate(sym_morphs)] +
-                  [(morph, "EGM ASYM %i" % i) for i, morph in enumerate(asym_morphs)])
-
-        for morph_verts, key_name in morphs:
-            # convert tuples into vector here so we can simply add in morph_mesh()
-            morphvert_out = []
-            for u in morph_verts:
-                v = NifFormat.Vector3()
-                v.x, v.y, v.z = u
-                morphvert_out.append(v)
-            self.morph_mesh(b_mesh, n_verts, morphvert_out)
-            # TODO [animation] unused variable is it required
-            shape_key = b_obj.shape_key_add(name=key_name, from_mix=False)
-
-    def morph_mesh(self, b_mesh, baseverts, morphverts):
-        """Transform a mesh to be in the shape given by morphverts."""
-        # for each vertex calculate the key position from base
-        # pos + delta offset
+        morphs = ([(morph, "EGM SYM %i" % i) for i, morph in enumerate(EGMData.data.sym_morphs)] +
+                  [(morph, "EGM ASYM %i" % i) for i, morph in enumerate(EGMData.data.asym_morphs)])
+
+        for morph, key_name in morphs:
+            morph_verts = EGMFile.get_relative_vertices(morph)
+            self.add_morph_key(b_obj, key_name, base_verts, morph_verts)
+
+    @staticmethod
+    def add_morph_key(b_obj, key_name, base_verts, morph_verts):
+        """Add a shape key whose absolute positions are base_verts + morph_verts, without touching the base mesh."""
         # length check disabled
         # as sometimes, oddly, the morph has more vertices...
-        # assert(len(baseverts) == len(morphverts))
-        for b_v_index, (bv, mv) in enumerate(zip(baseverts, morphverts)):
-            # pyffi vector3
-            v = bv + mv
-            # if applytransform:
-            # v *= transform
-            b_mesh.vertices[b_v_index].co = v.as_tuple()
+        num_verts = min(len(base_verts), len(morph_verts))
+        shape_key = b_obj.shape_key_add(name=key_name, from_mix=False)
+        util_math.set_b_coords(shape_key.data, base_verts[:num_verts] + morph_verts[:num_verts])
+        return shape_key
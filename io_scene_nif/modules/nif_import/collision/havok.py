@@ -37,8 +37,8 @@
 #
 # ***** END LICENSE BLOCK *****
 
-import bpy
 import mathutils
+import numpy as np
 
 import operator
 from functools import reduce, singledispatch
@@ -48,8 +48,9 @@ from pyffi.utils.quickhull import qhull3d
 
 from io_scene_nif.modules.nif_import import collision
 from io_scene_nif.modules.nif_import.collision import Collision
+from io_scene_nif.modules.nif_import.collision.rigid_body import rigid_bodies
 from io_scene_nif.modules.nif_import.object import Object
-from io_scene_nif.utils import util_consts
+from io_scene_nif.utils import util_consts, util_hull, util_math
 from io_scene_nif.utils.util_global import NifData
 from io_scene_nif.utils.util_logging import NifLog
 
@@ -60,6 +61,7 @@ class BhkCollision(Collision):
         # dictionary mapping bhkRigidBody objects to objects imported in Blender;
         # we use this dictionary to set the physics constraints (ragdoll etc)
         collision.DICT_HAVOK_OBJECTS = {}
+        rigid_bodies.clear()
 
         # TODO [collision][havok][property] Need better way to set this, maybe user property
         if NifData.data._user_version_value_._value == 12 and NifData.data._user_version_2_value_._value == 83:
@@ -157,17 +159,20 @@ class BhkCollision(Collision):
 
     def _import_bhk_rigid_body(self, bhkshape, collision_objs):
         # set physics flags and mass
+        vel = bhkshape.linear_velocity
+        ang_vel = bhkshape.angular_velocity
         for b_col_obj in collision_objs:
-            # todo [collision] make low level, remove operator!
-            bpy.context.view_layer.objects.active = b_col_obj
-            bpy.ops.rigidbody.object_add(type='ACTIVE')
-            b_r_body = b_col_obj.rigid_body
-            b_r_body.enabled = True
-
-            if bhkshape.mass > 0.0001:
-                # for physics emulation
-                # (mass 0 results in issues with simulation)
-                b_r_body.mass = bhkshape.mass / len(collision_objs)
+            # the rigid bodies themselves are attached in one batch, once all collision objects exist
+            rigid_bodies.add(b_col_obj,
+                             enabled=True,
+                             mass=bhkshape.mass / len(collision_objs),
+                             use_deactivation=True,
+                             friction=bhkshape.friction,
+                             restitution=bhkshape.restitution,
+                             linear_damping=bhkshape.linear_damping,
+                             angular_damping=bhkshape.angular_damping,
+                             deactivate_linear_velocity=mathutils.Vector([vel.w, vel.x, vel.y, vel.z]).magnitude,
+                             deactivate_angular_velocity=mathutils.Vector([ang_vel.w, ang_vel.x, ang_vel.y, ang_vel.z]).magnitude)
 
             b_col_obj.nifcollision.deactivator_type = NifFormat.DeactivatorType._enumkeys[bhkshape.deactivator_type]
             b_col_obj.nifcollision.solver_deactivation = NifFormat.SolverDeactivation._enumkeys[
@@ -176,19 +181,6 @@ class BhkCollision(Collision):
             # b_col_obj.nifcollision.quality_type = NifFormat.MotionQuality._enumkeys[bhkshape.quality_type]
             # b_col_obj.nifcollision.motion_system = NifFormat.MotionSystem._enumkeys[bhkshape.motion_system]
 
-            b_r_body.mass = bhkshape.mass / len(collision_objs)
-
-            b_r_body.use_deactivation = True
-            b_r_body.friction = bhkshape.friction
-            b_r_body.restitution = bhkshape.restitution
-            b_r_body.linear_damping = bhkshape.linear_damping
-            b_r_body.angular_damping = bhkshape.angular_damping
-            vel = bhkshape.linear_velocity
-            b_r_body.deactivate_linear_velocity = mathutils.Vector([vel.w, vel.x, vel.y, vel.z]).magnitude
-            ang_vel = bhkshape.angular_velocity
-            b_r_body.deactivate_angular_velocity = mathutils.Vector(
-                [ang_vel.w, ang_vel.x, ang_vel.y, ang_vel.z]).magnitude
-
             b_col_obj.collision.permeability = bhkshape.penetration_depth
 
             b_col_obj.nifcollision.max_linear_velocity = bhkshape.max_linear_velocity
@@ -257,9 +249,13 @@ class BhkCollision(Collision):
         NifLog.debug("Importing {0}".format(bhk_shape.__class__.__name__))
 
         # find vertices (and fix scale)
-        scaled_verts = [(self.HAVOK_SCALE * n_vert.x, self.HAVOK_SCALE * n_vert.y, self.HAVOK_SCALE * n_vert.z)
-                        for n_vert in bhk_shape.vertices]
-        verts, faces = qhull3d(scaled_verts)
+        scaled_verts = util_math.nif_vectors_to_array(bhk_shape.vertices, dtype=np.float64) * self.HAVOK_SCALE
+        verts, faces = util_hull.get_hull(scaled_verts)
+        if len(faces):
+            verts, faces = verts.tolist(), faces.tolist()
+        else:
+            # flat hulls have no volume, let pyffi's quickhull find their polygon
+            verts, faces = qhull3d([tuple(vert) for vert in scaled_verts.tolist()])
 
         b_obj = Object.mesh_from_data("convexpoly", verts, faces)
         radius = bhk_shape.radius * self.HAVOK_SCALE
@@ -273,37 +269,43 @@ class BhkCollision(Collision):
 
         # create mesh for each sub shape
         hk_objects = []
-        vertex_offset = 0
         subshapes = bhk_shape.sub_shapes
 
         if not subshapes:
             # fallout 3 stores them in the data
             subshapes = bhk_shape.data.sub_shapes
 
+        verts = util_math.nif_vectors_to_array(bhk_shape.data.vertices, dtype=np.float64) * self.HAVOK_SCALE
+        triangles = np.array([(bhk_triangle.triangle.v_1, bhk_triangle.triangle.v_2, bhk_triangle.triangle.v_3)
+                              for bhk_triangle in bhk_shape.data.triangles], dtype=np.int64).reshape(-1, 3)
+
+        # each sub shape owns a range of vertices, and a triangle belongs to the sub shape of its first vertex
+        num_vertices = np.array([subshape.num_vertices for subshape in subshapes], dtype=np.int64)
+        vertex_offsets = np.cumsum(num_vertices) - num_vertices
+        triangle_subshapes = np.searchsorted(vertex_offsets, triangles[:, 0], side='right') - 1
+        # triangles whose first vertex is in no sub shape's range belong to none, they sort before the first slice
+        out_of_range = (triangles[:, 0] < 0) | (triangles[:, 0] >= num_vertices.sum())
+        triangle_subshapes[out_of_range] = -1
+        if out_of_range.any():
+            NifLog.warn("Skipped {0} triangles with vertices outside of all sub shapes".format(np.count_nonzero(out_of_range)))
+        # sort once, so the triangles of each sub shape are a slice
+        triangle_order = np.argsort(triangle_subshapes, kind='stable')
+        triangle_bounds = np.searchsorted(triangle_subshapes[triangle_order], np.arange(len(subshapes) + 1))
+
         for subshape_num, subshape in enumerate(subshapes):
-            verts = []
-            faces = []
-            for vert_index in range(vertex_offset, vertex_offset + subshape.num_vertices):
-                n_vert = bhk_shape.data.vertices[vert_index]
-                verts.append((n_vert.x * self.HAVOK_SCALE,
-                              n_vert.y * self.HAVOK_SCALE,
-                              n_vert.z * self.HAVOK_SCALE))
-
-            for bhk_triangle in bhk_shape.data.triangles:
-                bhk_tri = bhk_triangle.triangle
-                if (vertex_offset <= bhk_tri.v_1) and (bhk_tri.v_1 < vertex_offset + subshape.num_vertices):
-                    faces.append((bhk_tri.v_1 - vertex_offset,
-                                  bhk_tri.v_2 - vertex_offset,
-                                  bhk_tri.v_3 - vertex_offset))
-                else:
-                    continue
-
-            b_obj = Object.mesh_from_data('poly%i' % subshape_num, verts, faces)
-            radius = min(vert.co.length for vert in b_obj.data.vertices)
+            vertex_offset = vertex_offsets[subshape_num]
+            subshape_verts = verts[vertex_offset:vertex_offset + num_vertices[subshape_num]]
+            faces = triangles[triangle_order[triangle_bounds[subshape_num]:triangle_bounds[subshape_num + 1]]] - vertex_offset
+            valid = ((faces >= 0) & (faces < len(subshape_verts))).all(axis=1)
+            if not valid.all():
+                NifLog.warn("Skipped {0} triangles that span several sub shapes".format(np.count_nonzero(~valid)))
+                faces = faces[valid]
+
+            b_obj = Object.mesh_from_arrays('poly%i' % subshape_num, subshape_verts, faces)
+            radius = np.linalg.norm(subshape_verts, axis=1).min() if len(subshape_verts) else 0.0
             self.set_b_collider(b_obj, "BOX", radius, subshape)
             # b_obj.rigid_body.collision_shape = 'TRIANGLE_MESH'
 
-            vertex_offset += subshape.num_vertices
             hk_objects.append(b_obj)
 
         return hk_objects
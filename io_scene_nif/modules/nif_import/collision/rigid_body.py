@@ -0,0 +1,102 @@
+"""This script attaches rigid bodies to imported collision objects in one batch."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import bpy
+
+from io_scene_nif.utils.util_logging import NifLog
+
+
+class RigidBodyBatch:
+    """Collect the collision objects that need a rigid body, and attach all of them at once.
+
+    bpy.ops.rigidbody.object_add only works on the active object, and every call updates the depsgraph and pushes
+    an undo step. Instead, all objects are linked to the rigid body world's collection, which makes Blender give them
+    a rigid body, and their settings are then written directly."""
+
+    def __init__(self):
+        self.settings = {}
+
+    def clear(self):
+        self.settings = {}
+
+    def add(self, b_obj, **settings):
+        """Queue a rigid body for b_obj, with the given rigid body attributes; settings of later calls take precedence."""
+        self.settings.setdefault(b_obj, {}).update(settings)
+
+    @staticmethod
+    def get_world(b_scene):
+        """Get the rigid body world of a scene and its collection, creating them if needed."""
+        if not b_scene.rigidbody_world:
+            # the world can only be created by its operator, but only once per scene
+            bpy.ops.rigidbody.world_add({'scene': b_scene})
+        b_world = b_scene.rigidbody_world
+        if not b_world.collection:
+            b_collection = bpy.data.collections.get("RigidBodyWorld")
+            if not b_collection:
+                b_collection = bpy.data.collections.new("RigidBodyWorld")
+            b_world.collection = b_collection
+        return b_world
+
+    def attach(self):
+        """Give all queued objects a rigid body, and set its attributes."""
+        if not self.settings:
+            return
+        b_scene = bpy.context.scene
+        b_world = self.get_world(b_scene)
+        b_objs = [b_obj for b_obj in self.settings if not b_obj.rigid_body]
+        NifLog.debug("Adding {0} rigid bodies".format(len(b_objs)))
+        b_collection_objects = b_world.collection.objects
+        for b_obj in b_objs:
+            if b_obj.name not in b_collection_objects:
+                b_collection_objects.link(b_obj)
+        # objects in the collection of the world get their rigid body on the next update
+        bpy.context.view_layer.update()
+        missing = [b_obj for b_obj in b_objs if not b_obj.rigid_body]
+        if missing:
+            # fall back on a single operator call for all of them
+            bpy.ops.rigidbody.objects_add({'scene': b_scene, 'selected_objects': missing}, type='ACTIVE')
+
+        for b_obj, settings in self.settings.items():
+            b_r_body = b_obj.rigid_body
+            for name, value in settings.items():
+                setattr(b_r_body, name, value)
+        self.clear()
+
+
+rigid_bodies = RigidBodyBatch()
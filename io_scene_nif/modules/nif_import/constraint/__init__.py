@@ -41,6 +41,7 @@ import mathutils
 from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.modules.nif_import import collision
+from io_scene_nif.modules.nif_import.collision.rigid_body import rigid_bodies
 from io_scene_nif.utils.util_global import NifData
 from io_scene_nif.utils.util_logging import NifLog
 
@@ -92,20 +93,20 @@ class Constraint:
             # get constraint descriptor
             if isinstance(hkconstraint, NifFormat.bhkRagdollConstraint):
                 hkdescriptor = hkconstraint.ragdoll
-                b_hkobj.rigid_body.enabled = True
+                rigid_bodies.add(b_hkobj, enabled=True)
             elif isinstance(hkconstraint, NifFormat.bhkLimitedHingeConstraint):
                 hkdescriptor = hkconstraint.limited_hinge
-                b_hkobj.rigid_body.enabled = True
+                rigid_bodies.add(b_hkobj, enabled=True)
             elif isinstance(hkconstraint, NifFormat.bhkHingeConstraint):
                 hkdescriptor = hkconstraint.hinge
-                b_hkobj.rigid_body.enabled = True
+                rigid_bodies.add(b_hkobj, enabled=True)
             elif isinstance(hkconstraint, NifFormat.bhkMalleableConstraint):
                 if hkconstraint.type == 7:
                     hkdescriptor = hkconstraint.ragdoll
-                    b_hkobj.rigid_body.enabled = False
+                    rigid_bodies.add(b_hkobj, enabled=False)
                 elif hkconstraint.type == 2:
                     hkdescriptor = hkconstraint.limited_hinge
-                    b_hkobj.rigid_body.enabled = False
+                    rigid_bodies.add(b_hkobj, enabled=False)
                 else:
                     NifLog.warn("Unknown malleable type ({0}), skipped".format(str(hkconstraint.type)))
                 # TODO [constraint][flag] Damping parameters not yet in Blender Python API
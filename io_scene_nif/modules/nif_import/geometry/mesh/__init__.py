@@ -106,7 +106,7 @@ class Mesh:
             self.morph_anim.import_morph_controller(n_block, b_obj)
         # import facegen morphs
         if EGMData.data:
-            self.morph_anim.import_egm_morphs(b_obj, n_tri_data)
+            self.morph_anim.import_egm_morphs(b_obj, n_tri_data.vertices)
 
         # todo [mesh] remove doubles here using blender operator
 
@@ -36,9 +36,11 @@
 # POSSIBILITY OF SUCH DAMAGE.
 #
 # ***** END LICENSE BLOCK *****
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.modules.nif_import.object.block_registry import block_store
+from io_scene_nif.utils import util_math
 from io_scene_nif.utils.util_logging import NifLog
 
 
@@ -46,55 +48,70 @@ class VertexGroup:
     """Class that maps weighted vertices to specific groups"""
 
     @staticmethod
-    def get_skin_deformation_from_partition(n_geom):
-        """ Workaround because pyffi does not support this skinning method """
+    def get_bone_transforms(skin_inst):
+        """Return the (num_bones, 4, 4) skinning transforms and (num_bones, 3, 3) rotations of a skin instance.
 
-        # todo [pyffi] integrate this into pyffi!!!
-        #              so that NiGeometry.get_skin_deformation() deals with this as intended
-
-        # mostly a copy from pyffi...
-        skin_inst = n_geom.skin_instance
+        Matrices follow the pyffi row vector convention, so a vertex is transformed as v * M."""
         skin_data = skin_inst.data
-        skin_partition = skin_inst.skin_partition
         skel_root = skin_inst.skeleton_root
-        vertices = [NifFormat.Vector3() for _ in range(n_geom.data.num_vertices)]
-
-        # ignore normals for now, not needed for import
-        sum_weights = [0.0 for _ in range(n_geom.data.num_vertices)]
         skin_offset = skin_data.get_transform()
 
-        # store one transform per bone
-        bone_transforms = []
+        num_bones = len(skin_inst.bones)
+        transforms = np.tile(np.identity(4), (num_bones, 1, 1))
+        rotations = np.tile(np.identity(3), (num_bones, 1, 1))
         for i, bone_block in enumerate(skin_inst.bones):
-            bone_data = skin_data.bone_list[i]
-            bone_offset = bone_data.get_transform()
+            # skip empty bones (see pyffi issue #3114079)
+            if not bone_block:
+                continue
+            bone_offset = skin_data.bone_list[i].get_transform()
             bone_matrix = bone_block.get_transform(skel_root)
             transform = bone_offset * bone_matrix * skin_offset
-            bone_transforms.append(transform)
-
-        # now the actual unique bit
-        for block in skin_partition.skin_partition_blocks:
-            # create all vgroups for this block's bones
-            block_bone_transforms = [bone_transforms[i] for i in block.bones]
+            scale, rotation, translation = transform.get_scale_rotation_translation()
+            transforms[i] = transform.as_list()
+            rotations[i] = rotation.as_list()
+        return transforms, rotations
 
-            # go over each vert in this block
-            for vert_index, vertex_weights, bone_indices in zip(block.vertex_map, block.vertex_weights, block.bone_indices):
-                # skip verts that were already processed in an earlier block
-                if sum_weights[vert_index] != 0:
-                    continue
-
-                # go over all 4 weight / bone pairs and transform this vert
-                for weight, b_i in zip(vertex_weights, bone_indices):
-                    if weight > 0:
-                        transform = block_bone_transforms[b_i]
-                        vertices[vert_index] += weight * (n_geom.data.vertices[vert_index] * transform)
-                        sum_weights[vert_index] += weight
+    @staticmethod
+    def get_skin_weights(skin_inst):
+        """Gather the (vertex index, bone index, weight) triples of a skin instance into flat arrays.
 
-        for i, s in enumerate(sum_weights):
-            if abs(s - 1.0) > 0.01:
-                print("Vertex %i has weights not summing to one: %i" % (i, sum_weights[i]))
+        Weights hidden in the skin partition (WLP2) are used when the skin data has no vertex weights,
+        a vertex that occurs in several partition blocks only takes its weights from the first one."""
+        skin_data = skin_inst.data
+        # the usual case
+        if skin_data.has_vertex_weights:
+            triples = [(skin_weight.index, bone_index, skin_weight.weight)
+                       for bone_index, bone_data in enumerate(skin_data.bone_list)
+                       for skin_weight in bone_data.vertex_weights]
+            if not triples:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+            vert_indices, bone_indices, weights = (np.array(column) for column in zip(*triples))
+            return vert_indices.astype(np.int64), bone_indices.astype(np.int64), weights.astype(np.float64)
+
+        # WLP2 - hides the weights in the partition
+        vert_chunks, bone_chunks, weight_chunks = [], [], []
+        for block in skin_inst.skin_partition.skin_partition_blocks:
+            if not block.num_vertices:
+                continue
+            vertex_map = np.array(list(block.vertex_map), dtype=np.int64)
+            weights = np.array([list(vertex_weights) for vertex_weights in block.vertex_weights], dtype=np.float64)
+            # partition bone indices are local to the block
+            block_bones = np.array(list(block.bones), dtype=np.int64)
+            bone_indices = block_bones[np.array([list(indices) for indices in block.bone_indices], dtype=np.int64)]
+
+            # skip verts that were already processed in an earlier block
+            if vert_chunks:
+                is_new = ~np.isin(vertex_map, np.concatenate(vert_chunks))
+            else:
+                is_new = np.ones(len(vertex_map), dtype=bool)
+            mask = (weights > 0) & is_new[:, np.newaxis]
+            vert_chunks.append(np.broadcast_to(vertex_map[:, np.newaxis], weights.shape)[mask])
+            bone_chunks.append(bone_indices[mask])
+            weight_chunks.append(weights[mask])
 
-        return vertices
+        if not vert_chunks:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        return np.concatenate(vert_chunks), np.concatenate(bone_chunks), np.concatenate(weight_chunks)
 
     @staticmethod
     def apply_skin_deformation(n_data):
@@ -106,18 +123,27 @@ class VertexGroup:
         for n_geom in set(n_geoms):
             NifLog.info('Applying skin deformation on geometry {0}'.format(n_geom.name))
             skininst = n_geom.skin_instance
-            skindata = skininst.data
-            if skindata.has_vertex_weights:
-                vertices = n_geom.get_skin_deformation()[0]
-            else:
-                NifLog.info("PyFFI does not support this type of skinning, so here's a workaround...")
-                vertices = VertexGroup.get_skin_deformation_from_partition(n_geom)
+            n_geom_data = n_geom.data
+            if not skininst.data.has_vertex_weights:
+                NifLog.info("Skin data has no vertex weights, using the weights of the skin partition")
+
+            transforms, rotations = VertexGroup.get_bone_transforms(skininst)
+            vert_indices, bone_indices, weights = VertexGroup.get_skin_weights(skininst)
+            vertices = util_math.nif_vectors_to_array(n_geom_data.vertices, dtype=np.float64)
+            normals = None
+            if n_geom_data.has_normals:
+                normals = util_math.nif_vectors_to_array(n_geom_data.normals, dtype=np.float64)
+
+            vertices, normals, sum_weights = util_math.linear_blend_skin(vertices, transforms, vert_indices, bone_indices, weights,
+                                                                         normals, rotations)
+            num_bad_weights = np.count_nonzero(np.abs(sum_weights - 1.0) > 0.01)
+            if num_bad_weights:
+                NifLog.warn("{0} vertices of geometry {1} have weights not summing to one".format(num_bad_weights, n_geom.name))
 
             # finally we can actually set the data
-            for vold, vnew in zip(n_geom.data.vertices, vertices):
-                vold.x = vnew.x
-                vold.y = vnew.y
-                vold.z = vnew.z
+            util_math.array_to_nif_vectors(vertices, n_geom_data.vertices)
+            if normals is not None:
+                util_math.array_to_nif_vectors(normals, n_geom_data.normals)
 
     @staticmethod
     def import_skin(ni_block, b_obj):
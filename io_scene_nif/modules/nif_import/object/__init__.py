@@ -38,6 +38,7 @@
 # ***** END LICENSE BLOCK *****
 
 import bpy
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.modules.nif_import.geometry.mesh import Mesh
@@ -85,6 +86,22 @@ class Object:
         me.update()
         return Object.create_b_obj(None, me, name)
 
+    @staticmethod
+    def mesh_from_arrays(name, verts, triangles):
+        """Create a mesh object from an (n, 3) vertex array and an (m, 3) triangle array with foreach_set."""
+        triangles = np.asarray(triangles, dtype=np.int32).reshape(-1, 3)
+        num_triangles = len(triangles)
+        me = bpy.data.meshes.new(name)
+        me.vertices.add(len(verts))
+        me.vertices.foreach_set("co", np.asarray(verts, dtype=np.float32).ravel())
+        me.loops.add(num_triangles * 3)
+        me.loops.foreach_set("vertex_index", triangles.ravel())
+        me.polygons.add(num_triangles)
+        me.polygons.foreach_set("loop_start", np.arange(0, num_triangles * 3, 3, dtype=np.int32))
+        me.polygons.foreach_set("loop_total", np.full(num_triangles, 3, dtype=np.int32))
+        me.update(calc_edges=True)
+        return Object.create_b_obj(None, me, name)
+
     @staticmethod
     def box_from_extents(b_name, minx, maxx, miny, maxy, minz, maxz):
         verts = []
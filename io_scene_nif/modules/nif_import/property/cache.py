@@ -0,0 +1,152 @@
+"""This module keeps the images and materials of imports, for reuse by later imports in the same session."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import os
+
+import bpy
+from pyffi.formats.nif import NifFormat
+
+# attributes that do not change the material that is built from a property
+IGNORED_ATTRIBUTES = ('name', 'controller')
+
+
+def normalize_hash(value):
+    """Make the texture paths in a hash independent of case and separators."""
+    if isinstance(value, bytes):
+        return value.lower().replace(b'/', b'\\')
+    if isinstance(value, tuple):
+        return tuple(normalize_hash(item) for item in value)
+    return value
+
+
+def get_block_hash(n_block, data=None):
+    """Hash the contents of a property, and of the blocks it refers to such as texture sets, ignoring names and
+    controllers, so that properties which only differ in name build identical materials."""
+    block_hash = [type(n_block).__name__]
+    for attr in n_block._get_filtered_attribute_list(data):
+        if attr.name in IGNORED_ATTRIBUTES:
+            continue
+        value = getattr(n_block, attr.name)
+        if isinstance(value, NifFormat.NiObject):
+            block_hash.append(get_block_hash(value, data))
+        elif issubclass(attr.type_, NifFormat.Ref) and isinstance(value, list):
+            block_hash.append(tuple(get_block_hash(n_ref, data) if n_ref else None for n_ref in value))
+        elif issubclass(attr.type_, NifFormat.Ref):
+            block_hash.append(None)
+        else:
+            block_hash.append(getattr(n_block, "_{0}_value_".format(attr.name)).get_hash(data))
+    return normalize_hash(tuple(block_hash))
+
+
+def get_material_hash(props, data=None):
+    """Hash the contents of a list of properties, such as texturing, material, alpha and stencil properties,
+    shader flags and texture paths. Properties of different types may come in any order."""
+    return tuple(sorted((get_block_hash(prop, data) for prop in props), key=lambda block_hash: block_hash[0]))
+
+
+def get_image_key(path):
+    """Get the key of an image from its resolved path, so different spellings of one file share the image."""
+    return os.path.normcase(os.path.abspath(path))
+
+
+def is_valid(b_id, collection):
+    """Check that a data block still exists in a bpy.data collection, as the user may have removed it."""
+    try:
+        return collection.get(b_id.name) == b_id
+    except ReferenceError:
+        return False
+
+
+class ImportCache:
+    """Images and materials created by imports in this Blender session, reused instead of duplicating them.
+
+    Images are keyed by their resolved path, materials by a hash of the properties they were built from. Entries whose
+    data block was removed from bpy.data are evicted at the start of each import, as are the stub images of missing
+    textures, so those are searched for again."""
+
+    def __init__(self):
+        self.images = {}
+        self.materials = {}
+        # keys of the stub images of textures that were not found
+        self.missing = set()
+
+    def clear(self):
+        self.images = {}
+        self.materials = {}
+        self.missing = set()
+
+    def begin_import(self):
+        """Evict the entries that are no longer valid, and the stub images."""
+        for key in self.missing:
+            self.images.pop(key, None)
+        self.missing = set()
+        self.images = {key: b_image for key, b_image in self.images.items() if is_valid(b_image, bpy.data.images)}
+        self.materials = {key: b_mat for key, b_mat in self.materials.items() if is_valid(b_mat, bpy.data.materials)}
+
+    @staticmethod
+    def get_valid(entries, key, collection):
+        b_id = entries.get(key)
+        if b_id is None:
+            return None
+        if not is_valid(b_id, collection):
+            del entries[key]
+            return None
+        return b_id
+
+    def get_image(self, key):
+        """Get a cached image; None if there is none, or if it was removed."""
+        return self.get_valid(self.images, key, bpy.data.images)
+
+    def add_image(self, key, b_image, missing=False):
+        """Cache an image, a missing one is only kept for the current import."""
+        self.images[key] = b_image
+        if missing:
+            self.missing.add(key)
+        else:
+            self.missing.discard(key)
+
+    def get_material(self, key):
+        """Get a cached material; None if there is none, or if it was removed."""
+        return self.get_valid(self.materials, key, bpy.data.materials)
+
+    def add_material(self, key, b_mat):
+        self.materials[key] = b_mat
+
+
+import_cache = ImportCache()
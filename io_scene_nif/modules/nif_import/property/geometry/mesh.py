@@ -39,12 +39,18 @@
 
 from functools import singledispatch
 import itertools
+import os
 import bpy
+from pyffi.formats.nif import NifFormat
 
+from io_scene_nif.io.archive import archives
+from io_scene_nif.modules.nif_import.property.cache import get_material_hash, import_cache
 from io_scene_nif.modules.nif_import.property.texture.types.nitextureprop import NiTextureProp
 from io_scene_nif.modules.nif_import.property.geometry.niproperty import NiPropertyProcessor
 from io_scene_nif.modules.nif_import.property.shader.bsshaderlightingproperty import BSShaderLightingPropertyProcessor
 from io_scene_nif.modules.nif_import.property.shader.bsshaderproperty import BSShaderPropertyProcessor
+from io_scene_nif.utils import util_math
+from io_scene_nif.utils.util_global import NifData, NifOp
 from io_scene_nif.utils.util_logging import NifLog
 
 
@@ -63,27 +69,33 @@ class MeshPropertyProcessor:
         for processor in self.processors:
             processor.register(self.process_property)
 
+    @staticmethod
+    def get_material_key(n_block, props, b_mesh):
+        """Get a key that identifies the material built from a list of properties; None if it cannot be shared."""
+        # animated materials get their own actions
+        if NifOp.props.animation and (any(prop.controller for prop in props) or
+                                      util_math.find_controller(n_block, NifFormat.NiUVController)):
+            return None
+        # textures are searched for relative to the data folder, or else the folder of the nif
+        search_root = archives.get_data_dir(NifOp.props.filepath) or os.path.dirname(NifOp.props.filepath)
+        # the node tree depends on the vertex colors of the mesh
+        return (NifData.data.version, search_root, bool(b_mesh.vertex_colors), get_material_hash(props, NifData.data))
+
     def process_property_list(self, n_block, b_mesh):
         # get all valid properties that are attached to n_block
         props = list(prop for prop in itertools.chain(n_block.properties, n_block.bs_properties) if prop is not None)
-        # just to avoid duped materials, a first pass, make sure a named material is created
-        for prop in props:
-            if prop.name:
-                name = prop.name.decode()
-                if name and name in bpy.data.materials:
-                    b_mat = bpy.data.materials[name]
-                    # todo [material] fixme - we have to avoid multiple passes on the same material
-                    # it seems to mess with the singleton, or the bmat
-                    b_mesh.materials.append(b_mat)
-                    NifLog.debug(f"Retrieved already imported material {b_mat} from name {name}")
-                    return
-                else:
-                    b_mat = bpy.data.materials.new(name)
-                    NifLog.debug("Created placeholder material to store properties in {0}".format(b_mat))
-                break
-        else:
-            b_mat = bpy.data.materials.new("Noname")
-            NifLog.debug("Created placeholder material to store properties in {0}".format(b_mat))
+        # reuse the material of an earlier mesh with the same properties, from this import or an earlier one
+        material_key = self.get_material_key(n_block, props, b_mesh)
+        if material_key is not None:
+            b_mat = import_cache.get_material(material_key)
+            if b_mat:
+                b_mesh.materials.append(b_mat)
+                NifLog.debug("Reused material {0} with identical properties".format(b_mat.name))
+                return
+        # name the material after the first named property, names do not identify materials as nifs reuse them
+        name = next((prop.name.decode() for prop in props if prop.name), "") or "Noname"
+        b_mat = bpy.data.materials.new(name)
+        NifLog.debug("Created placeholder material to store properties in {0}".format(b_mat))
 
         # do initial settings for the material here
         b_mat.use_backface_culling = True
@@ -103,6 +115,8 @@ class MeshPropertyProcessor:
         if b_mesh.vertex_colors:
             NiTextureProp.get().connect_vertex_colors_to_pass()
         NiTextureProp.get().connect_to_output()
+        if material_key is not None:
+            import_cache.add_material(material_key, b_mat)
 
     def process_property(self, prop):
         """Base method to warn user that this property is not supported"""
@@ -127,13 +127,7 @@ class NiMaterial(Material):
 
     def import_material(self, n_block, b_mat, n_mat_prop):
         """Creates and returns a material."""
-        # First check if material has been created before.
-        # TODO [property][material] Decide whether or not to keep the material hash
-        # material_hash = self.get_material_hash(n_mat_prop, n_texture_prop, n_texture_effect, n_extra_data, n_alpha_prop)
-        # try:
-        #     return material.DICT_MATERIALS[material_hash]
-        # except KeyError:
-        #     pass
+        # materials are shared between meshes with identical properties, see MeshPropertyProcessor.get_material_key
 
         # update material material name
         name = block_store.import_name(n_mat_prop)
@@ -42,14 +42,10 @@ from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.modules.nif_import.geometry.vertex import Vertex
 from io_scene_nif.modules.nif_import.property.texture.loader import TextureLoader
+from io_scene_nif.modules.nif_import.property.texture.node_groups import get_pass_inputs, get_topology, node_group_library
+from io_scene_nif.utils.util_global import NifOp
 from io_scene_nif.utils.util_logging import NifLog
-from io_scene_nif.utils.util_nodes import nodes_iterate
-
-# dictionary of texture files, to reuse textures
-DICT_TEXTURES = {}
-
-# TODO [property][texture] Move IMPORT_EMBEDDED_TEXTURES as a import property
-IMPORT_EMBEDDED_TEXTURES = False
+from io_scene_nif.utils.util_nodes import arrange_nodes
 
 """Names (ordered by default index) of shader texture slots for Sid Meier's Railroads and similar games."""
 EXTRA_SHADER_TEXTURES = [
@@ -68,10 +64,13 @@ class TextureSlotManager:
         self.tree = None
         self.b_mat = None
         self.output = None
-        self.diffuse_pass = None
-        self.diffuse_shader = None
+        # (texture type, texture node) of the textures blended into the diffuse color
+        self.passes = []
+        self.use_vertex_colors = False
         # raw texture nodes
         self.diffuse_texture = None
+        self.normal_texture = None
+        self.glow_texture = None
 
     def set_uv_map(self, b_texture_node, uv_index=0, reflective=False):
         """Attaches a vector node describing the desired coordinate transforms to the texture node's UV input."""
@@ -79,7 +78,8 @@ class TextureSlotManager:
             uv = self.tree.nodes.new('ShaderNodeTexCoord')
             self.tree.links.new(uv.outputs[6], b_texture_node.inputs[0])
         # use supplied UV maps for everything else, if present
-        else:
+        # an unlinked vector input already uses the first UV map
+        elif uv_index:
             uv = self.tree.nodes.new('ShaderNodeUVMap')
             uv.name = "TexCoordIndex" + str(uv_index)
             uv.uv_map = f"UV{uv_index}"
@@ -113,77 +113,51 @@ class TextureSlotManager:
 
         self.output = self.tree.nodes.new('ShaderNodeOutputMaterial')
 
-        # shaders
-        self.diffuse_shader = self.tree.nodes.new('ShaderNodeBsdfDiffuse')
-
         # image passes
-        self.diffuse_pass = None
+        self.passes = []
+        self.use_vertex_colors = False
 
         # raw texture nodes
         self.diffuse_texture = None
+        self.normal_texture = None
+        self.glow_texture = None
 
-    def connect_to_pass(self, b_node_pass, b_texture_node, texture_type="Detail"):
-        """Connect to an image premixing pass"""
-        # connect if the pass has been established, ie. the base texture already exists
-        if b_node_pass:
-            rgb_mixer = self.tree.nodes.new('ShaderNodeMixRGB')
-            # these textures are overlaid onto the base
-            if texture_type in ("Detail", "Reflect"):
-                rgb_mixer.inputs[0].default_value = 1
-                rgb_mixer.blend_type = "OVERLAY"
-            # these textures use their alpha channel as a mask over the input pass
-            elif texture_type == "Decal":
-                self.tree.links.new(b_texture_node.outputs[1], rgb_mixer.inputs[0])
-            self.tree.links.new(b_node_pass.outputs[0], rgb_mixer.inputs[1])
-            self.tree.links.new(b_texture_node.outputs[0], rgb_mixer.inputs[2])
-            return rgb_mixer
-        return b_texture_node
+    def add_pass(self, b_texture_node, texture_type="Detail"):
+        """Add a texture to the image premixing passes, which are blended inside the material's node group"""
+        self.passes.append((texture_type, b_texture_node))
 
     def connect_vertex_colors_to_pass(self, ):
-        # if ob.data.vertex_colors:
-        vcol = self.tree.nodes.new('ShaderNodeAttribute')
-        vcol.attribute_name = "RGBA"
-        self.diffuse_pass = self.connect_to_pass(self.diffuse_pass, vcol, texture_type="Detail")
+        # the vertex colors are read inside the node group
+        self.use_vertex_colors = True
 
     def connect_to_output(self):
-
-        if self.diffuse_pass:
-            try:
-                self.tree.links.new(self.diffuse_pass.outputs[0], self.diffuse_shader.inputs[0])
-            except:
-                print("bug, happens in successive runs over same b_mat")
+        """Instantiate the shared node group for this material's topology and connect the texture nodes to it."""
+        use_alpha = self.b_mat.blend_method != "OPAQUE"
+        topology = get_topology([texture_type for texture_type, b_texture_node in self.passes], self.use_vertex_colors,
+                                use_alpha, self.normal_texture is not None, self.glow_texture is not None)
+        b_group_node = self.tree.nodes.new('ShaderNodeGroup')
+        b_group_node.node_tree = node_group_library.get(topology)
+        b_group_node.label = "Shader"
+
+        for index, (texture_type, b_texture_node) in enumerate(self.passes):
+            color_name, alpha_name = get_pass_inputs(index, texture_type)
+            self.tree.links.new(b_texture_node.outputs[0], b_group_node.inputs[color_name])
+            # these textures use their alpha channel as a mask over the input pass
+            if alpha_name:
+                self.tree.links.new(b_texture_node.outputs[1], b_group_node.inputs[alpha_name])
+        if self.normal_texture:
+            self.tree.links.new(self.normal_texture.outputs[0], b_group_node.inputs["Normal"])
+        if self.glow_texture:
+            self.tree.links.new(self.glow_texture.outputs[0], b_group_node.inputs["Glow"])
         # transparency
-        if self.b_mat.blend_method == "OPAQUE":
-            self.tree.links.new(self.diffuse_shader.outputs[0], self.output.inputs[0])
-        else:
-            transp = self.tree.nodes.new('ShaderNodeBsdfTransparent')
-            alpha_mixer = self.tree.nodes.new('ShaderNodeMixShader')
-            #
-            # if textures and ob.data.vertex_colors:
-            #     vcol = tree.nodes.new('ShaderNodeAttribute')
-            #     vcol.attribute_name = "AAA"
-            #     mixAAA = tree.nodes.new('ShaderNodeMixRGB')
-            #     mixAAA.inputs[0].default_value = 1
-            #     mixAAA.blend_type = "MULTIPLY"
-            #     tree.links.new(textures[0].outputs[1], mixAAA.inputs[1])
-            #     tree.links.new(vcol.outputs[0], mixAAA.inputs[2])
-            #     tree.links.new(mixAAA.outputs[0], alpha_mixer.inputs[0])
-            if self.diffuse_texture:
-                # print("self.diffuse_texture", self.diffuse_texture)
-                try:
-                    self.tree.links.new(self.diffuse_texture.outputs[1], alpha_mixer.inputs[0])
-                except:
-                    print("Bug in tex sys setting alpha channel, happens in successive runs?")
-            # elif ob.data.vertex_colors:
-            #     vcol = tree.nodes.new('ShaderNodeAttribute')
-            #     vcol.attribute_name = "AAA"
-            #     tree.links.new(vcol.outputs[0], alpha_mixer.inputs[0])
-
-            self.tree.links.new(transp.outputs[0], alpha_mixer.inputs[1])
-            self.tree.links.new(self.diffuse_shader.outputs[0], alpha_mixer.inputs[2])
-            self.tree.links.new(alpha_mixer.outputs[0], self.output.inputs[0])
-
-        nodes_iterate(self.tree, self.output)
+        if use_alpha and self.diffuse_texture:
+            self.tree.links.new(self.diffuse_texture.outputs[1], b_group_node.inputs["Alpha"])
+
+        self.tree.links.new(b_group_node.outputs[0], self.output.inputs[0])
+
+        # nobody looks at the node editor in batch imports
+        if NifOp.props.arrange_nodes:
+            arrange_nodes(self.output)
 
     def create_texture_slot(self, b_mat, n_tex_desc):
         # todo [texture] refactor this to separate code paths?
@@ -205,7 +179,7 @@ class TextureSlotManager:
     def link_diffuse_node(self, b_texture_node):
         self.diffuse_texture = b_texture_node
         b_texture_node.label = "Diffuse"
-        self.diffuse_pass = self.connect_to_pass(self.diffuse_pass, b_texture_node)
+        self.add_pass(b_texture_node)
 
     def update_bump_slot(self, b_texture_node):
         b_texture_node.label = "Bump"
@@ -222,7 +196,10 @@ class TextureSlotManager:
         # b_texture_node.use_map_alpha = False
 
     def update_normal_slot(self, b_texture_node):
+        self.normal_texture = b_texture_node
         b_texture_node.label = "Normal"
+        if b_texture_node.image:
+            b_texture_node.image.colorspace_settings.name = 'Non-Color'
         # # Influence mapping
         # b_texture_node.texture.use_normal_map = True  # causes artifacts otherwise.
         #
@@ -236,6 +213,7 @@ class TextureSlotManager:
         # b_texture_node.use_map_alpha = False
 
     def update_glow_slot(self, b_texture_node):
+        self.glow_texture = b_texture_node
         b_texture_node.label = "Glow"
         # # Influence mapping
         # b_texture_node.texture.use_alpha = False
@@ -264,19 +242,19 @@ class TextureSlotManager:
 
     def update_decal_slot_0(self, b_texture_node):
         b_texture_node.label = "Decal0"
-        self.diffuse_pass = self.connect_to_pass(self.diffuse_pass, b_texture_node, texture_type="Decal")
+        self.add_pass(b_texture_node, texture_type="Decal")
 
     def update_decal_slot_1(self, b_texture_node):
         b_texture_node.label = "Decal1"
-        self.diffuse_pass = self.connect_to_pass(self.diffuse_pass, b_texture_node, texture_type="Decal")
+        self.add_pass(b_texture_node, texture_type="Decal")
 
     def update_decal_slot_2(self, b_texture_node):
         b_texture_node.label = "Decal2"
-        self.diffuse_pass = self.connect_to_pass(self.diffuse_pass, b_texture_node, texture_type="Decal")
+        self.add_pass(b_texture_node, texture_type="Decal")
 
     def update_detail_slot(self, b_texture_node):
         b_texture_node.label = "Detail"
-        self.diffuse_pass = self.connect_to_pass(self.diffuse_pass, b_texture_node, texture_type="Detail")
+        self.add_pass(b_texture_node, texture_type="Detail")
 
     def update_dark_slot(self, b_texture_node):
         # todo [texture] implement
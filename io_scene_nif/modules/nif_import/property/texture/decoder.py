@@ -0,0 +1,197 @@
+"""This script decodes the pixel data of embedded textures to RGBA arrays, without going through files on disk."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import hashlib
+
+import numpy as np
+from pyffi.formats.nif import NifFormat
+
+# masks of the uncompressed formats, for pixel data that does not specify them
+DEFAULT_MASKS = {
+    NifFormat.PixelFormat.PX_FMT_RGB8: (0x0000ff, 0x00ff00, 0xff0000, 0),
+    NifFormat.PixelFormat.PX_FMT_RGBA8: (0x000000ff, 0x0000ff00, 0x00ff0000, 0xff000000),
+}
+
+DXT_FORMATS = (NifFormat.PixelFormat.PX_FMT_DXT1, NifFormat.PixelFormat.PX_FMT_DXT5, NifFormat.PixelFormat.PX_FMT_DXT5_ALT)
+
+
+def get_pixel_bytes(n_pixel_data):
+    """Get the pixel data of the first face (all mipmaps) as bytes."""
+    return bytes(bytearray(n_pixel_data.pixel_data[0]))
+
+
+def get_masks(n_pixel_data):
+    """Get the red, green, blue and alpha bit masks of uncompressed pixel data."""
+    # older versions store the masks, newer versions describe the channels in the order of their bits
+    masks = [n_pixel_data.red_mask, n_pixel_data.green_mask, n_pixel_data.blue_mask, n_pixel_data.alpha_mask]
+    if not any(masks):
+        bit_pos = 0
+        for channel in n_pixel_data.channels:
+            if channel.type in (NifFormat.ChannelType.CHNL_RED, NifFormat.ChannelType.CHNL_GREEN,
+                                NifFormat.ChannelType.CHNL_BLUE, NifFormat.ChannelType.CHNL_ALPHA):
+                masks[channel.type] = (2 ** channel.bits_per_channel - 1) << bit_pos
+            bit_pos += channel.bits_per_channel
+    if not any(masks[:3]):
+        return DEFAULT_MASKS[n_pixel_data.pixel_format]
+    return tuple(masks)
+
+
+def get_texture_hash(n_pixel_data):
+    """Get a digest of the pixel data, which is the same for duplicate embedded textures."""
+    n_mipmap = n_pixel_data.mipmaps[0]
+    digest = hashlib.sha1()
+    digest.update("{0} {1} {2}".format(n_pixel_data.pixel_format, n_mipmap.width, n_mipmap.height).encode())
+    digest.update(get_pixel_bytes(n_pixel_data))
+    n_palette = n_pixel_data.palette
+    if n_palette:
+        digest.update(bytes(bytearray(value for color in n_palette.palette for value in (color.r, color.g, color.b, color.a))))
+    return digest.hexdigest()
+
+
+def decode_raw(data, width, height, bytes_per_pixel, masks):
+    """Decode uncompressed pixels, each a little endian integer holding the channels selected by the masks."""
+    pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * bytes_per_pixel).reshape(-1, bytes_per_pixel)
+    values = np.zeros(len(pixels), dtype=np.uint64)
+    for i in range(bytes_per_pixel):
+        values |= pixels[:, i].astype(np.uint64) << np.uint64(8 * i)
+    rgba = np.full((len(pixels), 4), 255, dtype=np.uint8)
+    for i, mask in enumerate(masks):
+        if not mask:
+            continue
+        shift = (mask & -mask).bit_length() - 1
+        max_value = mask >> shift
+        channel = (values & np.uint64(mask)) >> np.uint64(shift)
+        rgba[:, i] = (channel * np.uint64(255) // np.uint64(max_value)).astype(np.uint8)
+    return rgba.reshape(height, width, 4)
+
+
+def decode_palette(data, width, height, palette, use_alpha):
+    """Decode 8 bit indices into a palette of 256 RGBA colors."""
+    indices = np.frombuffer(data, dtype=np.uint8, count=width * height)
+    colors = np.array(palette, dtype=np.uint8).reshape(-1, 4)
+    if not use_alpha:
+        colors[:, 3] = 255
+    return colors[indices].reshape(height, width, 4)
+
+
+def decode_colors(blocks, use_alpha):
+    """Decode the (n, 8) color part of DXT blocks to (n, 16, 4) RGBA pixels."""
+    color_values = blocks[:, :4].copy().view('<u2').astype(np.int32)
+    colors = np.empty((len(blocks), 4, 4), dtype=np.int32)
+    for i in range(2):
+        value = color_values[:, i]
+        colors[:, i, 0] = ((value >> 11) & 31) * 255 // 31
+        colors[:, i, 1] = ((value >> 5) & 63) * 255 // 63
+        colors[:, i, 2] = (value & 31) * 255 // 31
+    colors[:, :, 3] = 255
+    # four color mode, or three colors and transparent black for DXT1 blocks with color 0 <= color 1
+    four_colors = (color_values[:, 0] > color_values[:, 1]) | (not use_alpha)
+    colors[:, 2, :3] = np.where(four_colors[:, np.newaxis],
+                                (2 * colors[:, 0, :3] + colors[:, 1, :3]) // 3,
+                                (colors[:, 0, :3] + colors[:, 1, :3]) // 2)
+    colors[:, 3, :3] = np.where(four_colors[:, np.newaxis], (colors[:, 0, :3] + 2 * colors[:, 1, :3]) // 3, 0)
+    colors[:, 3, 3] = np.where(four_colors, 255, 0)
+
+    indices = blocks[:, 4:8].copy().view('<u4').astype(np.int64)
+    indices = (indices >> np.arange(0, 32, 2)) & 3
+    return colors[np.arange(len(blocks))[:, np.newaxis], indices].astype(np.uint8)
+
+
+def decode_alphas(blocks):
+    """Decode the (n, 8) interpolated alpha part of DXT5 blocks to (n, 16) alpha values."""
+    alpha_0 = blocks[:, 0].astype(np.int32)
+    alpha_1 = blocks[:, 1].astype(np.int32)
+    alphas = np.empty((len(blocks), 8), dtype=np.int32)
+    alphas[:, 0] = alpha_0
+    alphas[:, 1] = alpha_1
+    eight_alphas = alpha_0 > alpha_1
+    for k in range(2, 8):
+        eight = ((8 - k) * alpha_0 + (k - 1) * alpha_1) // 7
+        if k < 6:
+            six = ((6 - k) * alpha_0 + (k - 1) * alpha_1) // 5
+        else:
+            six = np.full(len(blocks), 0 if k == 6 else 255)
+        alphas[:, k] = np.where(eight_alphas, eight, six)
+
+    # 16 indices of 3 bits, in a 48 bit little endian integer
+    bits = np.zeros(len(blocks), dtype=np.int64)
+    for i in range(6):
+        bits |= blocks[:, 2 + i].astype(np.int64) << (8 * i)
+    indices = (bits[:, np.newaxis] >> np.arange(0, 48, 3)) & 7
+    return alphas[np.arange(len(blocks))[:, np.newaxis], indices].astype(np.uint8)
+
+
+def decode_dxt(data, width, height, pixel_format):
+    """Decode DXT1 or DXT5 compressed pixels."""
+    blocks_x = max(1, (width + 3) // 4)
+    blocks_y = max(1, (height + 3) // 4)
+    block_size = 8 if pixel_format == NifFormat.PixelFormat.PX_FMT_DXT1 else 16
+    blocks = np.frombuffer(data, dtype=np.uint8, count=blocks_x * blocks_y * block_size).reshape(-1, block_size)
+    if block_size == 8:
+        pixels = decode_colors(blocks, use_alpha=True)
+    else:
+        pixels = decode_colors(blocks[:, 8:], use_alpha=False)
+        pixels[:, :, 3] = decode_alphas(blocks[:, :8])
+    # from blocks of 4 x 4 pixels to rows
+    pixels = pixels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4).reshape(blocks_y * 4, blocks_x * 4, 4)
+    return pixels[:height, :width]
+
+
+def decode(n_pixel_data):
+    """Decode the first mipmap of a NiPixelData or NiPersistentSrcTextureRendererData block.
+
+    :return: The (height, width, 4) uint8 RGBA pixels, first row on top.
+    :raises ValueError: If the pixel format is not supported, or the data is truncated.
+    """
+    n_mipmap = n_pixel_data.mipmaps[0]
+    width, height = n_mipmap.width, n_mipmap.height
+    data = get_pixel_bytes(n_pixel_data)[n_mipmap.offset:]
+    pixel_format = n_pixel_data.pixel_format
+    if pixel_format in DXT_FORMATS:
+        return decode_dxt(data, width, height, pixel_format)
+    if pixel_format == NifFormat.PixelFormat.PX_FMT_PAL8:
+        n_palette = n_pixel_data.palette
+        if not n_palette:
+            raise ValueError("Palettized pixel data without palette")
+        palette = [(color.r, color.g, color.b, color.a) for color in n_palette.palette]
+        return decode_palette(data, width, height, palette, bool(n_palette.unknown_byte))
+    if pixel_format in DEFAULT_MASKS:
+        bytes_per_pixel = n_pixel_data.bytes_per_pixel or n_pixel_data.bits_per_pixel // 8
+        return decode_raw(data, width, height, bytes_per_pixel, get_masks(n_pixel_data))
+    raise ValueError("Pixel format {0} is not supported".format(pixel_format))
@@ -37,14 +37,17 @@
 #
 # ***** END LICENSE BLOCK *****
 
-from functools import reduce
-import operator
 import os.path
 
 import bpy
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
-from io_scene_nif.modules.nif_import.property import texture
+from io_scene_nif.io.archive import archives
+from io_scene_nif.modules.nif_import.property.cache import get_image_key, import_cache
+from io_scene_nif.modules.nif_import.property.texture import decoder
+from io_scene_nif.modules.nif_import.property.texture.path_index import get_key, get_preferred_names, path_indices
+from io_scene_nif.modules.nif_import.property.texture.prefetch import get_texture_paths, texture_prefetch
 from io_scene_nif.utils.util_global import NifOp
 from io_scene_nif.utils.util_logging import NifLog
 
@@ -85,157 +88,231 @@ class TextureLoader:
             raise TypeError("source must be NiSourceTexture block or string")
 
     def import_texture_source(self, source, tree):
-        """Convert a NiSourceTexture block, or simply a path string, to a Blender Texture object.
-        Stores it in the texture.DICT_TEXTURES dictionary to avoid future duplicate imports.
-        :return Texture object
+        """Convert a NiSourceTexture block, or simply a path string, to a Blender texture node in the given node tree.
+        Images are reused through the import cache, to avoid duplicate imports.
+        :return Texture node
         """
 
         # if the source block is not linked then return None
         if not source:
             return None
 
-        # calculate the texture hash key
-        texture_hash = self.get_texture_hash(source)
-
-        try:
-            # look up the texture in the dictionary of imported textures and return it if found
-            return texture.DICT_TEXTURES[texture_hash]
-        except KeyError:
-            NifLog.debug("Storing {0} texture in map".format(str(source)))
-            pass
-
-        if isinstance(source, NifFormat.NiSourceTexture) and not source.use_external and texture.IMPORT_EMBEDDED_TEXTURES:
-            fn, b_image = self.import_embedded_texture_source(source)
+        if isinstance(source, NifFormat.NiSourceTexture) and not source.use_external:
+            # embedded textures are identified by their contents, so duplicates are decoded only once
+            fn = self.get_embedded_image_name(source)
+            image_key = fn
+            b_image = import_cache.get_image(image_key)
+            if not b_image and NifOp.props.use_embedded_textures:
+                b_image = self.import_embedded_texture_source(source, fn)
+                if b_image:
+                    import_cache.add_image(image_key, b_image)
         else:
             fn, b_image = self.import_external_source(source)
+            image_key = get_image_key(fn)
 
-        b_text_name = os.path.basename(fn)
-        # create a stub image if the image could not be loaded
+        # create a stub image if the image could not be loaded, once per import
+        if not b_image:
+            b_image = import_cache.get_image(image_key)
         if not b_image:
             NifLog.warn("Texture '{0}' not found or not supported and no alternate available".format(fn))
-            b_image = bpy.data.images.new(name=b_text_name, width=1, height=1, alpha=False)
+            b_image = bpy.data.images.new(name=os.path.basename(fn), width=1, height=1, alpha=False)
             b_image.filepath = fn
+            import_cache.add_image(image_key, b_image, missing=True)
 
         # create a texture node
         b_texture = tree.nodes.new('ShaderNodeTexImage')
         b_texture.image = b_image
         b_texture.interpolation = "Smart"
-
-        # save texture to avoid duplicate imports, and return it
-        texture.DICT_TEXTURES[texture_hash] = b_texture
         return b_texture
 
-    def import_embedded_texture_source(self, source):
+    @staticmethod
+    def get_embedded_image_name(source):
+        """Get the name of the image of an embedded texture, from a hash of its pixel data."""
+        if not source.pixel_data:
+            return "embedded"
+        return "embedded_{0}".format(decoder.get_texture_hash(source.pixel_data)[:16])
 
-        fn, tex = self.generate_image_name()
+    @staticmethod
+    def import_embedded_texture_source(source, name):
+        """Decode the pixel data of an embedded texture into an image, packed into the blend file.
+        :return The image, or None if the pixel format is not supported.
+        """
+        if not source.pixel_data:
+            return None
+        # the image may be in the blend file already, from an earlier session
+        b_image = bpy.data.images.get(name)
+        if b_image:
+            return b_image
+        try:
+            pixels = decoder.decode(source.pixel_data)
+        except ValueError as e:
+            NifLog.warn("Could not decode embedded texture: {0}".format(e))
+            return None
 
-        # save embedded texture as dds file
-        stream = open(tex, "wb")
+        NifLog.info("Decoding embedded texture as {0}".format(name))
+        height, width = pixels.shape[:2]
+        b_image = bpy.data.images.new(name=name, width=width, height=height, alpha=True)
+        # Blender stores the bottom row first, as floats
+        b_image.pixels.foreach_set((pixels[::-1].astype(np.float32) / 255).ravel())
         try:
-            NifLog.info("Saving embedded texture as {0}".format(tex))
-            source.pixel_data.save_as_dds(stream)
-        except ValueError:
-            # value error means that the pixel format is not supported
-            b_image = None
-        else:
-            # saving dds succeeded so load the file
-            b_image = bpy.ops.image.open(tex)
-            # Blender will return an image object even if the file format is not supported,
-            # so to check if the image is actually loaded an error is forced via "b_image.size"
-            try:
-                b_image.size
-            except:  # RuntimeError: couldn't load image data in Blender
-                b_image = None  # not supported, delete image object
-        finally:
-            stream.close()
-
-        return [fn, b_image]
+            b_image.pack(as_png=True)
+        except TypeError:
+            # newer versions of Blender pack generated images without the argument
+            b_image.pack()
+        return b_image
 
     @staticmethod
-    def generate_image_name():
-        """Find a file name (but avoid overwriting)"""
-        n = 0
-        while n < 1000:
-            fn = "image{:0>3d}.dds".format(n)
-            tex = os.path.join(os.path.dirname(NifOp.props.filepath), fn)
-            if not os.path.exists(tex):
-                break
-            n += 1
-        return fn, tex
-
-    def import_external_source(self, source):
-        b_image = None
-        fn = None
-
-        # the texture uses an external image file
+    def get_file_name(source):
+        """Get the file name of an external texture, with the separators of the operating system."""
         if isinstance(source, NifFormat.NiSourceTexture):
             fn = source.file_name.decode()
         elif isinstance(source, str):
             fn = source
         else:
             raise TypeError("source must be NiSourceTexture or str")
-
         fn = fn.replace('\\', os.sep)
-        fn = fn.replace('/', os.sep)
-        # go searching for it
+        return fn.replace('/', os.sep)
+
+    @staticmethod
+    def get_search_path_list():
+        """Get the folders to search for textures on disk, in order of preference, as (folder, is texture root) tuples.
+        Only texture roots are indexed with all their subfolders, the other folders could be anywhere."""
         import_path = os.path.dirname(NifOp.props.filepath)
-        search_path_list = [import_path]
+        search_path_list = [(import_path, False)]
         if bpy.context.preferences.filepaths.texture_directory:
-            search_path_list.append(bpy.context.preferences.filepaths.texture_directory)
+            search_path_list.append((bpy.context.preferences.filepaths.texture_directory, True))
 
         # TODO [general][path] Implement full texture path finding.
         nif_dir = os.path.join(os.getcwd(), 'nif')
-        search_path_list.append(nif_dir)
+        search_path_list.append((nif_dir, False))
 
         # if it looks like a Morrowind style path, use common sense to guess texture path
         meshes_index = import_path.lower().find("meshes")
         if meshes_index != -1:
-            search_path_list.append(import_path[:meshes_index] + 'textures')
+            search_path_list.append((import_path[:meshes_index] + 'textures', True))
 
         # if it looks like a Civilization IV style path, use common sense to guess texture path
         art_index = import_path.lower().find("art")
         if art_index != -1:
-            search_path_list.append(import_path[:art_index] + 'shared')
+            search_path_list.append((import_path[:art_index] + 'shared', False))
+
+        return [(texdir.replace('\\', os.sep).replace('/', os.sep), is_root) for texdir, is_root in search_path_list]
+
+    @staticmethod
+    def get_data_dirs():
+        """Get the data folders whose archives are searched for textures that are not on disk."""
+        if not NifOp.props.use_archives:
+            return []
+        data_dirs = [archives.get_data_dir(NifOp.props.filepath)]
+        texture_directory = bpy.context.preferences.filepaths.texture_directory
+        if texture_directory:
+            # the texture directory is either in a data folder, or a data folder itself
+            # data folders are guessed from the path of a file, so pass one in the texture directory
+            data_dirs.append(archives.get_data_dir(os.path.join(texture_directory, "x")) or texture_directory)
+        return [data_dir for data_dir in data_dirs if data_dir]
 
+    @staticmethod
+    def get_archive_paths(fn):
+        """Get the paths that a texture may have in an archive, trying alternate image extensions too."""
+        key, ext = get_key(fn)
+        # archives hold the textures folder itself
+        if not key.startswith('textures/'):
+            key = 'textures/' + key
+        return get_preferred_names(key, ext)
+
+    @staticmethod
+    def find_external_source(fn, search_path_list, data_dirs):
+        """Generate the locations that may hold a texture, in order of preference, as (file path, archive,
+        path in archive) tuples, where the archive is None for files on disk. Does not touch bpy."""
         # go through all texture search paths
-        for texdir in search_path_list:
-            texdir = texdir.replace('\\', os.sep)
-            texdir = texdir.replace('/', os.sep)
-            # go through all possible file names, try alternate extensions too; for linux, also try lower case versions of filenames
-            texfns = reduce(operator.add,
-                            [[fn[:-4] + ext, fn[:-4].lower() + ext]
-                             for ext in ('.DDS', '.dds', '.PNG', '.png',
-                                         '.TGA', '.tga', '.BMP', '.bmp',
-                                         '.JPG', '.jpg')])
-
-            texfns = [fn, fn.lower()] + list(set(texfns))
-            for texfn in texfns:
-                # now a little trick, to satisfy many Morrowind mods
-                if texfn[:9].lower() == 'textures' + os.sep and texdir[-9:].lower() == os.sep + 'textures':
-                    # strip one of the two 'textures' from the path
-                    tex = os.path.join(texdir[:-9], texfn)
-                else:
-                    tex = os.path.join(texdir, texfn)
-
-                # "ignore case" on linuxW
-                tex = bpy.path.resolve_ncase(tex)
-                NifLog.debug("Searching {0}".format(tex))
-                if os.path.exists(tex):
-                    # tries to load the file
-                    b_image = bpy.data.images.load(tex)
-                    # Blender will return an image object even if the file format is not supported,
-                    # so to check if the image is actually loaded an error is forced via "b_image.size"
-                    try:
-                        b_image.size
-                    except:  # RuntimeError: couldn't load image data in Blender
-                        b_image = None  # not supported, delete image object
-                    else:
-                        # file format is supported
-                        NifLog.debug("Found '{0}' at {1}".format(fn, tex))
-                        break
+        for texdir, is_root in search_path_list:
+            # look up the file name in the search path, ignoring case and trying alternate extensions too
+            texfns = path_indices.find(texdir, fn, recursive=is_root)
+            # now a little trick, to satisfy many Morrowind mods
+            if fn[:9].lower() == 'textures' + os.sep and texdir[-9:].lower() == os.sep + 'textures':
+                # strip one of the two 'textures' from the path
+                texfns += path_indices.find(texdir, fn[9:], recursive=is_root)
+            for tex in texfns:
+                yield tex, None, None
+
+        # not found on disk, so look in the archives of the data folders
+        for data_dir in data_dirs:
+            for archive, path in archives.find(data_dir, TextureLoader.get_archive_paths(fn)):
+                yield os.path.join(archive.filepath, path.replace('/', os.sep)), archive, path
+
+    @staticmethod
+    def prefetch_textures(n_data):
+        """Resolve and validate all external textures of a nif in parallel, so their images are created without waiting on
+        the disk later on."""
+        texture_prefetch.clear()
+        file_names = [TextureLoader.get_file_name(path) for path in get_texture_paths(n_data)]
+        if not file_names:
+            return
+        search_path_list = TextureLoader.get_search_path_list()
+        data_dirs = TextureLoader.get_data_dirs()
+        # build the indices of the search paths and read the archive directories here, so workers only look them up
+        for texdir, is_root in search_path_list:
+            if is_root:
+                path_indices.get(texdir)
+        for data_dir in data_dirs:
+            archives.get_archives(data_dir)
+        num_found = texture_prefetch.prefetch(file_names, lambda fn: TextureLoader.find_external_source(fn, search_path_list, data_dirs))
+        NifLog.info("Prefetched {0} of {1} textures".format(num_found, len(file_names)))
+
+    def import_external_source(self, source):
+        # the texture uses an external image file
+        fn = self.get_file_name(source)
+        search_path_list = self.get_search_path_list()
+
+        # use the location that was found when prefetching, or else go searching for it
+        locations = texture_prefetch.get(fn)
+        if locations is None:
+            locations = self.find_external_source(fn, search_path_list, self.get_data_dirs())
+        for tex, archive, path in locations:
+            NifLog.debug("Searching {0}".format(tex))
+            # reuse the image of an earlier import
+            b_image = import_cache.get_image(get_image_key(tex))
             if b_image:
                 return [tex, b_image]
-        else:
-            tex = os.path.join(search_path_list[0], fn)
+            if archive:
+                b_image = self.load_image_from_memory(os.path.basename(path), archives.read(archive, path), tex)
+            else:
+                b_image = self.load_image(tex)
+            if b_image:
+                # file format is supported
+                NifLog.debug("Found '{0}' at {1}".format(fn, tex))
+                import_cache.add_image(get_image_key(tex), b_image)
+                return [tex, b_image]
+
+        tex = os.path.join(search_path_list[0][0], fn)
+        return [tex, None]
+
+    @staticmethod
+    def load_image(tex):
+        """Load an image file from disk.
+        :return The image, or None if Blender cannot decode it.
+        """
+        # tries to load the file
+        b_image = bpy.data.images.load(tex)
+        # Blender will return an image object even if the file format is not supported,
+        # so to check if the image is actually loaded an error is forced via "b_image.size"
+        try:
+            b_image.size
+        except:  # RuntimeError: couldn't load image data in Blender
+            return None  # not supported, delete image object
+        return b_image
 
-        return [tex, b_image]
+    @staticmethod
+    def load_image_from_memory(name, data, filepath):
+        """Create an image from the contents of an image file, packed into the blend file.
+        :return The image, or None if Blender cannot decode it.
+        """
+        b_image = bpy.data.images.new(name=name, width=1, height=1)
+        b_image.pack(data=data, data_len=len(data))
+        b_image.source = 'FILE'
+        b_image.filepath_raw = filepath
+        # the packed data is only decoded on access, a failure leaves the image without size
+        if not b_image.size[0]:
+            bpy.data.images.remove(b_image)
+            return None
+        return b_image
@@ -0,0 +1,172 @@
+"""This module builds the shader node groups that imported materials instantiate, once per session."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import bpy
+
+from io_scene_nif.modules.nif_import.property.cache import is_valid
+from io_scene_nif.utils.util_nodes import arrange_nodes
+
+GROUP_PREFIX = "NifTools"
+
+
+def get_pass_inputs(index, pass_type):
+    """Get the names of the group inputs for the color, and for the alpha mask if any, of a texture pass."""
+    if not index:
+        return "Base Color", None
+    if pass_type == "Decal":
+        return "{0} {1} Color".format(pass_type, index), "{0} {1} Alpha".format(pass_type, index)
+    return "{0} {1} Color".format(pass_type, index), None
+
+
+def get_topology(pass_types, use_vertex_colors, use_alpha, use_normal, use_glow):
+    """Get the topology of a material, which identifies the node group it instantiates.
+
+    :param pass_types: The types of the textures that are blended into the diffuse color, in order. The first one
+        is the base texture, whatever its type.
+    """
+    pass_types = ("Base",) + tuple(pass_types[1:]) if pass_types else ()
+    return pass_types, bool(use_vertex_colors), bool(use_alpha), bool(use_normal), bool(use_glow)
+
+
+class NodeGroupLibrary:
+    """Shader node groups for the few topologies that nif materials reduce to, each built once and shared by all
+    materials, which then only need a group node and their image nodes."""
+
+    def __init__(self):
+        # topology -> node group
+        self.groups = {}
+
+    @staticmethod
+    def get_name(topology):
+        pass_types, use_vertex_colors, use_alpha, use_normal, use_glow = topology
+        flags = (("VCol", use_vertex_colors), ("Alpha", use_alpha), ("Normal", use_normal), ("Glow", use_glow))
+        parts = list(pass_types) + [name for name, used in flags if used]
+        return "{0} {1}".format(GROUP_PREFIX, "+".join(parts) or "Plain")
+
+    def get(self, topology):
+        """Get the node group of a topology, from an earlier material or the blend file, or else build it."""
+        b_group = self.groups.get(topology)
+        if b_group is None or not is_valid(b_group, bpy.data.node_groups):
+            name = self.get_name(topology)
+            b_group = bpy.data.node_groups.get(name)
+            if b_group is None:
+                b_group = self.build(name, topology)
+            self.groups[topology] = b_group
+        return b_group
+
+    @staticmethod
+    def mix(b_group, b_color, b_socket, pass_type, b_alpha=None):
+        """Blend a color over the color so far, or start with it."""
+        if not b_color:
+            return b_socket
+        rgb_mixer = b_group.nodes.new('ShaderNodeMixRGB')
+        # decals use their alpha channel as a mask over the color so far
+        if pass_type == "Decal" and b_alpha:
+            b_group.links.new(b_alpha, rgb_mixer.inputs[0])
+        # other textures are overlaid onto it
+        else:
+            rgb_mixer.inputs[0].default_value = 1
+            rgb_mixer.blend_type = "OVERLAY"
+        b_group.links.new(b_color, rgb_mixer.inputs[1])
+        b_group.links.new(b_socket, rgb_mixer.inputs[2])
+        return rgb_mixer.outputs[0]
+
+    @staticmethod
+    def build(name, topology):
+        pass_types, use_vertex_colors, use_alpha, use_normal, use_glow = topology
+        b_group = bpy.data.node_groups.new(name, 'ShaderNodeTree')
+
+        # the interface comes first, so the group input node has all sockets
+        pass_inputs = [get_pass_inputs(index, pass_type) for index, pass_type in enumerate(pass_types)]
+        for color_name, alpha_name in pass_inputs:
+            b_group.inputs.new('NodeSocketColor', color_name)
+            if alpha_name:
+                b_group.inputs.new('NodeSocketFloatFactor', alpha_name)
+        if use_normal:
+            b_group.inputs.new('NodeSocketColor', "Normal")
+        if use_glow:
+            b_group.inputs.new('NodeSocketColor', "Glow")
+        if use_alpha:
+            b_group.inputs.new('NodeSocketFloatFactor', "Alpha").default_value = 1.0
+        b_group.outputs.new('NodeSocketShader', "Shader")
+        group_input = b_group.nodes.new('NodeGroupInput')
+        group_output = b_group.nodes.new('NodeGroupOutput')
+
+        # blend the textures into the diffuse color
+        b_color = None
+        for pass_type, (color_name, alpha_name) in zip(pass_types, pass_inputs):
+            b_alpha = group_input.outputs[alpha_name] if alpha_name else None
+            b_color = NodeGroupLibrary.mix(b_group, b_color, group_input.outputs[color_name], pass_type, b_alpha)
+        if use_vertex_colors:
+            vcol = b_group.nodes.new('ShaderNodeAttribute')
+            vcol.attribute_name = "RGBA"
+            b_color = NodeGroupLibrary.mix(b_group, b_color, vcol.outputs[0], "Detail")
+
+        diffuse_shader = b_group.nodes.new('ShaderNodeBsdfDiffuse')
+        if b_color:
+            b_group.links.new(b_color, diffuse_shader.inputs[0])
+        if use_normal:
+            normal_map = b_group.nodes.new('ShaderNodeNormalMap')
+            b_group.links.new(group_input.outputs["Normal"], normal_map.inputs["Color"])
+            b_group.links.new(normal_map.outputs[0], diffuse_shader.inputs["Normal"])
+        b_shader = diffuse_shader.outputs[0]
+
+        if use_glow:
+            emission = b_group.nodes.new('ShaderNodeEmission')
+            add_shader = b_group.nodes.new('ShaderNodeAddShader')
+            b_group.links.new(group_input.outputs["Glow"], emission.inputs[0])
+            b_group.links.new(b_shader, add_shader.inputs[0])
+            b_group.links.new(emission.outputs[0], add_shader.inputs[1])
+            b_shader = add_shader.outputs[0]
+
+        # transparency
+        if use_alpha:
+            transp = b_group.nodes.new('ShaderNodeBsdfTransparent')
+            alpha_mixer = b_group.nodes.new('ShaderNodeMixShader')
+            b_group.links.new(group_input.outputs["Alpha"], alpha_mixer.inputs[0])
+            b_group.links.new(transp.outputs[0], alpha_mixer.inputs[1])
+            b_group.links.new(b_shader, alpha_mixer.inputs[2])
+            b_shader = alpha_mixer.outputs[0]
+
+        b_group.links.new(b_shader, group_output.inputs["Shader"])
+        arrange_nodes(group_output)
+        return b_group
+
+
+node_group_library = NodeGroupLibrary()
@@ -0,0 +1,221 @@
+"""This script indexes the image files under the texture roots, for case insensitive lookups without stat calls."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import json
+import os
+import posixpath
+
+from io_scene_nif.utils.util_global import get_config_path
+from io_scene_nif.utils.util_logging import NifLog
+
+# the image formats that are searched for, in order of preference
+IMAGE_EXTENSIONS = ('.dds', '.png', '.tga', '.bmp', '.jpg')
+
+# bump when the layout of the stored indices changes, so old indices are rebuilt
+INDEX_VERSION = 1
+
+
+def get_key(path):
+    """Split a texture path into its lowercased, / separated path without image extension, and that extension."""
+    path = posixpath.normpath(path.replace('\\', '/').replace(os.sep, '/').lower()).lstrip('/')
+    key, ext = posixpath.splitext(path)
+    if ext not in IMAGE_EXTENSIONS:
+        return path, ext
+    return key, ext
+
+
+class TexturePathIndex:
+    """The image files under a search root, keyed by their case insensitive relative path without extension."""
+
+    def __init__(self, root, files=None, directories=None):
+        self.root = root
+        # key -> relative paths of the files, as they are on disk
+        self.files = files or {}
+        # relative directory -> modification time, a directory's time changes when files are added or removed
+        self.directories = directories or {}
+
+    @classmethod
+    def build(cls, root):
+        """Walk the search root once, and index all image files under it."""
+        index = cls(root)
+        for dirpath, dirnames, filenames in os.walk(root):
+            rel_dir = os.path.relpath(dirpath, root)
+            index.directories[rel_dir] = os.stat(dirpath).st_mtime
+            for filename in filenames:
+                key, ext = get_key(os.path.join(rel_dir, filename))
+                if ext in IMAGE_EXTENSIONS:
+                    index.files.setdefault(key, []).append(os.path.normpath(os.path.join(rel_dir, filename)))
+        NifLog.debug("Indexed {0} images under {1}".format(len(index.files), root))
+        return index
+
+    def is_valid(self):
+        """Check that no directory under the root changed since the index was built."""
+        try:
+            return all(os.stat(os.path.join(self.root, rel_dir)).st_mtime == mtime for rel_dir, mtime in self.directories.items())
+        except OSError:
+            return False
+
+    def find(self, path):
+        """Get the files that match a texture path, ignoring case: the one with its own extension first,
+        then those with other image extensions in order of preference."""
+        key, ext = get_key(path)
+        rel_paths = self.files.get(key, [])
+        preference = (ext,) + IMAGE_EXTENSIONS
+        rel_paths = sorted(rel_paths, key=lambda rel_path: preference.index(os.path.splitext(rel_path)[1].lower()))
+        return [os.path.join(self.root, rel_path) for rel_path in rel_paths]
+
+
+def get_preferred_names(name, ext):
+    """Get the lowercased file names to look for: with its own extension first, then the other image extensions."""
+    if ext not in IMAGE_EXTENSIONS:
+        return [name]
+    return [name + alt_ext for alt_ext in sorted(IMAGE_EXTENSIONS, key=lambda alt_ext: alt_ext != ext)]
+
+
+class TexturePathIndices:
+    """Texture path indices of the texture roots, stored in the user config directory between sessions, or kept in
+    memory only if that directory cannot be resolved.
+
+    Stored indices are checked against the modification times of their directories once per import.
+    Other search folders, such as the folder of the nif, could hold anything, so they are not walked but only looked
+    up directly, ignoring case."""
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.indices = None
+        self.validated = set()
+        # directory -> lowercased name -> name, of the folders looked up directly during this import
+        self.listings = {}
+
+    def invalidate(self):
+        """Check each index against its directories again before its next use, as files may have changed."""
+        self.validated = set()
+        self.listings = {}
+
+    def load(self):
+        self.indices = {}
+        if not self.filepath:
+            self.filepath = get_config_path("texture_index.json")
+        if not self.filepath:
+            NifLog.warn("Could not find the Blender config directory, texture indices are not stored between sessions")
+            return
+        try:
+            with open(self.filepath, "r") as index_file:
+                stored = json.load(index_file)
+        except (OSError, ValueError):
+            return
+        if stored.get("version") == INDEX_VERSION:
+            for root, index in stored.get("indices", {}).items():
+                self.indices[root] = TexturePathIndex(root, index["files"], index["directories"])
+
+    def save(self):
+        if not self.filepath:
+            return
+        stored = {"version": INDEX_VERSION,
+                  "indices": {root: {"files": index.files, "directories": index.directories}
+                              for root, index in self.indices.items()}}
+        try:
+            with open(self.filepath, "w") as index_file:
+                json.dump(stored, index_file)
+        except OSError as e:
+            NifLog.warn("Could not write texture index {0}: {1}".format(self.filepath, e))
+
+    def get(self, root):
+        """Get the valid index of a search root, building it if needed; None if the root is not a directory."""
+        root = os.path.abspath(root)
+        if self.indices is None:
+            self.load()
+        index = self.indices.get(root)
+        if root not in self.validated:
+            if not os.path.isdir(root):
+                return None
+            if not index or not index.is_valid():
+                index = self.indices[root] = TexturePathIndex.build(root)
+                self.save()
+            self.validated.add(root)
+        return index
+
+    def list_directory(self, directory):
+        """Get the names in a directory by their lowercased name, listing it once per import."""
+        listing = self.listings.get(directory)
+        if listing is None:
+            try:
+                listing = {name.lower(): name for name in os.listdir(directory)}
+            except OSError:
+                listing = {}
+            self.listings[directory] = listing
+        return listing
+
+    def find_direct(self, root, path):
+        """Get the files under a search folder that match a texture path, ignoring case and image extension,
+        by listing only the folders on the way."""
+        key, ext = get_key(path)
+        parts = key.split('/')
+        directory = root
+        for part in parts[:-1]:
+            if part in (os.curdir, os.pardir):
+                directory = os.path.join(directory, part)
+                continue
+            name = self.list_directory(directory).get(part)
+            if not name:
+                return []
+            directory = os.path.join(directory, name)
+        listing = self.list_directory(directory)
+        names = (listing.get(name) for name in get_preferred_names(parts[-1], ext))
+        return [os.path.join(directory, name) for name in names if name]
+
+    def find(self, root, path, recursive=True):
+        """Get the files under a search folder that match a texture path, ignoring case and image extension.
+        The path as it is comes first. Texture roots are looked up in their index, other folders directly."""
+        root = os.path.abspath(root)
+        tex = os.path.join(root, path)
+        found = [tex] if os.path.isfile(tex) else []
+        if recursive:
+            index = self.get(root)
+            found += index.find(path) if index else []
+        else:
+            found += self.find_direct(root, path)
+        # remove duplicates, keeping the first
+        unique = {}
+        for tex in found:
+            unique.setdefault(os.path.normcase(tex), tex)
+        return list(unique.values())
+
+
+path_indices = TexturePathIndices()
@@ -0,0 +1,144 @@
+"""This module resolves and reads the textures of a nif in parallel, before their images are created."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.io.archive import archives
+from io_scene_nif.utils.util_math import NifError
+
+# dds files start with this magic, followed by the size of their header
+DDS_MAGIC = b'DDS '
+DDS_HEADER_SIZE = 124
+
+
+def get_texture_paths(n_data):
+    """Collect the unique texture paths that a nif refers to, in order of first use."""
+    paths = {}
+    for n_block in n_data.get_global_iterator():
+        if isinstance(n_block, NifFormat.NiSourceTexture):
+            # embedded textures are decoded from the nif itself
+            if not n_block.use_external:
+                continue
+            names = [n_block.file_name]
+        elif isinstance(n_block, NifFormat.BSShaderTextureSet):
+            names = n_block.textures
+        elif isinstance(n_block, NifFormat.BSEffectShaderProperty):
+            names = [n_block.source_texture]
+        else:
+            continue
+        for name in names:
+            if name:
+                path = name.decode()
+                paths.setdefault(path.lower(), path)
+    return list(paths.values())
+
+
+def is_valid_image(tex, data):
+    """Check that the contents of an image file are not empty, and that a dds file has an intact header."""
+    if not data:
+        return False
+    if os.path.splitext(tex)[1].lower() == '.dds':
+        return (len(data) >= len(DDS_MAGIC) + DDS_HEADER_SIZE and data[:4] == DDS_MAGIC
+                and struct.unpack('<I', data[4:8])[0] == DDS_HEADER_SIZE)
+    return True
+
+
+def read_header(location):
+    """Read enough of an image file to validate it: the start of a file on disk, or all of a file in an archive,
+    which is kept in the cache of decompressed files for when its image is created."""
+    tex, archive, path = location
+    if archive:
+        return archives.read(archive, path)
+    with open(tex, "rb") as stream:
+        return stream.read(len(DDS_MAGIC) + DDS_HEADER_SIZE)
+
+
+class TexturePrefetch:
+    """The locations of the textures of a nif, resolved and validated by a pool of threads.
+
+    Resolving runs the case insensitive lookups on disk, and decompresses files from archives into their cache,
+    so creating the images on the main thread afterwards does not wait on the disk. Workers must not touch bpy."""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        # lowercased file name -> the locations of its valid images, in order of preference
+        self.locations = {}
+
+    def clear(self):
+        self.locations = {}
+
+    def get(self, fn):
+        """Get the locations of a prefetched texture, as (file path, archive, path in archive) tuples;
+        None if the texture was not prefetched."""
+        return self.locations.get(fn.lower())
+
+    @staticmethod
+    def find_valid_locations(locations):
+        """Validate candidate locations, and keep the valid ones in order of preference, so that the main thread can
+        fall back on the next one if Blender cannot decode an image."""
+        valid_locations = []
+        for location in locations:
+            try:
+                data = read_header(location)
+            except (OSError, KeyError, NifError):
+                continue
+            if is_valid_image(location[0], data):
+                valid_locations.append(location)
+        return valid_locations
+
+    def prefetch(self, file_names, find_locations):
+        """Resolve and validate the images of texture file names concurrently.
+
+        :param file_names: The file names of the textures, as they are searched for.
+        :param find_locations: Maps a file name to its candidate locations, in order of preference.
+        :return: The number of textures that were found.
+        """
+        self.clear()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda fn: self.find_valid_locations(find_locations(fn)), file_names)
+            for fn, locations in zip(file_names, results):
+                self.locations[fn.lower()] = locations
+        return sum(1 for locations in self.locations.values() if locations)
+
+
+texture_prefetch = TexturePrefetch()
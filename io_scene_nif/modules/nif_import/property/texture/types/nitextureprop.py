@@ -98,13 +98,13 @@ class NiTextureProp(TextureSlotManager):
             normal = n_texture_desc.normal_texture
             # NifLog.debug("Loading normal texture {0}".format(normal))
             b_texture = self.create_texture_slot(b_mat, normal)
-            # self.update_normal_slot(b_texture)
+            self.update_normal_slot(b_texture)
 
         if n_texture_desc.has_glow_texture:
             glow = n_texture_desc.glow_texture
             # NifLog.debug("Loading glow texture {0}".format(glow))
             b_texture = self.create_texture_slot(b_mat, glow)
-            # self.update_glow_slot(b_texture)
+            self.update_glow_slot(b_texture)
 
         if n_texture_desc.has_gloss_texture:
             gloss = n_texture_desc.gloss_texture
@@ -46,11 +46,14 @@ from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.modules.nif_export.animation.transform import TransformAnimation
 from io_scene_nif.modules.nif_export.collision import Collision
+from io_scene_nif.modules.nif_export.collision.bounds import bounds_cache
+from io_scene_nif.modules.nif_export.collision.mopp import MoppCache
 from io_scene_nif.modules.nif_export.constraint import Constraint
 from io_scene_nif.modules.nif_export.block_registry import block_store
 from io_scene_nif.modules.nif_export.object import Object
 from io_scene_nif.modules.nif_export import scene
 from io_scene_nif.modules.nif_export.property.object import ObjectProperty
+from io_scene_nif.modules.nif_export.property.texture.metadata import texture_metadata
 from io_scene_nif.nif_common import NifCommon
 from io_scene_nif.utils import util_math, util_consts
 from io_scene_nif.utils.util_global import NifOp, EGMData, NifData
@@ -95,6 +98,8 @@ class NifExport(NifCommon):
         filebase, fileext = os.path.splitext(os.path.basename(NifOp.props.filepath))
 
         block_store.block_to_obj = {}  # clear out previous iteration
+        bounds_cache.clear()
+        texture_metadata.invalidate()
 
         try:  # catch export errors
 
@@ -313,16 +318,27 @@ class NifExport(NifCommon):
 
             # generate mopps (must be done after applying scale!)
             if NifOp.props.game in ('OBLIVION', 'FALLOUT_3', 'SKYRIM'):
+                mopp_cache = MoppCache() if NifOp.props.use_mopp_cache else None
+                b_scene = bpy.context.scene.niftools_scene
+                havok_scale = util_consts.HAVOK_SCALE
+                if b_scene.user_version == 12 and b_scene.user_version_2 == 83:
+                    havok_scale *= 10
                 for block in block_store.block_to_obj:
                     if isinstance(block, NifFormat.bhkMoppBvTreeShape):
                         NifLog.info("Generating mopp...")
-                        block.update_mopp()
+                        if mopp_cache:
+                            mopp_cache.update_mopp(block, havok_scale)
+                        else:
+                            block.update_mopp()
                         # print "=== DEBUG: MOPP TREE ==="
                         # block.parse_mopp(verbose = True)
                         # print "=== END OF MOPP TREE ==="
                         # warn about mopps on non-static objects
                         if any(sub_shape.layer != 1 for sub_shape in block.shape.sub_shapes):
                             NifLog.warn("Mopps for non-static objects may not function correctly in-game. You may wish to use simple primitives for collision.")
+                if mopp_cache:
+                    mopp_cache.save()
+                    mopp_cache.log_stats()
 
             # export nif file:
             # ----------------
@@ -42,6 +42,7 @@ import bpy
 import pyffi.spells.nif.fix
 from pyffi.formats.nif import NifFormat
 
+from io_scene_nif.io.archive import archives
 from io_scene_nif.io.egm import EGMFile
 from io_scene_nif.io.nif import NifFile
 from io_scene_nif.modules.nif_import.animation import Animation
@@ -50,13 +51,17 @@ from io_scene_nif.modules.nif_import.animation.transform import TransformAnimati
 from io_scene_nif.modules.nif_import.armature import Armature
 from io_scene_nif.modules.nif_import.collision.bound import Bound
 from io_scene_nif.modules.nif_import.collision.havok import BhkCollision
+from io_scene_nif.modules.nif_import.collision.rigid_body import rigid_bodies
 from io_scene_nif.modules.nif_import.constraint import Constraint
 from io_scene_nif.modules.nif_import.geometry.vertex.groups import VertexGroup
 from io_scene_nif.modules.nif_import.object.block_registry import block_store
 from io_scene_nif.modules.nif_import.object import Object
 from io_scene_nif.modules.nif_import.object.types import NiTypes
 from io_scene_nif.modules.nif_import import scene
+from io_scene_nif.modules.nif_import.property.cache import import_cache
 from io_scene_nif.modules.nif_import.property.object import ObjectProperty
+from io_scene_nif.modules.nif_import.property.texture.loader import TextureLoader
+from io_scene_nif.modules.nif_import.property.texture.path_index import path_indices
 
 from io_scene_nif.nif_common import NifCommon
 from io_scene_nif.utils import util_math
@@ -81,6 +86,12 @@ class NifImport(NifCommon):
         self.object_anim = ObjectAnimation()
         self.transform_anim = TransformAnimation()
 
+        # texture files and archives may have changed since the last import
+        path_indices.invalidate()
+        archives.invalidate()
+        # images and materials of earlier imports may have been removed
+        import_cache.begin_import()
+
         # find and store this list now of selected objects as creating new objects adds them to the selection list
         self.SELECTED_OBJECTS = bpy.context.selected_objects[:]
 
@@ -95,6 +106,10 @@ class NifImport(NifCommon):
             # the axes used for bone correction depend on the nif version
             util_math.set_bone_orientation(NifOp.props.axis_forward, NifOp.props.axis_up)
 
+            # resolve all textures up front, so importing materials does not wait on the disk
+            if NifOp.props.skeleton != "SKELETON_ONLY":
+                TextureLoader.prefetch_textures(NifData.data)
+
             NifLog.info("Importing data")
             # calculate and set frames per second
             if NifOp.props.animation:
@@ -185,6 +200,8 @@ class NifImport(NifCommon):
 
             # now all havok objects are imported, so we are ready to import the havok constraints
             self.constrainthelper.import_bhk_constraints()
+            # attach the rigid bodies of all collision objects at once
+            rigid_bodies.attach()
 
             # parent selected meshes to imported skeleton
             if NifOp.props.skeleton == "SKELETON_ONLY":
@@ -121,6 +121,65 @@ class NifExportOperator(Operator, ExportHelper, NifOperatorCommon):
         default=True,
         options={'HIDDEN'})
 
+    # Stripifier used for stripified geometries.
+    stripifier: bpy.props.EnumProperty(
+        items=[
+            ('NIFTOOLS', "NifTools", "Fast stripifier that builds long strips."),
+            ('PYFFI', "PyFFI", "Stripifier of pyffi, which optimizes the strips for the vertex cache."),
+        ],
+        name="Stripifier",
+        description="Stripifier used for stripified geometries.",
+        default='NIFTOOLS',
+        options={'HIDDEN'})
+
+    # Reorder triangles and vertices for the vertex cache.
+    optimize_vertex_cache: bpy.props.BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Reorder triangles and vertices for faster rendering.",
+        default=False)
+
+    # Size of the vertex cache that triangles are reordered for.
+    vertex_cache_size: bpy.props.IntProperty(
+        name="Vertex Cache Size",
+        description="Size of the simulated vertex cache that triangles are reordered for.",
+        default=32, min=4, max=64)
+
+    # Fit box colliders to the vertices with the smallest oriented box.
+    use_minimal_obb: bpy.props.BoolProperty(
+        name="Tight Box Colliders",
+        description="Rotate box collision shapes to fit the vertices with the smallest box, instead of aligning them with the object.",
+        default=False)
+
+    # Reuse mopps of unchanged collision geometry from previous exports.
+    use_mopp_cache: bpy.props.BoolProperty(
+        name="Cache Mopps",
+        description="Reuse the mopp of unchanged packed collision from previous exports, instead of generating it again.",
+        default=True)
+
+    # Number of reduced levels of detail to generate for each mesh.
+    lod_levels: bpy.props.IntProperty(
+        name="LOD Levels",
+        description="Number of simplified levels of detail to generate, wrapped in a NiLODNode along with the full mesh.",
+        default=0, min=0, max=8)
+
+    # Fraction of triangles that each level of detail keeps of the previous level.
+    lod_reduction: bpy.props.FloatProperty(
+        name="LOD Reduction",
+        description="Fraction of triangles that each level of detail keeps of the previous level.",
+        default=0.5, min=0.05, max=0.95)
+
+    # Distance up to which the full detail mesh is shown.
+    lod_distance: bpy.props.FloatProperty(
+        name="LOD Distance",
+        description="Distance up to which the full detail mesh is shown.",
+        default=1000.0, min=0.0)
+
+    # Factor by which the distance band of each level of detail grows.
+    lod_distance_factor: bpy.props.FloatProperty(
+        name="LOD Distance Factor",
+        description="Factor by which the far distance grows with each level of detail, the last level is shown up to its far distance.",
+        default=2.0, min=1.0)
+
     # Flatten skin.
     flatten_skin: bpy.props.BoolProperty(
         name="Flatten Skin",
@@ -152,6 +211,12 @@ class NifExportOperator(Operator, ExportHelper, NifOperatorCommon):
         default=4, min=1,
     )
 
+    # Calculate a MikkTSpace compatible tangent space.
+    mikktspace_tangents: bpy.props.BoolProperty(
+        name="MikkTSpace Tangents",
+        description="Calculate a MikkTSpace compatible tangent space, instead of the classic NifTools one.",
+        default=False)
+
     # Pad and sort bones.
     force_dds: bpy.props.BoolProperty(
         name="Force DDS",
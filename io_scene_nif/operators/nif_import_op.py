@@ -132,6 +132,24 @@ class NifImportOperator(Operator, ImportHelper, NifOperatorCommon):
         description="Merge vertices that have identical location and normal values.",
         default=False)
 
+    # Look up textures that are not found on disk in the bsa and ba2 archives of the game's data folder.
+    use_archives: bpy.props.BoolProperty(
+        name="Search Archives",
+        description="Look up textures that are not found on disk in the bsa and ba2 archives of the game's data folder.",
+        default=True)
+
+    # Decode the textures that are embedded in the nif.
+    use_embedded_textures: bpy.props.BoolProperty(
+        name="Import Embedded Textures",
+        description="Decode the textures that are embedded in the nif into packed images.",
+        default=True)
+
+    # Lay out the node trees of imported materials.
+    arrange_nodes: bpy.props.BoolProperty(
+        name="Arrange Nodes",
+        description="Lay out the node trees of imported materials, skip this for faster batch imports.",
+        default=True)
+
     def execute(self, context):
         """Execute the import operators: first constructs a
         :class:`~io_scene_nif.nif_import.NifImport` instance and then
@@ -37,9 +37,29 @@
 #
 # ***** END LICENSE BLOCK *****
 
+import os
+
+import bpy
+
 from io_scene_nif.utils.util_logging import NifLog
 
 
+def get_config_path(file_name):
+    """Get the path of a file in the folder of the addon in the Blender user config directory, creating that folder if
+    needed; None if it cannot be resolved."""
+    # Blender 3.0 renamed the autocreate keyword to create
+    for create_keyword in ("autocreate", "create"):
+        try:
+            config_dir = bpy.utils.user_resource('CONFIG', path="io_scene_nif", **{create_keyword: True})
+        except TypeError:
+            continue
+        except OSError as e:
+            NifLog.debug("Could not create the config directory: {0}".format(e))
+            return None
+        return os.path.join(config_dir, file_name) if config_dir else None
+    return None
+
+
 class NifOp:
     """A simple reference holder class but enables classes to be decoupled. 
     This module require initialisation to function."""
@@ -0,0 +1,254 @@
+"""Convex hull utilities, shared by the import and export of convex collision shapes."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import heapq
+
+import numpy as np
+
+try:
+    from scipy.spatial import ConvexHull
+except ImportError:
+    ConvexHull = None
+
+# hulls are reduced to this many vertices on export, complex hulls are slow to collide with in game
+MAX_VERTICES = 256
+
+# relative to the size of the point cloud, points closer than this to a face are on the face
+EPSILON = 1e-9
+
+# planes whose normals differ less than this, and whose distances differ less than this relative to the hull size, are merged
+PLANE_TOLERANCE = 1e-4
+
+
+def get_hull(points, max_vertices=None):
+    """Calculate the convex hull of a point cloud.
+
+    scipy's qhull is used if it is installed, otherwise a numpy quickhull. If the hull has more than max_vertices
+    vertices, the quickhull stops once it has found that many, so the hull is spanned by the farthest points.
+
+    :param points: The (n, 3) points.
+    :param max_vertices: Optional maximum number of hull vertices.
+    :return: The (k, 3) hull vertices, and the (m, 3) triangles that index them, counter clockwise seen from outside.
+    """
+    points = np.unique(np.asarray(points, dtype=np.float64).reshape(-1, 3), axis=0)
+    if ConvexHull is not None and len(points) >= 4:
+        try:
+            hull = ConvexHull(points)
+        except (RuntimeError, ValueError):
+            # qhull fails on flat point clouds, the quickhull handles those
+            pass
+        else:
+            if max_vertices is None or len(hull.vertices) <= max_vertices:
+                triangles = hull.simplices.copy()
+                # qhull does not orient its triangles, but it does give their outward normals
+                corners = points[triangles]
+                flipped = np.einsum('ij,ij->i', np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), hull.equations[:, :3]) < 0
+                triangles[flipped] = triangles[flipped][:, ::-1]
+                return compact(points, triangles)
+            points = points[hull.vertices]
+    return compact(points, quickhull(points, max_vertices))
+
+
+def compact(points, triangles):
+    """Keep only the points used by the triangles, and remap the triangles to them."""
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return points[used], triangles.reshape(-1, 3)
+
+
+def get_initial_simplex(points, epsilon):
+    """Find four points that span a tetrahedron of the point cloud, as large as is cheap to find.
+
+    :return: The four point indices, or None if the points are (nearly) coplanar.
+    """
+    extremes = np.concatenate((points.argmin(axis=0), points.argmax(axis=0)))
+    distances = np.linalg.norm(points[extremes, np.newaxis] - points[np.newaxis, extremes], axis=2)
+    i, j = np.unravel_index(distances.argmax(), distances.shape)
+    a, b = extremes[i], extremes[j]
+    line_distances = np.linalg.norm(np.cross(points - points[a], points[b] - points[a]), axis=1)
+    c = line_distances.argmax()
+    if line_distances[c] <= epsilon * distances[i, j]:
+        return None
+    normal = np.cross(points[b] - points[a], points[c] - points[a])
+    normal /= np.linalg.norm(normal)
+    plane_distances = np.abs((points - points[a]) @ normal)
+    d = plane_distances.argmax()
+    if plane_distances[d] <= epsilon:
+        return None
+    return [int(a), int(b), int(c), int(d)]
+
+
+def quickhull(points, max_vertices=None):
+    """Calculate the triangles of the convex hull of a point cloud, by adding the farthest outside point one at a time.
+
+    :param points: The (n, 3) points, without duplicates.
+    :param max_vertices: Optional maximum number of hull vertices, the farthest points are added first.
+    :return: The (m, 3) triangles, counter clockwise seen from outside, as indices into points.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    if len(points) < 4:
+        return np.empty((0, 3), dtype=np.int64)
+    epsilon = EPSILON * max(np.ptp(points, axis=0).max(), 1.0)
+    simplex = get_initial_simplex(points, epsilon)
+    if simplex is None:
+        return np.empty((0, 3), dtype=np.int64)
+
+    faces = []
+    planes = []
+    outside = []
+    alive = []
+    edge_faces = {}
+    heap = []
+
+    def add_face(a, b, c):
+        normal = np.cross(points[b] - points[a], points[c] - points[a])
+        length = np.linalg.norm(normal)
+        if length > 0:
+            normal /= length
+        face = len(faces)
+        faces.append((a, b, c))
+        planes.append((normal, normal @ points[a]))
+        outside.append(None)
+        alive.append(True)
+        for edge in ((a, b), (b, c), (c, a)):
+            edge_faces[edge] = face
+        return face
+
+    def assign(new_faces, candidates):
+        """Give each candidate point to the first new face it is in front of."""
+        if not len(candidates) or not new_faces:
+            return
+        normals = np.array([planes[face][0] for face in new_faces])
+        offsets = np.array([planes[face][1] for face in new_faces])
+        distances = points[candidates] @ normals.T - offsets
+        best = distances.argmax(axis=1)
+        best_distances = distances[np.arange(len(candidates)), best]
+        in_front = best_distances > epsilon
+        for i, face in enumerate(new_faces):
+            mask = in_front & (best == i)
+            if mask.any():
+                outside[face] = candidates[mask]
+                heapq.heappush(heap, (-best_distances[mask].max(), face))
+
+    # orient the simplex faces away from its centroid
+    centroid = points[simplex].mean(axis=0)
+    new_faces = []
+    for a, b, c in ((0, 1, 2), (0, 3, 1), (1, 3, 2), (2, 3, 0)):
+        a, b, c = simplex[a], simplex[b], simplex[c]
+        if np.cross(points[b] - points[a], points[c] - points[a]) @ (points[a] - centroid) < 0:
+            b, c = c, b
+        new_faces.append(add_face(a, b, c))
+    num_vertices = 4
+    assign(new_faces, np.setdiff1d(np.arange(len(points)), simplex))
+
+    while heap:
+        if max_vertices is not None and num_vertices >= max_vertices:
+            break
+        _, face = heapq.heappop(heap)
+        if not alive[face] or outside[face] is None:
+            continue
+        candidates = outside[face]
+        normal, offset = planes[face]
+        eye = candidates[(points[candidates] @ normal).argmax()]
+        eye_point = points[eye]
+
+        # the faces that see the eye point form a connected patch around the face
+        visible = {face}
+        stack = [face]
+        horizon = []
+        while stack:
+            current = stack.pop()
+            a, b, c = faces[current]
+            for edge in ((a, b), (b, c), (c, a)):
+                neighbour = edge_faces.get((edge[1], edge[0]))
+                if neighbour is None or neighbour in visible:
+                    continue
+                neighbour_normal, neighbour_offset = planes[neighbour]
+                if eye_point @ neighbour_normal - neighbour_offset > epsilon:
+                    visible.add(neighbour)
+                    stack.append(neighbour)
+        for current in visible:
+            a, b, c = faces[current]
+            for edge in ((a, b), (b, c), (c, a)):
+                if edge_faces.get((edge[1], edge[0])) not in visible:
+                    horizon.append(edge)
+
+        # replace the visible faces by a cone from the horizon to the eye point
+        orphans = [outside[current] for current in visible if outside[current] is not None]
+        for current in visible:
+            alive[current] = False
+            outside[current] = None
+            a, b, c = faces[current]
+            for edge in ((a, b), (b, c), (c, a)):
+                if edge_faces.get(edge) == current:
+                    del edge_faces[edge]
+        new_faces = [add_face(a, b, int(eye)) for a, b in horizon]
+        num_vertices += 1
+        orphans = np.concatenate(orphans) if orphans else np.empty(0, dtype=np.int64)
+        assign(new_faces, orphans[orphans != eye])
+
+    return np.array([triangle for triangle, is_alive in zip(faces, alive) if is_alive], dtype=np.int64).reshape(-1, 3)
+
+
+def get_planes(vertices, triangles, tolerance=PLANE_TOLERANCE):
+    """Merge the coplanar triangles of a convex hull into unique planes.
+
+    :param vertices: The (k, 3) hull vertices.
+    :param triangles: The (m, 3) hull triangles, counter clockwise seen from outside.
+    :param tolerance: Planes are merged if their normals and relative distances differ less than this.
+    :return: The (p, 3) outward unit normals, and the (p,) distances, so that normal . v + distance = 0 on each plane.
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+    corners = vertices[np.asarray(triangles, dtype=np.int64).reshape(-1, 3)]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    areas = np.linalg.norm(normals, axis=1)
+    valid = areas > 0
+    normals = normals[valid] / areas[valid, np.newaxis]
+    distances = -np.einsum('ij,ij->i', normals, corners[valid, 0])
+    size = max(np.ptp(vertices, axis=0).max(), 1.0) if len(vertices) else 1.0
+
+    # the largest triangles define the planes that smaller coplanar triangles merge into
+    keep = []
+    for i in np.argsort(-areas[valid], kind='stable').tolist():
+        if keep:
+            same_normal = normals[keep] @ normals[i] > 1.0 - tolerance
+            same_distance = np.abs(distances[keep] - distances[i]) < tolerance * size
+            if (same_normal & same_distance).any():
+                continue
+        keep.append(i)
+    return normals[keep], distances[keep]
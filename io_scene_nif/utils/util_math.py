@@ -41,6 +41,7 @@ import math
 import bpy
 from bpy_extras.io_utils import axis_conversion
 import mathutils
+import numpy as np
 from pyffi.formats.nif import NifFormat
 
 from io_scene_nif.utils.util_logging import NifLog
@@ -289,3 +290,80 @@ def mathutils_to_nifformat_matrix(b_matrix):
     n_matrix = NifFormat.Matrix44()
     n_matrix.set_rows(*b_matrix.transposed())
     return n_matrix
+
+
+def nif_vectors_to_array(n_vectors, dtype=np.float32):
+    """Convert a sequence of NifFormat.Vector3 to an (n, 3) numpy array."""
+    return np.array([(v.x, v.y, v.z) for v in n_vectors], dtype=dtype).reshape(-1, 3)
+
+
+def array_to_nif_vectors(array, n_vectors):
+    """Copy an (n, 3) numpy array into an already sized sequence of NifFormat.Vector3."""
+    for n_vec, (x, y, z) in zip(n_vectors, array.tolist()):
+        n_vec.x = x
+        n_vec.y = y
+        n_vec.z = z
+
+
+def get_b_coords(b_data):
+    """Read the co attribute of a blender vertex or shape key point collection as an (n, 3) float32 array."""
+    coords = np.empty(len(b_data) * 3, dtype=np.float32)
+    b_data.foreach_get("co", coords)
+    return coords.reshape(-1, 3)
+
+
+def set_b_coords(b_data, coords):
+    """Write an (n, 3) array into the co attribute of a blender vertex or shape key point collection.
+
+    The array is truncated or padded with the current coordinates if its length does not match the collection."""
+    num_points = len(b_data)
+    coords = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+    if len(coords) != num_points:
+        padded = get_b_coords(b_data)
+        num_common = min(num_points, len(coords))
+        padded[:num_common] = coords[:num_common]
+        coords = padded
+    b_data.foreach_set("co", coords.ravel())
+
+
+def linear_blend_skin(vertices, transforms, vert_indices, bone_indices, weights, normals=None, rotations=None):
+    """Deform vertices, and optionally normals, by weighted per bone transforms.
+
+    :param vertices: (num_vertices, 3) array of vertex positions.
+    :param transforms: (num_bones, 4, 4) array of bone transforms in the row vector convention.
+    :param vert_indices: Vertex index of each influence.
+    :param bone_indices: Bone index of each influence.
+    :param weights: Weight of each influence.
+    :param normals: Optional (num_vertices, 3) array of vertex normals.
+    :param rotations: (num_bones, 3, 3) array of bone rotations, required with normals.
+    :return: Deformed vertices, deformed normals (or None), and the summed weight per vertex.
+    """
+    num_vertices = len(vertices)
+    out_vertices = np.zeros((num_vertices, 3), dtype=np.float64)
+    out_normals = None if normals is None else np.zeros((num_vertices, 3), dtype=np.float64)
+    sum_weights = np.bincount(vert_indices, weights=weights, minlength=num_vertices)
+
+    # one batched product per bone rather than one per influence
+    order = np.argsort(bone_indices, kind="stable")
+    sorted_bones = bone_indices[order]
+    bounds = np.flatnonzero(np.diff(sorted_bones)) + 1
+    for group in np.split(order, bounds):
+        if not len(group):
+            continue
+        bone_index = bone_indices[group[0]]
+        group_verts = vert_indices[group]
+        group_weights = weights[group][:, np.newaxis]
+        transform = transforms[bone_index]
+        deformed = (vertices[group_verts] @ transform[:3, :3] + transform[3, :3]) * group_weights
+        for axis in range(3):
+            out_vertices[:, axis] += np.bincount(group_verts, weights=deformed[:, axis], minlength=num_vertices)
+        if out_normals is not None:
+            rotated = (normals[group_verts] @ rotations[bone_index]) * group_weights
+            for axis in range(3):
+                out_normals[:, axis] += np.bincount(group_verts, weights=rotated[:, axis], minlength=num_vertices)
+
+    if out_normals is not None:
+        lengths = np.linalg.norm(out_normals, axis=1)
+        nonzero = lengths > 0
+        out_normals[nonzero] /= lengths[nonzero, np.newaxis]
+    return out_vertices, out_normals, sum_weights
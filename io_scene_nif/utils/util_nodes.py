@@ -1,124 +1,115 @@
-#adapted from https://raw.githubusercontent.com/JuhaW/NodeArrange/master/__init__.py
+"""This module arranges the nodes of imported node trees in columns, from the output node to the left."""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
 
 from collections import OrderedDict
-from itertools import repeat
-
-class values():
-	average_y = 0
-	x_last = 0
-	margin_x = 300
-	mat_name = ""
-	margin_y = 200
-	
-def nodes_iterate(ntree, nodeoutput):
-	
-	a = [ [nodeoutput,], ]
-	level = 0
-		
-	while a[level]:
-		a.append([])
-		#print ("level:",level)
-		
-		for node in a[level]:
-			#print ("while: level:", level)
-			inputlist = [i for i in node.inputs if i.is_linked]
-			#print ("inputlist:", inputlist)
-			if inputlist:
-								
-				for input in inputlist:
-					for nlinks in input.links:
-						#dont add parented nodes (inside frame) to list
-						#if not nlinks.from_node.parent:
-						node1 = nlinks.from_node
-						#print ("appending node:",node1)
-						a[level + 1].append(node1)
-			
-			else:
-				pass
-				#print ("no inputlist at level:", level)
-
-		level += 1
-		
-	#delete last empty list
-	del a[level]
-	level -= 1
-	
-	#remove duplicate nodes at the same level, first wins
-	for x, nodes in enumerate(a):
-		a[x] = list(OrderedDict(zip(a[x], repeat(None))))
-	#print ("Duplicate nodes removed")
-	
-	#remove duplicate nodes in all levels, last wins
-	top = level 
-	for row1 in range(top, 1, -1):
-		#print ("row1:",row1, a[row1])
-		for col1 in a[row1]:
-			#print ("col1:",col1)
-			for row2 in range(row1-1, 0, -1):
-				for col2 in a[row2]:
-					if col1 == col2:
-						#print ("Duplicate node found:", col1)
-						#print ("Delete node:", col2)
-						a[row2].remove(col2)
-						break
-
-	levelmax = level + 1
-	level = 0
-	values.x_last = 0
-
-	while level < levelmax:
-
-		values.average_y = 0
-		nodes = [x for x in a[level]]
-		#print ("level, nodes:", level, nodes)
-		nodes_arrange(ntree, nodes, level)
-		
-		level = level + 1
-
-	return None
-
-def nodes_arrange(ntree, nodelist, level):
-
-	parents = []
-	for node in nodelist:
-		parents.append(node.parent)
-		node.parent = None
-		ntree.nodes.update()
-		
-		
-	#print ("nodes arrange def")
-	# node x positions
-
-	widthmax = max([x.dimensions.x for x in nodelist])
-	xpos = values.x_last - (widthmax + values.margin_x) if level != 0 else 0
-	#print ("nodelist, xpos", nodelist,xpos)
-	values.x_last = xpos
-
-	# node y positions
-	x = 0
-	y = 0
-
-	for node in nodelist:
-
-		if node.hide:
-			hidey = (node.dimensions.y / 2) - 8
-			y = y - hidey
-		else:
-			hidey = 0
-
-		node.location.y = y
-		y = y - values.margin_y - node.dimensions.y + hidey
-
-		node.location.x = xpos #if node.type != "FRAME" else xpos + 1200
-		
-	y = y + values.margin_y
-
-	center = (0 + y) / 2
-	values.average_y = center - values.average_y
-
-	for node in nodelist:
-
-		node.location.y -= values.average_y
-
-	for i, node in enumerate(nodelist):
-		node.parent =  parents[i]
+
+# space between the columns, and between the nodes in a column
+MARGIN_X = 100
+MARGIN_Y = 40
+
+# nodes that were never drawn have no dimensions, so their height is estimated from their sockets
+HEADER_HEIGHT = 40
+SOCKET_HEIGHT = 22
+
+
+def get_levels(output, get_inputs):
+    """Group the nodes that feed into an output node by their level, the length of the longest path to the output.
+
+    Nodes are found by a single breadth first search and then visited in topological order, so this takes time linear
+    in the number of nodes and links.
+
+    :param output: The output node, the only node at level 0.
+    :param get_inputs: Maps a node to the nodes that are linked to its inputs.
+    :return: A list of levels, each a list of nodes in the order in which they were found.
+    """
+    # find the nodes, and count how many of them each node feeds into
+    order = [output]
+    inputs = {}
+    num_outputs = {output: 0}
+    for node in order:
+        inputs[node] = list(OrderedDict.fromkeys(get_inputs(node)))
+        for input_node in inputs[node]:
+            if input_node not in num_outputs:
+                num_outputs[input_node] = 0
+                order.append(input_node)
+            num_outputs[input_node] += 1
+
+    # a node is visited once all nodes it feeds into are, which pushes its level past theirs
+    levels = dict.fromkeys(order, 0)
+    ready = [output]
+    for node in ready:
+        for input_node in inputs[node]:
+            levels[input_node] = max(levels[input_node], levels[node] + 1)
+            num_outputs[input_node] -= 1
+            if not num_outputs[input_node]:
+                ready.append(input_node)
+
+    columns = [[] for _ in range(max(levels.values()) + 1)]
+    for node in order:
+        columns[levels[node]].append(node)
+    return columns
+
+
+def get_input_nodes(node):
+    """Get the nodes that are linked to the inputs of a node."""
+    return [link.from_node for socket in node.inputs if socket.is_linked for link in socket.links]
+
+
+def get_node_height(node):
+    """Get the height of a node, as drawn or else as estimated from its sockets."""
+    if node.dimensions[1]:
+        return node.dimensions[1]
+    if node.hide:
+        return HEADER_HEIGHT
+    num_sockets = sum(1 for socket in node.inputs if socket.enabled) + sum(1 for socket in node.outputs if socket.enabled)
+    return HEADER_HEIGHT + SOCKET_HEIGHT * num_sockets
+
+
+def arrange_nodes(output):
+    """Place the nodes that feed into an output node in columns by level, right to left, each column centered on the
+    output. Every node is placed once, without updating the node tree in between."""
+    x = 0.0
+    for level, nodes in enumerate(get_levels(output, get_input_nodes)):
+        if level:
+            x -= max(node.width for node in nodes) + MARGIN_X
+        heights = [get_node_height(node) for node in nodes]
+        y = (sum(heights) + MARGIN_Y * (len(nodes) - 1)) / 2
+        for node, height in zip(nodes, heights):
+            node.location = (x, y)
+            y -= height + MARGIN_Y
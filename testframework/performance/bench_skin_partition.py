@@ -0,0 +1,99 @@
+"""Benchmark the skin partition builder against pyffi's update_skin_partition.
+
+Run from a terminal, with the plugin installed::
+
+    blender --background --factory-startup --python bench_skin_partition.py -- body.nif [more.nif ...]
+
+Every skinned geometry of each nif is partitioned twice, once per implementation, with the export defaults.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import sys
+import time
+
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.io.nif import NifFile
+from io_scene_nif.modules.nif_export.geometry.mesh import skin_partition
+
+MAX_BONES_PER_PARTITION = 18
+MAX_BONES_PER_VERTEX = 4
+
+
+def get_skinned_geometries(data):
+    return [n_geom for n_geom in data.get_global_iterator() if isinstance(n_geom, NifFormat.NiTriBasedGeom) and n_geom.is_skin()]
+
+
+def summarise(n_geom):
+    """Number of partitions and total number of partition vertices, which counts the vertices duplicated across partitions."""
+    blocks = n_geom.skin_instance.skin_partition.skin_partition_blocks
+    return len(blocks), sum(block.num_vertices for block in blocks)
+
+
+def run_pyffi(n_geom, maximize_bone_sharing):
+    return n_geom.update_skin_partition(maxbonesperpartition=MAX_BONES_PER_PARTITION, maxbonespervertex=MAX_BONES_PER_VERTEX,
+                                        stripify=False, triangles=n_geom.data.get_triangles(),
+                                        maximize_bone_sharing=maximize_bone_sharing)
+
+
+def run_plugin(n_geom, maximize_bone_sharing):
+    return skin_partition.update_skin_partition(n_geom, max_bones_per_partition=MAX_BONES_PER_PARTITION,
+                                                max_bones_per_vertex=MAX_BONES_PER_VERTEX, stripify=False,
+                                                maximize_bone_sharing=maximize_bone_sharing)
+
+
+def benchmark(file_path):
+    # each implementation gets a fresh copy of the file, as partitioning works in place
+    for name, partitioner in (("pyffi", run_pyffi), ("plugin", run_plugin)):
+        data = NifFile.load_nif(file_path)
+        maximize_bone_sharing = data.user_version >= 11
+        for n_geom in get_skinned_geometries(data):
+            start = time.perf_counter()
+            lost_weight = partitioner(n_geom, maximize_bone_sharing)
+            elapsed = time.perf_counter() - start
+            num_parts, num_part_verts = summarise(n_geom)
+            print("{0} | {1} | {2:>6} | {3:8.3f}s | {4:3} partitions | {5:6} partition vertices | lost weight {6:.4f}".format(
+                file_path, n_geom.name.decode(), name, elapsed, num_parts, num_part_verts, lost_weight))
+
+
+if __name__ == "__main__":
+    file_paths = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if not file_paths:
+        print(__doc__)
+    for path in file_paths:
+        benchmark(path)
@@ -0,0 +1,99 @@
+"""Benchmark and validate the tangent space generator against pyffi's update_tangent_space.
+
+Run from a terminal, with the plugin installed::
+
+    blender --background --factory-startup --python bench_tangent_space.py -- armor.nif [more.nif ...]
+
+The tangent space of every geometry with normals and uvs of each nif is calculated by both implementations, and the
+largest deviation between their tangents and bitangents is reported.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import sys
+import time
+
+import numpy as np
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.io.nif import NifFile
+from io_scene_nif.modules.nif_export.geometry.mesh import tangent_space
+from io_scene_nif.utils import util_math
+
+
+def get_geometries(data):
+    return [n_geom for n_geom in data.get_global_iterator() if isinstance(n_geom, NifFormat.NiTriBasedGeom)
+            and n_geom.data and n_geom.data.has_normals and len(n_geom.data.uv_sets) > 0]
+
+
+def get_arrays(n_data):
+    vertices = util_math.nif_vectors_to_array(n_data.vertices, dtype=np.float64)
+    normals = util_math.nif_vectors_to_array(n_data.normals, dtype=np.float64)
+    uvs = np.array([(uv.u, uv.v) for uv in n_data.uv_sets[0]]).reshape(-1, 2)
+    triangles = np.array(n_data.get_triangles()).reshape(-1, 3)
+    return vertices, normals, uvs, triangles
+
+
+def benchmark(file_path):
+    data = NifFile.load_nif(file_path)
+    for n_geom in get_geometries(data):
+        arrays = get_arrays(n_geom.data)
+
+        start = time.perf_counter()
+        n_geom.update_tangent_space(as_extra=False)
+        pyffi_time = time.perf_counter() - start
+        n_tangents = util_math.nif_vectors_to_array(n_geom.data.tangents, dtype=np.float64)
+        n_bitangents = util_math.nif_vectors_to_array(n_geom.data.bitangents, dtype=np.float64)
+
+        start = time.perf_counter()
+        tangents, bitangents = tangent_space.calculate_tangent_space(*arrays)
+        plugin_time = time.perf_counter() - start
+
+        # pyffi leaves vertices without tangent space unnormalized, only compare the others
+        valid = np.abs(np.linalg.norm(n_tangents, axis=1) - 1.0) < 1e-4
+        deviation = max(np.abs(tangents[valid] - n_tangents[valid]).max(initial=0.0),
+                        np.abs(bitangents[valid] - n_bitangents[valid]).max(initial=0.0))
+        print("{0} | {1} | {2:6} vertices | pyffi {3:8.3f}s | plugin {4:8.3f}s | max deviation {5:.6f}".format(
+            file_path, n_geom.name.decode(), len(arrays[0]), pyffi_time, plugin_time, deviation))
+
+
+if __name__ == "__main__":
+    file_paths = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    if not file_paths:
+        print(__doc__)
+    for path in file_paths:
+        benchmark(path)
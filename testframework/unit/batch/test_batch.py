@@ -0,0 +1,185 @@
+"""Unit testing the batch operator shim and the worker pool of the batch script"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import nose
+
+from io_scene_nif.batch import RESULT_PREFIX, BatchOperator, WorkerPool, get_default_properties, get_job_size, load_manifest
+from io_scene_nif.operators.nif_export_op import NifExportOperator
+from io_scene_nif.operators.nif_import_op import NifImportOperator
+from io_scene_nif.utils.util_math import NifError
+
+
+class FakeWorker:
+    """Stands in for a worker process, answering each job right away, or never if it hangs."""
+
+    def __init__(self, job_ids, hang=False):
+        self.job_ids = job_ids
+        self.hang = hang
+        self.killed = threading.Event()
+        self.lines = []
+        self.stdin = self
+        self.stdout = self
+
+    def write(self, line):
+        job = json.loads(line)
+        self.job_ids.append(job["id"])
+        result = {"index": job["index"], "id": job["id"], "status": "ok", "warnings": [], "errors": [], "seconds": 0}
+        self.lines.append(RESULT_PREFIX + json.dumps(result) + "\n")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        if self.hang:
+            # the output ends when the worker is killed
+            self.killed.wait()
+            return
+        while self.lines:
+            yield self.lines.pop(0)
+
+    def kill(self):
+        self.killed.set()
+
+    def wait(self):
+        return -9 if self.killed.is_set() else 0
+
+
+class TestBatchOperator:
+
+    def test_defaults(self):
+        properties = get_default_properties(NifImportOperator)
+        # properties of the operator, its common base class and its helpers
+        nose.tools.assert_equal(properties["arrange_nodes"], True)
+        nose.tools.assert_equal(properties["plugin_log_level"], "DEBUG")
+        nose.tools.assert_equal(properties["filepath"], "")
+        nose.tools.assert_equal(properties["axis_forward"], "-Z")
+
+    def test_properties(self):
+        operator = BatchOperator(NifExportOperator, {"game": "SKYRIM"})
+        nose.tools.assert_equal(operator.properties.game, "SKYRIM")
+        nose.tools.assert_equal(operator.properties.force_dds, True)
+        # class attributes are looked up on the operator
+        nose.tools.assert_equal(operator.version, NifExportOperator.version)
+
+    @nose.tools.raises(NifError)
+    def test_unknown_property(self):
+        BatchOperator(NifImportOperator, {"no_such_property": True})
+
+    def test_report(self):
+        operator = BatchOperator(NifImportOperator, {"plugin_log_level": "ERROR"})
+        operator.report({'WARNING'}, "first")
+        operator.report({'INFO'}, "second")
+        operator.report({'WARNING'}, "third")
+        operator.report({'ERROR'}, "fourth")
+        # warnings and errors go into the result regardless of the log level, other messages never do
+        nose.tools.assert_equal(operator.get_messages('WARNING'), ["first", "third"])
+        nose.tools.assert_equal(operator.get_messages('ERROR'), ["fourth"])
+        nose.tools.assert_equal(operator.get_messages('INFO'), [])
+
+
+class TestManifest:
+
+    def setup(self):
+        self.root = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.root, "manifest.json")
+        with open(os.path.join(self.root, "large.nif"), "wb") as stream:
+            stream.write(bytes(100))
+        with open(os.path.join(self.root, "small.nif"), "wb") as stream:
+            stream.write(bytes(10))
+
+    def teardown(self):
+        shutil.rmtree(self.root)
+
+    def write_manifest(self, manifest):
+        with open(self.manifest, "w") as stream:
+            json.dump(manifest, stream)
+
+    def test_load(self):
+        self.write_manifest({
+            "properties": {"import_nif": {"combine_vertices": True}},
+            "jobs": [{"type": "import_nif", "filepath": "small.nif", "egm": "head.egm", "properties": {"arrange_nodes": True}},
+                     {"id": "export", "type": "export_nif", "filepath": "out/large.nif", "blend": "large.blend"}]})
+        jobs = load_manifest(self.manifest)
+        nose.tools.assert_equal([job["id"] for job in jobs], ["0", "export"])
+        properties = jobs[0]["properties"]
+        nose.tools.assert_equal(properties["filepath"], os.path.join(self.root, "small.nif"))
+        nose.tools.assert_equal(properties["egm_file"], os.path.join(self.root, "head.egm"))
+        nose.tools.assert_equal(properties["combine_vertices"], True)
+        nose.tools.assert_equal(properties["arrange_nodes"], True)
+        nose.tools.assert_equal(jobs[1]["blend"], os.path.join(self.root, "large.blend"))
+        # the node layout is skipped in batch imports, unless asked for
+        self.write_manifest([{"type": "import_nif", "filepath": "small.nif"}])
+        nose.tools.assert_equal(load_manifest(self.manifest)[0]["properties"]["arrange_nodes"], False)
+
+    @nose.tools.raises(NifError)
+    def test_unknown_type(self):
+        self.write_manifest([{"type": "import_egm", "filepath": "head.egm"}])
+        load_manifest(self.manifest)
+
+    def test_order(self):
+        self.write_manifest([{"type": "import_nif", "filepath": name} for name in ("small.nif", "missing.nif", "large.nif")])
+        jobs = load_manifest(self.manifest)
+        nose.tools.assert_equal([get_job_size(job) for job in jobs], [10, 0, 100])
+        # largest jobs are run first, results are in the order of the jobs
+        job_ids = []
+        pool = WorkerPool(1, "blender")
+        pool.start_worker = lambda: FakeWorker(job_ids)
+        results = pool.run(jobs)
+        nose.tools.assert_equal(job_ids, ["2", "0", "1"])
+        nose.tools.assert_equal([result["id"] for result in results], ["0", "1", "2"])
+        nose.tools.assert_equal(pool.take_job(), None)
+
+    def test_timeout(self):
+        self.write_manifest([{"type": "import_nif", "filepath": "small.nif"}])
+        workers = []
+        pool = WorkerPool(1, "blender", timeout=0.01)
+        pool.start_worker = lambda: workers.append(FakeWorker([], hang=True)) or workers[-1]
+        [result] = pool.run(load_manifest(self.manifest))
+        nose.tools.assert_equal(result["status"], "failed")
+        nose.tools.assert_true("timed out" in result["errors"][0])
+        nose.tools.assert_true(workers[0].killed.is_set())
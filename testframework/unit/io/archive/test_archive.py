@@ -0,0 +1,175 @@
+"""Unit testing reading files from bsa and ba2 archives"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+import nose
+
+from io_scene_nif.io.archive import Archives, BlobCache, get_dds_header, open_archive
+from io_scene_nif.io.nif import NifFile
+
+NIF_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "nif", "readable.nif")
+
+
+def write_bsa(filepath, files, compressed=False, embedded_names=False):
+    """Write a version 104 bsa archive, from a dict of backslash separated paths to contents."""
+    folders = {}
+    for path, data in sorted(files.items()):
+        folder, name = path.rsplit('\\', 1)
+        folders.setdefault(folder, []).append((name, data))
+    flags = 0x1 | 0x2 | (0x4 if compressed else 0) | (0x100 if embedded_names else 0)
+    folder_names_length = sum(len(folder) + 1 for folder in folders)
+    file_names = b''.join(name.encode() + b'\x00' for folder_files in folders.values() for name, data in folder_files)
+    header = struct.pack('<4sIIIIIIIHH', b'BSA\x00', 104, 36, flags, len(folders), len(files),
+                         folder_names_length, len(file_names), 0, 0)
+
+    data_offset = 36 + 16 * len(folders) + sum(1 + len(folder) + 1 for folder in folders) + 16 * len(files) + len(file_names)
+    folder_records, file_records, blobs = b'', b'', b''
+    for folder, folder_files in folders.items():
+        folder_records += struct.pack('<QII', 0, len(folder_files), 0)
+        file_records += struct.pack('<B', len(folder) + 1) + folder.encode() + b'\x00'
+        for name, data in folder_files:
+            blob = b''
+            if embedded_names:
+                full_name = (folder + '\\' + name).encode()
+                blob += struct.pack('<B', len(full_name)) + full_name
+            blob += struct.pack('<I', len(data)) + zlib.compress(data) if compressed else data
+            file_records += struct.pack('<QII', 0, len(blob), data_offset + len(blobs))
+            blobs += blob
+    with open(filepath, "wb") as stream:
+        stream.write(header + folder_records + file_records + file_names + blobs)
+
+
+def write_ba2(filepath, files):
+    """Write a general version 1 ba2 archive, from a dict of paths to contents, compressing every other file."""
+    records, blobs, names = b'', b'', b''
+    data_offset = 24 + 36 * len(files)
+    for i, (path, data) in enumerate(sorted(files.items())):
+        blob = zlib.compress(data) if i % 2 else data
+        records += struct.pack('<I4sIIQIII', 0, b'', 0, 0, data_offset + len(blobs), len(blob) if i % 2 else 0, len(data), 0xBAADF00D)
+        blobs += blob
+        names += struct.pack('<H', len(path)) + path.encode()
+    header = struct.pack('<4sI4sIQ', b'BTDX', 1, b'GNRL', len(files), data_offset + len(blobs))
+    with open(filepath, "wb") as stream:
+        stream.write(header + records + blobs + names)
+
+
+class TestArchive:
+
+    def setup(self):
+        self.data_dir = tempfile.mkdtemp()
+        with open(NIF_PATH, "rb") as nif_file:
+            self.nif_data = nif_file.read()
+        self.texture_data = b'texture' * 100
+
+    def teardown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_bsa(self):
+        files = {"meshes\\Chair.nif": self.nif_data, "textures\\furniture\\chair.dds": self.texture_data}
+        for compressed in (False, True):
+            for embedded_names in (False, True):
+                filepath = os.path.join(self.data_dir, "test.bsa")
+                write_bsa(filepath, files, compressed, embedded_names)
+                archive = open_archive(filepath)
+                # lookup ignores case and separators
+                nose.tools.assert_true("MESHES/chair.nif" in archive)
+                nose.tools.assert_false("meshes/table.nif" in archive)
+                nose.tools.assert_equal(archive.read("meshes\\chair.nif"), self.nif_data)
+                nose.tools.assert_equal(archive.read("Textures/Furniture/Chair.dds"), self.texture_data)
+
+    def test_ba2(self):
+        filepath = os.path.join(self.data_dir, "test.ba2")
+        write_ba2(filepath, {"Meshes/Chair.nif": self.nif_data, "Textures/Chair.dds": self.texture_data})
+        archive = open_archive(filepath)
+        nose.tools.assert_equal(len(archive), 2)
+        nose.tools.assert_equal(archive.read("meshes/chair.nif"), self.nif_data)
+        nose.tools.assert_equal(archive.read("textures/chair.dds"), self.texture_data)
+
+    def test_dds_header(self):
+        # dxt5 compressed, 256 by 128 pixels with 9 mipmaps
+        header = get_dds_header(256, 128, 9, 77)
+        nose.tools.assert_equal(len(header), 128)
+        nose.tools.assert_equal(struct.unpack('<4sII', header[:12])[0], b'DDS ')
+        nose.tools.assert_equal(struct.unpack('<III', header[12:24]), (128, 256, 64 * 32 * 16))
+        nose.tools.assert_equal(header[84:88], b'DXT5')
+        # bc7 has no legacy code, so needs the extended header
+        nose.tools.assert_equal(len(get_dds_header(256, 128, 9, 98)), 148)
+
+    def test_blob_cache(self):
+        blobs = BlobCache(max_bytes=10)
+        blobs.put("a", b'aaaa')
+        blobs.put("b", b'bbbb')
+        nose.tools.assert_equal(blobs.get("a"), b'aaaa')
+        # b is now the least recently used
+        blobs.put("c", b'cccc')
+        nose.tools.assert_equal(blobs.get("b"), None)
+        nose.tools.assert_equal(blobs.get("a"), b'aaaa')
+        nose.tools.assert_equal(blobs.num_bytes, 8)
+        # blobs larger than the cache are not kept
+        blobs.put("d", b'd' * 11)
+        nose.tools.assert_equal(blobs.get("d"), None)
+
+    def test_archives(self):
+        write_bsa(os.path.join(self.data_dir, "Test - Meshes.bsa"), {"meshes\\chair.nif": self.nif_data}, compressed=True)
+        write_ba2(os.path.join(self.data_dir, "Test - Textures.ba2"), {"textures/chair.dds": self.texture_data})
+        archives = Archives()
+        nif_path = os.path.join(self.data_dir, "Test - Meshes.bsa", "meshes", "chair.nif")
+        nose.tools.assert_equal(archives.get_data_dir(nif_path), self.data_dir)
+        nose.tools.assert_equal(archives.get_data_dir(os.path.join(self.data_dir, "Meshes", "chair.nif")), self.data_dir)
+        # only the candidates that are in an archive are found, in order
+        [(archive, path)] = archives.find(self.data_dir, ["textures\\table.dds", "textures\\chair.dds"])
+        nose.tools.assert_equal(os.path.basename(archive.filepath), "Test - Textures.ba2")
+        nose.tools.assert_equal(archives.read(archive, path), self.texture_data)
+        # the archives are listed once per import
+        write_ba2(os.path.join(self.data_dir, "Test - More.ba2"), {"textures/table.dds": self.texture_data})
+        nose.tools.assert_equal(archives.find(self.data_dir, ["textures\\table.dds"]), [])
+        archives.invalidate()
+        nose.tools.assert_equal(len(archives.find(self.data_dir, ["textures\\table.dds"])), 1)
+        with archives.open(nif_path) as stream:
+            nose.tools.assert_equal(stream.read(), self.nif_data)
+
+    def test_load_nif(self):
+        write_bsa(os.path.join(self.data_dir, "Test - Meshes.bsa"), {"meshes\\chair.nif": self.nif_data}, compressed=True)
+        data = NifFile.load_nif(os.path.join(self.data_dir, "Test - Meshes.bsa", "meshes", "chair.nif"))
+        nose.tools.assert_equal(data.version, 335544325)
@@ -41,6 +41,9 @@ import os
 
 import nose
 from nose.tools import nottest, raises
+import numpy as np
+
+from pyffi.formats.egm import EgmFormat
 
 from io_scene_nif.io.egm import EGMFile
 
@@ -63,3 +66,19 @@ class TestEGMIO:
     @raises(Exception)
     def test_load_unsupported_file(self):
         EGMFile.load_egm(self.working_dir + os.sep + "notegm.txt")
+
+    def test_relative_vertices_round_trip(self):
+        data = EgmFormat.Data(num_vertices=3)
+        morph = data.add_sym_morph()
+        relative_vertices = np.array([(0.5, -1.0, 0.25), (0.0, 0.0, 0.0), (-0.75, 0.125, 1.0)], dtype=np.float32)
+        EGMFile.set_relative_vertices(morph, relative_vertices)
+        nose.tools.assert_true(np.allclose(EGMFile.get_relative_vertices(morph), relative_vertices, atol=1e-4))
+        # decoding must agree with pyffi
+        nose.tools.assert_true(np.allclose(EGMFile.get_relative_vertices(morph), list(morph.get_relative_vertices())))
+
+    def test_zero_relative_vertices(self):
+        data = EgmFormat.Data(num_vertices=2)
+        morph = data.add_asym_morph()
+        EGMFile.set_relative_vertices(morph, np.zeros((2, 3)))
+        nose.tools.assert_equal(morph.scale, 0.0)
+        nose.tools.assert_true(not EGMFile.get_relative_vertices(morph).any())
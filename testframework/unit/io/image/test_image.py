@@ -0,0 +1,79 @@
+"""Unit testing reading the headers of dds, tga and png images"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import struct
+import zlib
+
+import nose
+
+from io_scene_nif.io.archive import get_dds_header
+from io_scene_nif.io.image import ImageInfo, read_image_info
+
+
+def get_png_header(width, height, bit_depth, color_type):
+    ihdr = b'IHDR' + struct.pack('>IIBBBBB', width, height, bit_depth, color_type, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + ihdr + struct.pack('>I', zlib.crc32(ihdr))
+
+
+class TestImageInfo:
+
+    def test_dds(self):
+        nose.tools.assert_equal(read_image_info(get_dds_header(256, 128, 9, 77), '.dds'), ImageInfo(256, 128, "DXT5", 9, True))
+        nose.tools.assert_equal(read_image_info(get_dds_header(64, 64, 1, 71), '.DDS'), ImageInfo(64, 64, "DXT1", 1, False))
+        nose.tools.assert_equal(read_image_info(get_dds_header(16, 16, 5, 87), '.dds'), ImageInfo(16, 16, "RGBA32", 5, True))
+        nose.tools.assert_equal(read_image_info(get_dds_header(16, 16, 5, 98), '.dds'), ImageInfo(16, 16, "DXGI 98", 5, False))
+
+    def test_tga(self):
+        header = struct.pack('<BBBHHBHHHHBB', 0, 0, 2, 0, 0, 0, 0, 0, 100, 50, 32, 8)
+        nose.tools.assert_equal(read_image_info(header, '.tga'), ImageInfo(100, 50, "TGA32", 1, True))
+
+    def test_png(self):
+        nose.tools.assert_equal(read_image_info(get_png_header(512, 512, 8, 2), '.png'), ImageInfo(512, 512, "PNG8", 1, False))
+        nose.tools.assert_equal(read_image_info(get_png_header(512, 512, 8, 6), '.png'), ImageInfo(512, 512, "PNG8", 1, True))
+
+    def test_broken(self):
+        nose.tools.assert_equal(read_image_info(b'DDS ', '.dds'), None)
+        nose.tools.assert_equal(read_image_info(b'not a png', '.png'), None)
+        nose.tools.assert_equal(read_image_info(get_png_header(1, 1, 8, 2), '.bmp'), None)
+
+    def test_mipmaps(self):
+        info = ImageInfo(256, 64, "DXT1", 9)
+        nose.tools.assert_true(info.is_power_of_two())
+        nose.tools.assert_equal(info.get_full_mipmap_count(), 9)
+        nose.tools.assert_false(ImageInfo(100, 64, "DXT1").is_power_of_two())
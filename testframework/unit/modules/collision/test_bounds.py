@@ -0,0 +1,82 @@
+"""Unit testing the bounds used by the collision and bounds exporters"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+
+from io_scene_nif.modules.nif_export.collision.bounds import Bounds
+
+
+def rotation(angle):
+    cos, sin = np.cos(angle), np.sin(angle)
+    return np.array(((cos, sin, 0), (-sin, cos, 0), (0, 0, 1)))
+
+
+def box(half_extents, axes, center):
+    corners = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]) * half_extents
+    return corners @ axes + center
+
+
+class TestBounds:
+
+    def test_aabb(self):
+        bounds = Bounds([(0, 0, 0), (1, 2, 3), (-1, 1, 0)])
+        nose.tools.assert_equal(bounds.extents, [[-1, 1], [0, 2], [0, 3]])
+        nose.tools.assert_true(np.allclose(bounds.center, (0, 1, 1.5)))
+        center, radius = bounds.sphere
+        nose.tools.assert_almost_equal(radius, np.sqrt(1 + 1 + 1.5 ** 2))
+
+    def test_minimal_obb(self):
+        axes = rotation(0.3)
+        points = box((3, 1, 0.5), axes, (1, 2, 3))
+        # points inside the box do not change it
+        points = np.concatenate((points, np.random.RandomState(0).uniform(-0.4, 0.4, (50, 3)) @ axes + (1, 2, 3)))
+        bounds = Bounds(points)
+        center, obb_axes, half_extents = bounds.get_obb()
+        nose.tools.assert_true(np.allclose(center, (1, 2, 3)))
+        nose.tools.assert_true(np.allclose(sorted(half_extents), (0.5, 1, 3)))
+        nose.tools.assert_almost_equal(np.linalg.det(obb_axes), 1.0)
+        # the axis aligned box of the rotated box is larger
+        nose.tools.assert_true(np.prod(bounds.half_extents) > np.prod(half_extents) + 0.1)
+
+    def test_flat_obb(self):
+        # a flat mesh has no hull, so its box falls back on the principal axes
+        points = box((3, 1, 0), rotation(0.3), (0, 0, 0))
+        center, axes, half_extents = Bounds(points).get_obb()
+        nose.tools.assert_true(np.allclose(np.abs(axes @ rotation(0.3).T), np.identity(3)))
+        nose.tools.assert_true(np.allclose(half_extents, (3, 1, 0)))
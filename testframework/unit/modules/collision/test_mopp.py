@@ -0,0 +1,117 @@
+"""Unit testing the persistent mopp cache used on export"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import shutil
+import tempfile
+
+import bpy
+import nose
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.modules.nif_export.collision.mopp import MoppCache
+
+
+def create_mopp(offset=0.0):
+    n_mopp = NifFormat.bhkMoppBvTreeShape()
+    n_shape = NifFormat.bhkPackedNiTriStripsShape()
+    n_mopp.shape = n_shape
+    n_shape.add_shape(triangles=[(0, 1, 2), (2, 1, 3)],
+                      normals=[(0, 0, 1), (0, 0, 1)],
+                      vertices=[(offset, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)],
+                      layer=1, material=0)
+    return n_mopp
+
+
+def create_user_resource(config_dir, create_keyword):
+    """Fake bpy.utils.user_resource, taking only the create keyword of one Blender version."""
+    def user_resource(resource_type, path="", **kwargs):
+        if set(kwargs) != {create_keyword}:
+            raise TypeError("user_resource() got an unexpected keyword argument")
+        return os.path.join(config_dir, path)
+    return user_resource
+
+
+class TestMoppCache:
+
+    def setup(self):
+        handle, self.filepath = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self.config_dir = tempfile.mkdtemp()
+        self.user_resource = bpy.utils.user_resource
+
+    def teardown(self):
+        os.remove(self.filepath)
+        shutil.rmtree(self.config_dir)
+        bpy.utils.user_resource = self.user_resource
+
+    def test_key(self):
+        nose.tools.assert_equal(MoppCache.get_key(create_mopp(), 6.996, False), MoppCache.get_key(create_mopp(), 6.996, False))
+        nose.tools.assert_not_equal(MoppCache.get_key(create_mopp(), 6.996, False), MoppCache.get_key(create_mopp(0.5), 6.996, False))
+        nose.tools.assert_not_equal(MoppCache.get_key(create_mopp(), 6.996, False), MoppCache.get_key(create_mopp(), 69.96, False))
+
+    def test_reuse(self):
+        mopp_cache = MoppCache(self.filepath)
+        n_mopp = create_mopp()
+        nose.tools.assert_false(mopp_cache.update_mopp(n_mopp, 6.996))
+        mopp_cache.save()
+
+        # a new export session reads the cache from disk
+        mopp_cache = MoppCache(self.filepath)
+        n_cached_mopp = create_mopp()
+        nose.tools.assert_true(mopp_cache.update_mopp(n_cached_mopp, 6.996))
+        nose.tools.assert_equal((mopp_cache.hits, mopp_cache.misses), (1, 0))
+        nose.tools.assert_equal(list(n_cached_mopp.mopp_data), list(n_mopp.mopp_data))
+        nose.tools.assert_equal(n_cached_mopp.origin.as_tuple(), n_mopp.origin.as_tuple())
+        nose.tools.assert_equal(n_cached_mopp.scale, n_mopp.scale)
+
+    def test_default_path(self):
+        # blender 2.81 takes autocreate, later versions take create
+        for create_keyword in ("autocreate", "create"):
+            bpy.utils.user_resource = create_user_resource(self.config_dir, create_keyword)
+            mopp_cache = MoppCache()
+            nose.tools.assert_equal(mopp_cache.filepath, os.path.join(self.config_dir, "io_scene_nif", "mopp_cache.json"))
+
+    def test_no_default_path(self):
+        bpy.utils.user_resource = create_user_resource(self.config_dir, "no_such_keyword")
+        # the cache still works for this export, but is not stored
+        mopp_cache = MoppCache()
+        nose.tools.assert_equal(mopp_cache.filepath, None)
+        nose.tools.assert_false(mopp_cache.update_mopp(create_mopp(), 6.996))
+        nose.tools.assert_true(mopp_cache.update_mopp(create_mopp(), 6.996))
+        mopp_cache.save()
@@ -0,0 +1,92 @@
+"""Unit testing the mesh simplifier used on export"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+
+from io_scene_nif.modules.nif_export.geometry.mesh import simplify
+
+
+def grid(size):
+    vertices = [(i, j, 0.0) for j in range(size + 1) for i in range(size + 1)]
+    triangles = []
+    for j in range(size):
+        for i in range(size):
+            a = j * (size + 1) + i
+            triangles += [(a, a + 1, a + size + 1), (a + 1, a + size + 2, a + size + 1)]
+    return np.array(vertices, dtype=float), np.array(triangles)
+
+
+def normals(vertices, triangles):
+    corners = vertices[triangles]
+    return np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+
+
+class TestSimplify:
+
+    def test_locked_vertices(self):
+        vertices, triangles = grid(2)
+        # only the center vertex is not on the border
+        nose.tools.assert_equal(np.flatnonzero(~simplify.get_locked_vertices(triangles, 9)).tolist(), [4])
+        # unless the triangles around it belong to different parts
+        part_map = [0, 0, 0, 0, 1, 1, 1, 1]
+        nose.tools.assert_true(simplify.get_locked_vertices(triangles, 9, part_map).all())
+
+    def test_simplify_plane(self):
+        vertices, triangles = grid(10)
+        locked = simplify.get_locked_vertices(triangles, len(vertices))
+        new_triangles, triangle_indices = simplify.Simplifier(vertices, triangles, locked).simplify(50)
+        nose.tools.assert_true(len(new_triangles) <= 50)
+        nose.tools.assert_equal(len(new_triangles), len(triangle_indices))
+        # the border is kept, so the area is unchanged and no triangle flipped
+        new_normals = normals(vertices, new_triangles)
+        nose.tools.assert_almost_equal(new_normals[:, 2].sum() / 2, 100.0)
+        nose.tools.assert_true((new_normals[:, 2] > 0).all())
+        nose.tools.assert_true(set(np.flatnonzero(locked).tolist()) <= set(new_triangles.ravel().tolist()))
+
+    def test_simplify_attributes(self):
+        vertices, triangles = grid(2)
+        locked = simplify.get_locked_vertices(triangles, len(vertices))
+        # without attributes, the center vertex is collapsed onto one of its neighbours
+        new_triangles, triangle_indices = simplify.Simplifier(vertices, triangles, locked).simplify(0)
+        nose.tools.assert_equal(len(new_triangles), 6)
+        # a vertex is not collapsed onto neighbours with different weights
+        attributes = np.zeros((len(vertices), 1))
+        attributes[4] = 1.0
+        new_triangles, triangle_indices = simplify.Simplifier(vertices, triangles, locked, attributes).simplify(0)
+        nose.tools.assert_equal(len(new_triangles), 8)
@@ -0,0 +1,84 @@
+"""Unit testing the skin partition builder used on export"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+
+from io_scene_nif.modules.nif_export.geometry.mesh import skin_partition
+
+
+class TestSkinPartition:
+
+    def test_truncate_weights(self):
+        bones = np.array([[0, 1, 2], [3, -1, -1]])
+        weights = np.array([[0.2, 0.5, 0.3], [1.0, 0.0, 0.0]])
+        bones, weights, lost_weight = skin_partition.truncate_weights(bones, weights, 2)
+        nose.tools.assert_equal(bones.tolist(), [[1, 2], [3, -1]])
+        nose.tools.assert_true(np.allclose(weights, [[0.625, 0.375], [1.0, 0.0]]))
+        nose.tools.assert_equal(lost_weight, 0.2)
+
+    def test_limit_triangle_bones(self):
+        bones = np.array([[0, 1], [1, -1], [2, -1]])
+        weights = np.array([[0.9, 0.1], [1.0, 0.0], [1.0, 0.0]])
+        triangles = np.array([[0, 1, 2]])
+        lost_weight = skin_partition.limit_triangle_bones(triangles, bones, weights, 2)
+        # bone 0 is the least influential bone that is not the only bone of a vertex
+        nose.tools.assert_equal(skin_partition.count_triangle_bones(triangles, bones).tolist(), [2])
+        nose.tools.assert_equal(bones[0].tolist(), [-1, 1])
+        nose.tools.assert_equal(lost_weight, 0.9)
+
+    def test_build_partitions(self):
+        # a strip of triangles whose bones slide along the strip, split over two body parts
+        num_verts = 200
+        bones = np.column_stack((np.arange(num_verts) // 10, np.arange(num_verts) // 10 + 1))
+        triangles = np.array([(i, i + 1, i + 2) for i in range(num_verts - 2)])
+        part_map = np.zeros(len(triangles), dtype=np.int64)
+        part_map[len(triangles) // 2:] = 1
+        parts = skin_partition.build_partitions(triangles, bones, part_map, 8)
+
+        covered = np.sort(np.concatenate([tri_indices for part_bones, part_index, tri_indices in parts]))
+        nose.tools.assert_equal(covered.tolist(), list(range(len(triangles))))
+        for part_bones, part_index, tri_indices in parts:
+            nose.tools.assert_true(len(part_bones) <= 8)
+            nose.tools.assert_true(set(bones[triangles[tri_indices]].ravel().tolist()) <= set(part_bones))
+            nose.tools.assert_true((part_map[tri_indices] == part_index).all())
+
+    def test_get_local_indices(self):
+        vertex_map, local = skin_partition.get_local_indices(np.array([[5, 3, 5], [3, 9, 1]]))
+        nose.tools.assert_equal(vertex_map.tolist(), [5, 3, 9, 1])
+        nose.tools.assert_equal(local.tolist(), [0, 1, 0, 1, 2, 3])
@@ -0,0 +1,81 @@
+"""Unit testing the linear blend skinning kernel used by the skin deformation import option"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+
+from io_scene_nif.utils import util_math
+
+
+class TestLinearBlendSkin:
+
+    @classmethod
+    def setup_class(cls):
+        cls.vertices = np.array([(1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0)])
+        cls.normals = np.array([(1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0)])
+
+        # bone 0 is a translation, bone 1 a 90 degree rotation about z (row vector convention)
+        translate = np.identity(4)
+        translate[3, :3] = (0.0, 0.0, 2.0)
+        rotate = np.identity(4)
+        rotate[:3, :3] = ((0.0, 1.0, 0.0), (-1.0, 0.0, 0.0), (0.0, 0.0, 1.0))
+        cls.transforms = np.array([translate, rotate])
+        cls.rotations = cls.transforms[:, :3, :3].copy()
+
+    def test_single_bone(self):
+        vert_indices = np.array([0, 1, 2])
+        bone_indices = np.array([1, 1, 1])
+        weights = np.array([1.0, 1.0, 1.0])
+        vertices, normals, sum_weights = util_math.linear_blend_skin(self.vertices, self.transforms, vert_indices, bone_indices,
+                                                                     weights, self.normals, self.rotations)
+        nose.tools.assert_true(np.allclose(vertices, [(0.0, 1.0, 0.0), (-1.0, 0.0, 0.0), (0.0, 0.0, 1.0)]))
+        nose.tools.assert_true(np.allclose(normals, vertices))
+        nose.tools.assert_true(np.allclose(sum_weights, 1.0))
+
+    def test_blended_bones(self):
+        vert_indices = np.array([0, 0, 2])
+        bone_indices = np.array([0, 1, 0])
+        weights = np.array([0.5, 0.5, 1.0])
+        vertices, normals, sum_weights = util_math.linear_blend_skin(self.vertices, self.transforms, vert_indices, bone_indices,
+                                                                     weights)
+        nose.tools.assert_true(normals is None)
+        nose.tools.assert_true(np.allclose(vertices[0], (0.5, 0.5, 1.0)))
+        nose.tools.assert_true(np.allclose(vertices[2], (0.0, 0.0, 3.0)))
+        # unweighted vertices end up at the origin, as with pyffi's get_skin_deformation
+        nose.tools.assert_true(np.allclose(vertices[1], 0.0))
+        nose.tools.assert_true(np.allclose(sum_weights, (1.0, 0.0, 1.0)))
@@ -0,0 +1,121 @@
+"""Unit testing the tangent space generator used on export"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.modules.nif_export.geometry.mesh import tangent_space
+
+
+def grid(size):
+    """A wavy grid of (size + 1) x (size + 1) vertices, with uvs following x and y."""
+    x, y = np.meshgrid(np.linspace(0.0, 1.0, size + 1), np.linspace(0.0, 1.0, size + 1))
+    vertices = np.column_stack((x.ravel(), y.ravel(), 0.1 * np.sin(4 * x.ravel()) * np.cos(3 * y.ravel())))
+    normals = np.column_stack((-0.4 * np.cos(4 * x.ravel()) * np.cos(3 * y.ravel()),
+                               0.3 * np.sin(4 * x.ravel()) * np.sin(3 * y.ravel()),
+                               np.ones(len(vertices))))
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    uvs = np.column_stack((x.ravel(), y.ravel()))
+    triangles = []
+    for j in range(size):
+        for i in range(size):
+            a = j * (size + 1) + i
+            triangles += [(a, a + 1, a + size + 1), (a + 1, a + size + 2, a + size + 1)]
+    return vertices, normals, uvs, np.array(triangles)
+
+
+def get_pyffi_tangent_space(vertices, normals, uvs, triangles):
+    n_geom = NifFormat.NiTriShape()
+    n_geom.data = NifFormat.NiTriShapeData()
+    n_data = n_geom.data
+    n_data.num_vertices = len(vertices)
+    n_data.has_vertices = True
+    n_data.has_normals = True
+    n_data.num_uv_sets = 1
+    n_data.has_uv = True
+    n_data.vertices.update_size()
+    n_data.normals.update_size()
+    n_data.uv_sets.update_size()
+    for n_vert, n_norm, n_uv, vert, norm, uv in zip(n_data.vertices, n_data.normals, n_data.uv_sets[0], vertices, normals, uvs):
+        n_vert.x, n_vert.y, n_vert.z = vert
+        n_norm.x, n_norm.y, n_norm.z = norm
+        n_uv.u, n_uv.v = uv
+    n_data.set_triangles(triangles.tolist())
+    n_geom.update_tangent_space(as_extra=False)
+    return ([(vec.x, vec.y, vec.z) for vec in n_data.tangents],
+            [(vec.x, vec.y, vec.z) for vec in n_data.bitangents])
+
+
+class TestTangentSpace:
+
+    def test_flat(self):
+        vertices = np.array([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (1.0, 1.0, 0.0)])
+        normals = np.tile((0.0, 0.0, 1.0), (4, 1))
+        uvs = vertices[:, :2]
+        triangles = np.array([(0, 1, 2), (1, 3, 2)])
+        for mikktspace in (False, True):
+            tangents, bitangents = tangent_space.calculate_tangent_space(vertices, normals, uvs, triangles, mikktspace)
+            nose.tools.assert_true(np.allclose(tangents, (0.0, 1.0, 0.0)))
+            nose.tools.assert_true(np.allclose(bitangents, (1.0, 0.0, 0.0)))
+
+    def test_degenerate(self):
+        # a triangle without uv area gets an arbitrary base around its normal
+        vertices = np.array([(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 1.0, 0.0)])
+        normals = np.tile((0.0, 0.0, 1.0), (3, 1))
+        uvs = np.zeros((3, 2))
+        tangents, bitangents = tangent_space.calculate_tangent_space(vertices, normals, uvs, np.array([(0, 1, 2)]))
+        nose.tools.assert_true(np.allclose(np.linalg.norm(tangents, axis=1), 1.0))
+        nose.tools.assert_true(np.allclose(np.einsum('ij,ij->i', tangents, bitangents), 0.0))
+        nose.tools.assert_true(np.allclose(np.einsum('ij,ij->i', tangents, normals), 0.0))
+
+    def test_pyffi(self):
+        vertices, normals, uvs, triangles = grid(8)
+        tangents, bitangents = tangent_space.calculate_tangent_space(vertices, normals, uvs, triangles)
+        n_tangents, n_bitangents = get_pyffi_tangent_space(vertices, normals, uvs, triangles)
+        nose.tools.assert_true(np.allclose(tangents, n_tangents, atol=1e-5))
+        nose.tools.assert_true(np.allclose(bitangents, n_bitangents, atol=1e-5))
+
+    def test_mikktspace_orthonormal(self):
+        vertices, normals, uvs, triangles = grid(8)
+        tangents, bitangents = tangent_space.calculate_tangent_space(vertices, normals, uvs, triangles, mikktspace=True)
+        nose.tools.assert_true(np.allclose(np.einsum('ij,ij->i', tangents, bitangents), 0.0))
+        nose.tools.assert_true(np.allclose(np.einsum('ij,ij->i', tangents, normals), 0.0))
+        nose.tools.assert_true(np.allclose(np.einsum('ij,ij->i', bitangents, normals), 0.0))
+        # right handed, as the uvs are not mirrored
+        nose.tools.assert_true((np.einsum('ij,ij->i', np.cross(normals, bitangents), tangents) > 0).all())
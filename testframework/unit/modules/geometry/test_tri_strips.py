@@ -0,0 +1,97 @@
+"""Unit testing the stripifier used on export"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+import pyffi.utils.tristrip
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.modules.nif_export.geometry.mesh import tri_strips
+
+
+def grid(size):
+    triangles = []
+    for j in range(size):
+        for i in range(size):
+            a = j * (size + 1) + i
+            triangles += [(a, a + 1, a + size + 1), (a + 1, a + size + 2, a + size + 1)]
+    return np.array(triangles)
+
+
+def oriented(triangles):
+    """The set of non degenerate triangles, each rotated to start at its lowest vertex, so winding is preserved."""
+    result = set()
+    for triangle in triangles:
+        if len(set(triangle)) < 3:
+            continue
+        i = triangle.index(min(triangle))
+        result.add(tuple(triangle[i:]) + tuple(triangle[:i]))
+    return result
+
+
+class TestTriStrips:
+
+    def test_neighbours(self):
+        neighbours, neighbour_edges = tri_strips.get_neighbours(np.array([(0, 1, 2), (2, 1, 3)]))
+        nose.tools.assert_equal(neighbours.tolist(), [[-1, 1, -1], [0, -1, -1]])
+        nose.tools.assert_equal(neighbour_edges[0, 1], 0)
+
+    def test_stitch_strips(self):
+        # an odd strip needs an extra stitch vertex to keep the winding of the next strip
+        nose.tools.assert_equal(tri_strips.stitch_strips([[0, 1, 2], [3, 4, 5]]), [0, 1, 2, 2, 2, 3, 3, 4, 5])
+        nose.tools.assert_equal(tri_strips.stitch_strips([[0, 1, 2, 3], [4, 5, 6]]), [0, 1, 2, 3, 3, 4, 4, 5, 6])
+
+    def test_stripify(self):
+        rng = np.random.RandomState(0)
+        for triangles in (grid(10), grid(10)[rng.permutation(200)], rng.randint(0, 30, (100, 3))):
+            for stitch in (False, True):
+                strips = tri_strips.stripify(triangles, stitch)
+                nose.tools.assert_equal(oriented(pyffi.utils.tristrip.triangulate(strips)), oriented(triangles.tolist()))
+                if stitch:
+                    nose.tools.assert_equal(len(strips), 1)
+
+    def test_grid_strips(self):
+        # each row of a grid is a single strip
+        nose.tools.assert_equal(len(tri_strips.stripify(grid(10))), 10)
+
+    def test_set_triangles(self):
+        n_data = NifFormat.NiTriStripsData()
+        triangles = grid(3).tolist()
+        tri_strips.set_triangles(n_data, triangles, stitch=True)
+        nose.tools.assert_equal(n_data.num_strips, 1)
+        nose.tools.assert_equal(oriented(n_data.get_triangles()), oriented(triangles))
@@ -0,0 +1,74 @@
+"""Unit testing the vertex cache optimizer used on export"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+
+from io_scene_nif.modules.nif_export.geometry.mesh import vertex_cache
+
+
+def shuffled_grid(size):
+    triangles = []
+    for j in range(size):
+        for i in range(size):
+            a = j * (size + 1) + i
+            triangles += [(a, a + 1, a + size + 1), (a + 1, a + size + 2, a + size + 1)]
+    return np.array(triangles)[np.random.RandomState(0).permutation(len(triangles))], (size + 1) ** 2
+
+
+class TestVertexCache:
+
+    def test_acmr(self):
+        nose.tools.assert_equal(vertex_cache.get_acmr([(0, 1, 2)]), 3.0)
+        nose.tools.assert_equal(vertex_cache.get_acmr([(0, 1, 2), (2, 1, 3)]), 2.0)
+        # with a cache of 3 vertices, vertex 0 is evicted before it is used again
+        triangles = [(0, 1, 2), (2, 1, 3), (0, 3, 4)]
+        nose.tools.assert_equal(vertex_cache.get_acmr(triangles), 5 / 3)
+        nose.tools.assert_equal(vertex_cache.get_acmr(triangles, cache_size=3), 2.0)
+
+    def test_fetch_order(self):
+        nose.tools.assert_equal(vertex_cache.get_fetch_optimized_vertex_order([(3, 1, 4), (1, 0, 3)], 6), [3, 1, 4, 0, 2, 5])
+
+    def test_optimize_vertex_cache(self):
+        triangles, num_vertices = shuffled_grid(20)
+        triangle_order, vertex_order, new_triangles = vertex_cache.optimize_vertex_cache(triangles, num_vertices, 16)
+        nose.tools.assert_equal(sorted(triangle_order), list(range(len(triangles))))
+        nose.tools.assert_equal(sorted(vertex_order), list(range(num_vertices)))
+        # the remapped triangles refer to the same vertices, with the same winding
+        nose.tools.assert_true((np.array(vertex_order)[new_triangles] == triangles[triangle_order]).all())
+        nose.tools.assert_true(vertex_cache.get_acmr(new_triangles, 16) < 0.5 * vertex_cache.get_acmr(triangles, 16))
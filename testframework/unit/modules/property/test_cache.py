@@ -0,0 +1,123 @@
+"""Unit testing the cache of imported images and materials"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import os
+
+import bpy
+import nose
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.modules.nif_import.property.cache import ImportCache, get_image_key, get_material_hash
+
+
+class TestImportCache:
+
+    def setup(self):
+        self.import_cache = ImportCache()
+        self.b_image = bpy.data.images.new("test_image", 1, 1)
+        self.b_mat = bpy.data.materials.new("test_material")
+
+    def teardown(self):
+        for b_image in list(bpy.data.images):
+            if b_image.name.startswith("test_"):
+                bpy.data.images.remove(b_image)
+        for b_mat in list(bpy.data.materials):
+            if b_mat.name.startswith("test_"):
+                bpy.data.materials.remove(b_mat)
+
+    def test_image_key(self):
+        nose.tools.assert_equal(get_image_key(os.path.join("textures", "a.dds")),
+                                get_image_key(os.path.join("textures", "b", os.pardir, "a.dds")))
+
+    def test_reuse(self):
+        self.import_cache.add_image("a.dds", self.b_image)
+        self.import_cache.add_material(("key",), self.b_mat)
+        self.import_cache.begin_import()
+        nose.tools.assert_equal(self.import_cache.get_image("a.dds"), self.b_image)
+        nose.tools.assert_equal(self.import_cache.get_material(("key",)), self.b_mat)
+        nose.tools.assert_equal(self.import_cache.get_material(("other key",)), None)
+
+    def test_removed(self):
+        self.import_cache.add_image("a.dds", self.b_image)
+        self.import_cache.add_material(("key",), self.b_mat)
+        bpy.data.images.remove(self.b_image)
+        bpy.data.materials.remove(self.b_mat)
+        nose.tools.assert_equal(self.import_cache.get_image("a.dds"), None)
+        nose.tools.assert_equal(self.import_cache.get_material(("key",)), None)
+        nose.tools.assert_equal(self.import_cache.images, {})
+
+    def test_missing(self):
+        # stub images are shared within one import only, so missing textures are searched for again
+        self.import_cache.add_image("missing.dds", self.b_image, missing=True)
+        nose.tools.assert_equal(self.import_cache.get_image("missing.dds"), self.b_image)
+        self.import_cache.begin_import()
+        nose.tools.assert_equal(self.import_cache.get_image("missing.dds"), None)
+
+
+class TestMaterialHash:
+
+    @staticmethod
+    def get_properties(name, diffuse, texture_path):
+        n_mat_prop = NifFormat.NiMaterialProperty()
+        n_mat_prop.name = name
+        n_mat_prop.diffuse_color.r = diffuse
+        n_source = NifFormat.NiSourceTexture()
+        n_source.file_name = texture_path
+        n_texturing = NifFormat.NiTexturingProperty()
+        n_texturing.has_base_texture = True
+        n_texturing.base_texture.source = n_source
+        n_alpha = NifFormat.NiAlphaProperty()
+        n_alpha.flags = 4845
+        return [n_mat_prop, n_texturing, n_alpha]
+
+    def test_identical(self):
+        # names, case and separators of texture paths, and order do not matter
+        props_1 = self.get_properties(b'Wall', 0.5, b'textures\\wall.dds')
+        props_2 = self.get_properties(b'Other', 0.5, b'Textures/Wall.DDS')
+        nose.tools.assert_equal(get_material_hash(props_1), get_material_hash(props_2[::-1]))
+
+    def test_different(self):
+        props = self.get_properties(b'Wall', 0.5, b'textures\\wall.dds')
+        nose.tools.assert_not_equal(get_material_hash(props),
+                                    get_material_hash(self.get_properties(b'Wall', 1.0, b'textures\\wall.dds')))
+        nose.tools.assert_not_equal(get_material_hash(props),
+                                    get_material_hash(self.get_properties(b'Wall', 0.5, b'textures\\floor.dds')))
+        props[2].flags = 237
+        nose.tools.assert_not_equal(get_material_hash(props),
+                                    get_material_hash(self.get_properties(b'Wall', 0.5, b'textures\\wall.dds')))
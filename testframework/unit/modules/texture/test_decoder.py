@@ -0,0 +1,106 @@
+"""Unit testing the decoder of textures embedded in nifs"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import struct
+
+import nose
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.modules.nif_import.property.texture import decoder
+
+
+def create_pixel_data(pixel_format, width, height, data):
+    n_pixel_data = NifFormat.NiPixelData()
+    n_pixel_data.pixel_format = pixel_format
+    n_pixel_data.num_mipmaps = 1
+    n_pixel_data.mipmaps.update_size()
+    n_pixel_data.mipmaps[0].width = width
+    n_pixel_data.mipmaps[0].height = height
+    n_pixel_data.num_pixels = len(data)
+    n_pixel_data.num_faces = 1
+    n_pixel_data.pixel_data.update_size()
+    for i, value in enumerate(data):
+        n_pixel_data.pixel_data[0][i] = value
+    return n_pixel_data
+
+
+class TestDecoder:
+
+    def test_rgba(self):
+        n_pixel_data = create_pixel_data(NifFormat.PixelFormat.PX_FMT_RGBA8, 2, 1, bytes([1, 2, 3, 4, 5, 6, 7, 8]))
+        n_pixel_data.bytes_per_pixel = 4
+        pixels = decoder.decode(n_pixel_data)
+        nose.tools.assert_equal(pixels.tolist(), [[[1, 2, 3, 4], [5, 6, 7, 8]]])
+
+    def test_rgb_masks(self):
+        # blue in the lowest byte
+        n_pixel_data = create_pixel_data(NifFormat.PixelFormat.PX_FMT_RGB8, 1, 1, bytes([1, 2, 3]))
+        n_pixel_data.bytes_per_pixel = 3
+        n_pixel_data.red_mask = 0xff0000
+        n_pixel_data.green_mask = 0x00ff00
+        n_pixel_data.blue_mask = 0x0000ff
+        nose.tools.assert_equal(decoder.decode(n_pixel_data).tolist(), [[[3, 2, 1, 255]]])
+
+    def test_dxt1(self):
+        # red and blue, with the first row using the colors 0 to 3, the other rows the transparent color
+        block = struct.pack('<HHI', 0x001f, 0xf800, 0b11100100 | 0xffffff00)
+        pixels = decoder.decode(create_pixel_data(NifFormat.PixelFormat.PX_FMT_DXT1, 4, 4, block))
+        nose.tools.assert_equal(pixels.shape, (4, 4, 4))
+        nose.tools.assert_equal(pixels[0].tolist(), [[0, 0, 255, 255], [255, 0, 0, 255], [127, 0, 127, 255], [0, 0, 0, 0]])
+        nose.tools.assert_true((pixels[1:, :, 3] == 0).all())
+
+    def test_dxt5(self):
+        # alpha 255 to 0 in eight steps, first pixel index 0, the others index 1
+        alpha_bits = sum(1 << (3 * i) for i in range(1, 16))
+        block = bytes([255, 0]) + alpha_bits.to_bytes(6, 'little') + struct.pack('<HHI', 0x07e0, 0x07e0, 0)
+        pixels = decoder.decode(create_pixel_data(NifFormat.PixelFormat.PX_FMT_DXT5, 2, 2, block))
+        nose.tools.assert_equal(pixels.shape, (2, 2, 4))
+        nose.tools.assert_equal(pixels[0, 0].tolist(), [0, 255, 0, 255])
+        nose.tools.assert_equal(pixels[1, 1].tolist(), [0, 255, 0, 0])
+
+    @nose.tools.raises(ValueError)
+    def test_truncated(self):
+        decoder.decode(create_pixel_data(NifFormat.PixelFormat.PX_FMT_DXT1, 8, 8, bytes(8)))
+
+    def test_hash(self):
+        n_pixel_data = create_pixel_data(NifFormat.PixelFormat.PX_FMT_DXT1, 4, 4, bytes(8))
+        n_other = create_pixel_data(NifFormat.PixelFormat.PX_FMT_DXT1, 4, 4, bytes(8))
+        nose.tools.assert_equal(decoder.get_texture_hash(n_pixel_data), decoder.get_texture_hash(n_other))
+        n_other.pixel_data[0][0] = 1
+        nose.tools.assert_not_equal(decoder.get_texture_hash(n_pixel_data), decoder.get_texture_hash(n_other))
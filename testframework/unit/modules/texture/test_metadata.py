@@ -0,0 +1,108 @@
+"""Unit testing the texture metadata index used on export"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import os
+import shutil
+import tempfile
+
+import nose
+
+from io_scene_nif.io.archive import get_dds_header
+from io_scene_nif.modules.nif_export.property.texture.metadata import TextureMetadataIndex, split_texture_path
+
+
+class TestTextureMetadataIndex:
+
+    def setup(self):
+        self.root = tempfile.mkdtemp()
+        self.textures = os.path.join(self.root, "Data", "Textures", "Armor")
+        os.makedirs(self.textures)
+        self.write("Iron.dds", get_dds_header(256, 256, 9, 71))
+        self.write("Iron_n.dds", get_dds_header(256, 256, 1, 71))
+        self.write("odd.dds", get_dds_header(100, 64, 7, 71))
+        self.index = TextureMetadataIndex()
+
+    def teardown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        with open(os.path.join(self.textures, name), "wb") as stream:
+            stream.write(data)
+
+    def test_split(self):
+        nose.tools.assert_equal(split_texture_path("C:\\Data\\Textures\\a\\b.dds"), ("C:/Data", "Textures/a/b.dds"))
+        nose.tools.assert_equal(split_texture_path("//textures/b.dds"), ("/", "textures/b.dds"))
+        nose.tools.assert_equal(split_texture_path("/tmp/mytextures/b.dds"), (None, "/tmp/mytextures/b.dds"))
+
+    def test_lookup(self):
+        # lookups ignore case
+        nose.tools.assert_true(self.index.exists(os.path.join(self.textures, "iron.DDS")))
+        nose.tools.assert_false(self.index.exists(os.path.join(self.textures, "iron.png")))
+        nose.tools.assert_equal(self.index.get_info(os.path.join(self.textures, "iron.dds")).num_mipmaps, 9)
+
+    def test_validate(self):
+        nose.tools.assert_true(self.index.validate(os.path.join(self.textures, "Iron.dds")))
+        nose.tools.assert_false(self.index.validate(os.path.join(self.textures, "Iron_n.dds")))
+        nose.tools.assert_false(self.index.validate(os.path.join(self.textures, "odd.dds")))
+        nose.tools.assert_false(self.index.validate(os.path.join(self.textures, "missing.dds")))
+
+    def test_rescan(self):
+        nose.tools.assert_false(self.index.exists(os.path.join(self.textures, "new.dds")))
+        self.write("new.dds", get_dds_header(8, 8, 4, 71))
+        # the root is only scanned once per export
+        nose.tools.assert_false(self.index.exists(os.path.join(self.textures, "new.dds")))
+        self.index.invalidate()
+        nose.tools.assert_true(self.index.exists(os.path.join(self.textures, "new.dds")))
+
+    def test_rescan_changed(self):
+        weapons = os.path.join(self.root, "Data", "Textures", "Weapons")
+        os.makedirs(weapons)
+        self.index.exists(os.path.join(self.textures, "iron.dds"))
+        self.write("new.dds", get_dds_header(8, 8, 4, 71))
+        self.index.invalidate()
+        # only the directory whose files changed is listed again
+        listed = []
+        scandir = os.scandir
+        os.scandir = lambda path: listed.append(os.path.normpath(path)) or scandir(path)
+        try:
+            nose.tools.assert_true(self.index.exists(os.path.join(self.textures, "new.dds")))
+        finally:
+            os.scandir = scandir
+        nose.tools.assert_equal(listed, [self.textures])
+        nose.tools.assert_equal(self.index.get_info(os.path.join(self.textures, "iron.dds")).num_mipmaps, 9)
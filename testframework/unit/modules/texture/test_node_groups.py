@@ -0,0 +1,80 @@
+"""Unit testing the shared shader node groups used on import"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import bpy
+import nose
+
+from io_scene_nif.modules.nif_import.property.texture.node_groups import NodeGroupLibrary, get_pass_inputs, get_topology
+
+
+class TestNodeGroups:
+
+    def setup(self):
+        self.library = NodeGroupLibrary()
+
+    def teardown(self):
+        for b_group in list(bpy.data.node_groups):
+            if b_group.name.startswith("NifTools"):
+                bpy.data.node_groups.remove(b_group)
+
+    def test_pass_inputs(self):
+        nose.tools.assert_equal(get_pass_inputs(0, "Decal"), ("Base Color", None))
+        nose.tools.assert_equal(get_pass_inputs(1, "Detail"), ("Detail 1 Color", None))
+        nose.tools.assert_equal(get_pass_inputs(2, "Decal"), ("Decal 2 Color", "Decal 2 Alpha"))
+
+    def test_topology(self):
+        topology = get_topology(["Detail", "Decal"], None, True, False, 0)
+        nose.tools.assert_equal(topology, (("Base", "Decal"), False, True, False, False))
+        nose.tools.assert_equal(NodeGroupLibrary.get_name(topology), "NifTools Base+Decal+Alpha")
+        nose.tools.assert_equal(NodeGroupLibrary.get_name(get_topology([], False, False, False, False)), "NifTools Plain")
+
+    def test_build(self):
+        topology = get_topology(["Detail", "Decal"], True, True, True, True)
+        b_group = self.library.get(topology)
+        names = [socket.name for socket in b_group.inputs]
+        nose.tools.assert_equal(names, ["Base Color", "Decal 1 Color", "Decal 1 Alpha", "Normal", "Glow", "Alpha"])
+        nose.tools.assert_equal([socket.name for socket in b_group.outputs], ["Shader"])
+
+    def test_reuse(self):
+        topology = get_topology(["Detail"], False, False, False, False)
+        b_group = self.library.get(topology)
+        nose.tools.assert_equal(self.library.get(topology), b_group)
+        # a new session picks up the group saved in the blend file
+        nose.tools.assert_equal(NodeGroupLibrary().get(topology), b_group)
+        nose.tools.assert_equal(len([g for g in bpy.data.node_groups if g.name.startswith("NifTools")]), 1)
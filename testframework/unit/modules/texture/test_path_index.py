@@ -0,0 +1,116 @@
+"""Unit testing the texture path index used on import"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import shutil
+import tempfile
+
+import bpy
+import nose
+
+from io_scene_nif.modules.nif_import.property.texture.path_index import TexturePathIndices
+
+
+class TestTexturePathIndex:
+
+    def setup(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, "Textures", "Arch"))
+        for filename in ("Wall01.DDS", "wall01.png", "readme.txt"):
+            open(os.path.join(self.root, "Textures", "Arch", filename), "w").close()
+        # outside the root, as writing it would change the root
+        self.index_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.index_dir, "index.json")
+        self.user_resource = bpy.utils.user_resource
+
+    def teardown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(self.index_dir)
+        bpy.utils.user_resource = self.user_resource
+
+    def test_find(self):
+        path_indices = TexturePathIndices(self.index_path)
+        wall_dds, wall_png = (os.path.join(self.root, "Textures", "Arch", filename) for filename in ("Wall01.DDS", "wall01.png"))
+        # case and separators are ignored, other image formats are found too
+        nose.tools.assert_equal(path_indices.find(self.root, "textures\\arch\\WALL01.tga"), [wall_dds, wall_png])
+        nose.tools.assert_equal(path_indices.find(self.root, "Textures/Arch/wall01.png"), [wall_png, wall_dds])
+        # other files are not indexed, but the path as it is is always found
+        readme = os.path.join(self.root, "Textures", "Arch", "readme.txt")
+        nose.tools.assert_equal(path_indices.find(self.root, "Textures/Arch/readme.txt"), [readme])
+        nose.tools.assert_equal(path_indices.find(self.root, "textures/arch/readme.txt"), [])
+        nose.tools.assert_equal(path_indices.find(os.path.join(self.root, "missing"), "wall01.dds"), [])
+
+    def test_find_direct(self):
+        path_indices = TexturePathIndices(self.index_path)
+        wall_dds, wall_png = (os.path.join(self.root, "Textures", "Arch", filename) for filename in ("Wall01.DDS", "wall01.png"))
+        nose.tools.assert_equal(path_indices.find(self.root, "textures\\arch\\WALL01.tga", recursive=False), [wall_dds, wall_png])
+        # files are only found at their path under the folder, and the folder is not indexed
+        nose.tools.assert_equal(path_indices.find(self.root, "wall01.dds", recursive=False), [])
+        nose.tools.assert_is_none(path_indices.indices)
+
+    def test_persistence(self):
+        TexturePathIndices(self.index_path).find(self.root, "wall01.dds")
+        path_indices = TexturePathIndices(self.index_path)
+        path_indices.load()
+        nose.tools.assert_true(path_indices.indices[self.root].is_valid())
+        # adding a file changes the modification time of its directory
+        new_path = os.path.join(self.root, "Textures", "Arch", "new.dds")
+        open(new_path, "w").close()
+        os.utime(os.path.join(self.root, "Textures", "Arch"), (0, 0))
+        nose.tools.assert_false(path_indices.indices[self.root].is_valid())
+        nose.tools.assert_equal(path_indices.find(self.root, "textures/arch/new.dds"), [new_path])
+
+    def test_default_path(self):
+        # blender 2.81 takes autocreate=True
+        def user_resource(resource_type, path="", autocreate=False):
+            if autocreate:
+                os.makedirs(os.path.join(self.index_dir, path), exist_ok=True)
+            return os.path.join(self.index_dir, path)
+        bpy.utils.user_resource = user_resource
+        TexturePathIndices().find(self.root, "wall01.dds")
+        nose.tools.assert_true(os.path.isfile(os.path.join(self.index_dir, "io_scene_nif", "texture_index.json")))
+
+    def test_no_default_path(self):
+        def user_resource(resource_type, path=""):
+            raise TypeError("user_resource() got an unexpected keyword argument")
+        bpy.utils.user_resource = user_resource
+        # the index is kept in memory
+        path_indices = TexturePathIndices()
+        wall_dds = os.path.join(self.root, "Textures", "Arch", "Wall01.DDS")
+        nose.tools.assert_equal(path_indices.find(self.root, "textures/arch/wall01.dds")[0], wall_dds)
+        nose.tools.assert_equal(path_indices.filepath, None)
@@ -0,0 +1,109 @@
+"""Unit testing the parallel prefetching of textures"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import os
+import shutil
+import struct
+import tempfile
+
+import nose
+from pyffi.formats.nif import NifFormat
+
+from io_scene_nif.modules.nif_import.property.texture.prefetch import TexturePrefetch, get_texture_paths, is_valid_image
+
+DDS_DATA = struct.pack('<4sI', b'DDS ', 124) + bytes(120)
+
+
+class TestTexturePrefetch:
+
+    def setup(self):
+        self.root = tempfile.mkdtemp()
+        self.valid = os.path.join(self.root, "valid.dds")
+        self.broken = os.path.join(self.root, "broken.dds")
+        self.fallback = os.path.join(self.root, "valid.png")
+        with open(self.valid, "wb") as stream:
+            stream.write(DDS_DATA)
+        with open(self.fallback, "wb") as stream:
+            stream.write(b'png data')
+        with open(self.broken, "wb") as stream:
+            stream.write(b'not a dds file')
+
+    def teardown(self):
+        shutil.rmtree(self.root)
+
+    def test_get_texture_paths(self):
+        n_data = NifFormat.Data()
+        n_node = NifFormat.NiNode()
+        n_data.roots = [n_node]
+        n_source = NifFormat.NiSourceTexture()
+        n_source.file_name = b'textures\\wall.dds'
+        n_texture_set = NifFormat.BSShaderTextureSet()
+        n_texture_set.num_textures = 3
+        n_texture_set.textures.update_size()
+        n_texture_set.textures[0] = b'Textures\\Wall.dds'
+        n_texture_set.textures[1] = b'textures\\wall_n.dds'
+        n_texturing = NifFormat.NiTexturingProperty()
+        n_texturing.has_base_texture = True
+        n_texturing.base_texture.source = n_source
+        n_shader = NifFormat.BSLightingShaderProperty()
+        n_shader.texture_set = n_texture_set
+        n_node.num_properties = 2
+        n_node.properties.update_size()
+        n_node.properties[0] = n_texturing
+        n_node.properties[1] = n_shader
+        # duplicates are ignored, regardless of case, and empty slots are skipped
+        nose.tools.assert_equal(get_texture_paths(n_data), ['textures\\wall.dds', 'textures\\wall_n.dds'])
+
+    def test_is_valid_image(self):
+        nose.tools.assert_true(is_valid_image("a.dds", DDS_DATA))
+        nose.tools.assert_false(is_valid_image("a.dds", DDS_DATA[:100]))
+        nose.tools.assert_false(is_valid_image("a.dds", b''))
+        nose.tools.assert_true(is_valid_image("a.png", b'png data'))
+
+    def test_prefetch(self):
+        missing = os.path.join(self.root, "missing.dds")
+        candidates = {"wall.dds": [missing, self.broken, self.valid, self.fallback], "floor.dds": [self.broken]}
+        texture_prefetch = TexturePrefetch(max_workers=2)
+        num_found = texture_prefetch.prefetch(["Wall.dds", "floor.dds"],
+                                              lambda fn: ((tex, None, None) for tex in candidates[fn.lower()]))
+        nose.tools.assert_equal(num_found, 1)
+        # all valid locations are kept, in order
+        nose.tools.assert_equal(texture_prefetch.get("WALL.DDS"), [(self.valid, None, None), (self.fallback, None, None)])
+        nose.tools.assert_equal(texture_prefetch.get("floor.dds"), [])
+        nose.tools.assert_equal(texture_prefetch.get("ceiling.dds"), None)
@@ -0,0 +1,81 @@
+"""Unit testing the convex hull utilities"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+
+import nose
+import numpy as np
+
+from io_scene_nif.utils import util_hull
+
+
+def get_max_outside_distance(points, vertices, triangles):
+    normals, distances = util_hull.get_planes(vertices, triangles)
+    return (points @ normals.T + distances).max()
+
+
+class TestHull:
+
+    def test_cube(self):
+        corners = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=float)
+        # points inside the cube and on its faces are not part of the hull
+        points = np.concatenate((corners, np.random.RandomState(0).uniform(-1, 1, (100, 3)), [(0, 0, 1), (1, 0, 0)]))
+        vertices, triangles = util_hull.get_hull(points)
+        nose.tools.assert_equal(sorted(map(tuple, vertices.tolist())), sorted(map(tuple, corners.tolist())))
+        nose.tools.assert_equal(len(triangles), 12)
+        normals, distances = util_hull.get_planes(vertices, triangles)
+        nose.tools.assert_equal(len(normals), 6)
+        nose.tools.assert_true(np.allclose(distances, -1.0))
+        nose.tools.assert_true(get_max_outside_distance(points, vertices, triangles) < 1e-9)
+
+    def test_quickhull(self):
+        points = np.random.RandomState(0).normal(size=(1000, 3))
+        triangles = util_hull.quickhull(points)
+        # closed and consistently oriented: each edge is used once in each direction
+        edges = {edge for a, b, c in triangles.tolist() for edge in ((a, b), (b, c), (c, a))}
+        nose.tools.assert_equal(len(edges), 3 * len(triangles))
+        nose.tools.assert_true(all((b, a) in edges for a, b in edges))
+        nose.tools.assert_true(get_max_outside_distance(points, points, triangles) < 1e-9)
+
+    def test_max_vertices(self):
+        points = np.random.RandomState(0).normal(size=(1000, 3))
+        vertices, triangles = util_hull.get_hull(points, max_vertices=20)
+        nose.tools.assert_equal(len(vertices), 20)
+        nose.tools.assert_equal(len(triangles), 2 * 20 - 4)
+
+    def test_flat(self):
+        vertices, triangles = util_hull.get_hull([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)])
+        nose.tools.assert_equal(len(triangles), 0)
@@ -0,0 +1,100 @@
+"""Unit testing the layout of node trees"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright © 2020, NIF File Format Library and Tools contributors.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import nose
+
+from io_scene_nif.utils import util_nodes
+
+
+class Socket:
+
+    def __init__(self, from_nodes=()):
+        self.links = [Link(from_node) for from_node in from_nodes]
+        self.is_linked = bool(self.links)
+        self.enabled = True
+
+
+class Link:
+
+    def __init__(self, from_node):
+        self.from_node = from_node
+
+
+class Node:
+    """The parts of a shader node that are used for its layout, before it is drawn."""
+
+    def __init__(self, name, *input_nodes):
+        self.name = name
+        self.inputs = [Socket([input_node]) for input_node in input_nodes] + [Socket()]
+        self.outputs = [Socket()]
+        self.width = 140.0
+        self.dimensions = (0.0, 0.0)
+        self.hide = False
+        self.location = None
+
+    def __repr__(self):
+        return self.name
+
+
+class TestNodes:
+
+    def setup(self):
+        # a texture that feeds into the output directly, and through a mix node
+        self.uv = Node("uv")
+        self.texture = Node("texture", self.uv)
+        self.vcol = Node("vcol")
+        self.mix = Node("mix", self.texture, self.vcol)
+        self.shader = Node("shader", self.mix, self.texture)
+        self.output = Node("output", self.shader)
+
+    def test_levels(self):
+        levels = util_nodes.get_levels(self.output, util_nodes.get_input_nodes)
+        # each node is placed once, at the end of the longest path to the output
+        nose.tools.assert_equal(levels, [[self.output], [self.shader], [self.mix], [self.texture, self.vcol], [self.uv]])
+
+    def test_arrange(self):
+        util_nodes.arrange_nodes(self.output)
+        nose.tools.assert_equal(self.output.location[0], 0.0)
+        # columns go right to left, without overlap
+        x = [node.location[0] for node in (self.output, self.shader, self.mix, self.texture, self.uv)]
+        nose.tools.assert_equal(x, sorted(x, reverse=True))
+        nose.tools.assert_equal(x[0] - x[1], self.shader.width + util_nodes.MARGIN_X)
+        # nodes in one column are stacked top to bottom
+        nose.tools.assert_equal(self.texture.location[0], self.vcol.location[0])
+        nose.tools.assert_true(self.texture.location[1] - self.vcol.location[1] >= util_nodes.get_node_height(self.texture))